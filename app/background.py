@@ -0,0 +1,35 @@
+# app/background.py
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
+
+# Tareas periódicas registradas por los módulos: (nombre, intervalo en segundos, función síncrona)
+_periodic_tasks = []
+
+
+def register_periodic(name: str, interval: float, func):
+    """Registra `func` para ejecutarse cada `interval` segundos mientras la app esté activa."""
+    if interval and interval > 0:
+        _periodic_tasks.append((name, interval, func))
+
+
+async def _run_periodically(name: str, interval: float, func):
+    while True:
+        try:
+            await run_in_threadpool(func)
+        except Exception as e:
+            logging.error(f"Tarea periódica '{name}' falló: {e}")
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Arranca las tareas periódicas al iniciar la app y las cancela al apagarla."""
+    running = [asyncio.create_task(_run_periodically(*task)) for task in _periodic_tasks]
+    try:
+        yield
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
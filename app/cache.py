@@ -0,0 +1,231 @@
+# app/cache.py
+import gzip
+import threading
+import time
+from collections import OrderedDict
+from fastapi.responses import JSONResponse, Response
+
+from app.metrics import CACHE_REQUESTS
+
+
+class TTLCache:
+    """
+    Caché en memoria con expiración por tiempo. Se usa para agregados
+    baratos de invalidar (p. ej. la carga de trabajo de los técnicos):
+    los servicios llaman a `clear()` al modificar los datos y el TTL acota
+    la desactualización entre workers.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl     = ttl
+        self.maxsize = maxsize
+        self._data   = {}
+        self._lock   = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.maxsize and key not in self._data:
+                # Descarta la entrada más antigua (orden de inserción)
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# **Snapshots serializados y precomprimidos**
+try:
+    import brotli  # opcional: sin el paquete solo se ofrece gzip
+except ImportError:
+    brotli = None
+
+# Por debajo de este tamaño comprimir no compensa
+SNAPSHOT_MIN_COMPRESS_SIZE = 1024
+
+_COMPRESSORS = {"gzip": lambda body: gzip.compress(body, compresslevel=6)}
+if brotli is not None:
+    _COMPRESSORS["br"] = lambda body: brotli.compress(body, quality=5)
+
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    """Elige br, gzip o identity según Accept-Encoding (respeta q=0)."""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    for encoding in ("br", "gzip"):
+        if encoding in _COMPRESSORS and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
+class SnapshotCache:
+    """
+    Respuestas JSON completas ya serializadas, por nombre. Cada nombre
+    tiene un contador de versión que los servicios incrementan (`bump`)
+    tras el commit de una escritura; un snapshot construido con una
+    versión anterior se descarta en la siguiente lectura. Las variantes
+    gzip/br se calculan una vez por versión, la primera vez que un cliente
+    las pide, así una lectura repetida es solo copiar bytes. El TTL acota
+    la desactualización entre workers, que no comparten los contadores.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl       = ttl
+        self._versions = {}
+        self._entries  = {}
+        self._lock     = threading.Lock()
+
+    def version(self, name: str) -> int:
+        return self._versions.get(name, 0)
+
+    def bump(self, *names: str):
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+                self._entries.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _current(self, name: str):
+        entry = self._entries.get(name)
+        if entry is None or entry["version"] != self.version(name) or entry["expires_at"] < time.monotonic():
+            return None
+        return entry
+
+    def response(self, name: str, accept_encoding: str, build):
+        """
+        Devuelve el snapshot de `name` con la codificación negociada;
+        `build()` genera el contenido (ya apto para JSON) si no hay uno
+        vigente. La versión se lee antes de consultar: si una escritura
+        llega mientras tanto, el snapshot nace viejo y no se vuelve a servir.
+        """
+        entry = self._current(name)
+        if entry is None:
+            CACHE_REQUESTS.inc(name, "miss")
+            version = self.version(name)
+            body = JSONResponse(content=build()).body
+            entry = {
+                "version":    version,
+                "expires_at": time.monotonic() + self.ttl,
+                "variants":   {"identity": body},
+            }
+            with self._lock:
+                if version == self.version(name):
+                    self._entries[name] = entry
+        else:
+            CACHE_REQUESTS.inc(name, "hit")
+
+        variants = entry["variants"]
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding != "identity" and len(variants["identity"]) < SNAPSHOT_MIN_COMPRESS_SIZE:
+            encoding = "identity"
+        body = variants.get(encoding)
+        if body is None:
+            # Carreras benignas: dos hilos pueden comprimir a la vez el mismo contenido
+            body = variants[encoding] = _COMPRESSORS[encoding](variants["identity"])
+
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, status_code=200, media_type="application/json", headers=headers)
+
+
+# **Vistas por usuario con LRU acotada por memoria**
+class VersionedLRUCache:
+    """
+    LRU de respuestas serializadas (bytes) acotada por `max_bytes`. Cada
+    entrada declara de qué claves depende (p. ej. los predios de un
+    usuario); `bump(*deps)` marca esas claves como modificadas y solo las
+    entradas que dependen de ellas dejan de servirse. Un contador global
+    de generación, leído antes de consultar (`generation()`), descarta las
+    entradas construidas mientras una escritura confirmaba. El TTL acota
+    la desactualización entre workers.
+    """
+
+    def __init__(self, name: str, max_bytes: int, ttl: float):
+        self.name        = name
+        self.max_bytes   = max_bytes
+        self.ttl         = ttl
+        self._entries    = OrderedDict()  # key -> (expires_at, generation, deps, body)
+        self._bumped     = {}             # dep -> generación de su última modificación
+        self._generation = 0
+        self._bytes      = 0
+        self._lock       = threading.Lock()
+
+    def generation(self) -> int:
+        return self._generation
+
+    def bump(self, *deps):
+        with self._lock:
+            self._generation += 1
+            for dep in deps:
+                self._bumped[dep] = self._generation
+
+    def _stale(self, generation: int, deps) -> bool:
+        return any(self._bumped.get(dep, 0) > generation for dep in deps)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[3])
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, generation, deps, body = entry
+                if expires_at < time.monotonic() or self._stale(generation, deps):
+                    self._drop(key)
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+        CACHE_REQUESTS.inc(self.name, "miss" if entry is None else "hit")
+        return None if entry is None else entry[3]
+
+    def set(self, key, body: bytes, deps, generation: int):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if self._stale(generation, deps):
+                return
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, generation, frozenset(deps), body)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
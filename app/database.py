@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert, inspect, text
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -15,6 +16,49 @@ engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Insert con soporte de ON CONFLICT según el motor (Postgres en producción, SQLite en pruebas)
+def dialect_insert(bind):
+    """Devuelve el `insert` específico del dialecto o None si no soporta upserts."""
+    name = bind.dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+# INSERT executemany que devuelve los IDs generados en el orden de `rows`
+def insert_returning_ids(db, table, rows):
+    """
+    En Postgres `sort_by_parameter_order` agrupa las filas en pocos INSERT.
+    SQLite no sabe correlacionar el RETURNING por lote y caería a un INSERT
+    por fila; como allí los rowid nuevos son crecientes dentro de la
+    transacción, se piden sin orden y se ordenan.
+    """
+    if not rows:
+        return []
+    pk = table.primary_key.columns[0]
+    if db.get_bind().dialect.name == "sqlite":
+        return sorted(db.execute(insert(table).returning(pk), rows).scalars().all())
+    return db.execute(insert(table).returning(pk, sort_by_parameter_order=True), rows).scalars().all()
+
+# Índices nuevos sobre tablas que ya existen (create_all solo los crea junto con la tabla)
+def ensure_indexes(*indexes):
+    for index in indexes:
+        index.create(bind=engine, checkfirst=True)
+
+# Columnas nuevas sobre tablas que ya existen (create_all no altera tablas)
+def ensure_columns(*columns):
+    inspector = inspect(engine)
+    for column in columns:
+        table = column.table
+        if column.name in {c["name"] for c in inspector.get_columns(table.name)}:
+            continue
+        ddl = CreateColumn(column).compile(dialect=engine.dialect)
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
 # Dependencia para obtener la sesión
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,245 @@
+# app/idempotency.py
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+
+from app.database import SessionLocal, dialect_insert
+from app.maintenance.models import IdempotencyKey
+
+IDEMPOTENCY_TTL              = float(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_LOCK_TIMEOUT     = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "120"))
+IDEMPOTENCY_CLEANUP_INTERVAL = float(os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL", "3600"))  # 0 = desactivado
+IDEMPOTENCY_MAX_KEY_LENGTH   = 255
+
+# (método, ruta) que aceptan la cabecera Idempotency-Key
+IDEMPOTENT_ROUTES = {
+    ("POST", "/maintenance/"),
+    ("POST", "/maintenance/bulk"),
+    ("POST", "/maintenance/reports"),
+    ("POST", "/maintenance/finalize"),
+}
+
+# Cabeceras que no se guardan: las recalcula el servidor o las agregan middlewares externos
+_SKIPPED_HEADERS = {"content-length", "date", "server", "x-db-query-count", "x-db-time"}
+
+
+def fingerprint(method: str, path: str, headers: Headers, body: bytes) -> str:
+    """
+    Huella de la petición para detectar una clave reutilizada con otro
+    contenido. En multipart se quita el boundary, que cambia en cada
+    reintento aunque los campos y archivos sean los mismos.
+    """
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("multipart/") and "boundary=" in content_type:
+        boundary = content_type.split("boundary=", 1)[1].split(";", 1)[0].strip().strip('"')
+        body = body.replace(boundary.encode("latin-1"), b"")
+    digest = hashlib.sha256()
+    digest.update(f"{method} {path}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+# **Persistencia de claves**
+def claim_key(key: str, method: str, path: str, request_hash: str):
+    """
+    Reserva la clave con un INSERT ... ON CONFLICT DO NOTHING. Devuelve
+    ("claimed", id), ("replay", fila), ("in_progress", None) o
+    ("mismatch", None). Una reserva vencida (TTL) o abandonada (proceso
+    caído, más de IDEMPOTENCY_LOCK_TIMEOUT sin respuesta) se reutiliza.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        values = {
+            "key": key, "method": method, "path": path, "request_hash": request_hash,
+            "created_at": now, "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL),
+        }
+        insert = dialect_insert(db.get_bind())
+        if insert is not None:
+            claimed_id = db.execute(
+                insert(IdempotencyKey).values(**values)
+                .on_conflict_do_nothing(index_elements=["key", "method", "path"])
+                .returning(IdempotencyKey.id)
+            ).scalar()
+        else:
+            try:
+                row = IdempotencyKey(**values)
+                db.add(row)
+                db.flush()
+                claimed_id = row.id
+            except IntegrityError:
+                db.rollback()
+                claimed_id = None
+        db.commit()
+        if claimed_id is not None:
+            return "claimed", claimed_id
+
+        row = (
+            db.query(IdempotencyKey)
+            .filter(IdempotencyKey.key == key, IdempotencyKey.method == method, IdempotencyKey.path == path)
+            .first()
+        )
+        if row is None:
+            # La purga la borró entre las dos sentencias; el reintento la reserva
+            return claim_key(key, method, path, request_hash)
+
+        stale = row.status_code is None and row.created_at < now - timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT)
+        if row.expires_at < now or stale:
+            # Toma optimista: solo uno de los reintentos concurrentes gana
+            taken = db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.id == row.id, IdempotencyKey.created_at == row.created_at)
+                .values(status_code=None, response_headers=None, response_body=None, **values)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            return ("claimed", row.id) if taken else ("in_progress", None)
+
+        if row.request_hash != request_hash:
+            return "mismatch", None
+        if row.status_code is None:
+            return "in_progress", None
+        return "replay", row
+    finally:
+        db.close()
+
+
+def store_response(claim_id: int, status_code: int, headers: list, body: bytes):
+    """Guarda la respuesta de la reserva; los errores 5xx la liberan para permitir el reintento."""
+    db = SessionLocal()
+    try:
+        if status_code >= 500:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == claim_id))
+        else:
+            db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.id == claim_id)
+                .values(status_code=status_code, response_headers=headers, response_body=body)
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+def release_key(claim_id: int):
+    db = SessionLocal()
+    try:
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == claim_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def purge_expired_keys() -> int:
+    """Borra las claves vencidas (tarea periódica)."""
+    db = SessionLocal()
+    try:
+        deleted = db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow())
+        ).rowcount
+        db.commit()
+        if deleted:
+            logging.info(f"Idempotencia: {deleted} claves vencidas eliminadas.")
+        return deleted
+    finally:
+        db.close()
+
+
+# **Middleware**
+class IdempotencyMiddleware:
+    """
+    Middleware ASGI puro para POST reintentables. Con Idempotency-Key la
+    primera petición se procesa normalmente y su respuesta (< 500) se guarda;
+    un reintento con la misma clave y el mismo contenido recibe esa
+    respuesta (cabecera Idempotent-Replayed: true) sin llegar al endpoint,
+    es decir, sin escrituras en BD ni subidas a Firebase. Mientras la
+    original sigue en curso los reintentos reciben 409, y reutilizar la
+    clave con otro contenido devuelve 422.
+    """
+    def __init__(self, app, routes=IDEMPOTENT_ROUTES):
+        self.app    = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        key = headers.get("idempotency-key")
+        if key is None:
+            return await self.app(scope, receive, send)
+        if not key.strip() or len(key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+            response = JSONResponse(status_code=400, content={
+                "detail": f"Idempotency-Key debe tener entre 1 y {IDEMPOTENCY_MAX_KEY_LENGTH} caracteres"
+            })
+            return await response(scope, receive, send)
+
+        # El cuerpo completo se necesita para la huella; luego se reentrega al endpoint
+        chunks, more_body = [], True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        method, path = scope["method"], scope["path"]
+        outcome, result = await run_in_threadpool(
+            claim_key, key, method, path, fingerprint(method, path, headers, body)
+        )
+        if outcome == "replay":
+            response = Response(
+                content=result.response_body or b"",
+                status_code=result.status_code,
+                headers={**dict(result.response_headers or []), "idempotent-replayed": "true"},
+            )
+            return await response(scope, receive, send)
+        if outcome == "in_progress":
+            response = JSONResponse(status_code=409, content={
+                "detail": "Ya hay una petición en curso con esta Idempotency-Key; reintente en unos segundos"
+            })
+            return await response(scope, receive, send)
+        if outcome == "mismatch":
+            response = JSONResponse(status_code=422, content={
+                "detail": "La Idempotency-Key ya se usó con una petición distinta"
+            })
+            return await response(scope, receive, send)
+
+        claim_id = result
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status, stored_headers, response_body = 500, [], []
+
+        async def send_wrapper(message):
+            nonlocal status, stored_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                stored_headers = [
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in message.get("headers", [])
+                    if name.decode("latin-1").lower() not in _SKIPPED_HEADERS
+                ]
+            elif message["type"] == "http.response.body":
+                response_body.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        except Exception:
+            await run_in_threadpool(release_key, claim_id)
+            raise
+        await run_in_threadpool(store_response, claim_id, status, stored_headers, b"".join(response_body))
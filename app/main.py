@@ -1,6 +1,18 @@
 from fastapi import FastAPI
-from app.database import Base, engine
+from app.database import Base, engine, ensure_indexes
 from app.maintenance.routes import router as maintenance_router
+from app.notifications.routes import router as notifications_router
+from app.metrics import router as metrics_router, register_pool_gauges
+from app.query_stats import install_query_stats
+from app.background import lifespan, register_periodic
+from app.maintenance.models import Maintenance, MaintenanceReport, Notification, TechnicianAssignment
+from app.idempotency import IDEMPOTENCY_CLEANUP_INTERVAL, purge_expired_keys
+from app.maintenance.scheduler import SCHEDULER_INTERVAL, run_scheduled
+from app.maintenance.archive import ARCHIVE_INTERVAL, run_archiver
+from app.maintenance.export import EXPORT_INTERVAL, run_export
+from app.maintenance.search import setup_search
+from app.maintenance.coalesce import setup_coalescing
+from app.notifications.hub import hub
 from app.middlewares import setup_middlewares
 from app.exceptions import setup_exception_handlers
 import threading
@@ -9,7 +21,8 @@ import threading
 app = FastAPI( 
     title="Distrito de Riego API Gateway - Mantenimiento",
     description="API Gateway para Mantenimiento en el sistema de riego",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # **Configurar Middlewares**
@@ -20,8 +33,38 @@ setup_exception_handlers(app)
 
 # **Registrar Rutas**
 app.include_router(maintenance_router)
+app.include_router(notifications_router)
+app.include_router(metrics_router)
+
+# **Métricas del pool de conexiones**
+register_pool_gauges(engine)
+
+# **Conteo de consultas SQL por petición**
+install_query_stats(engine)
 
 Base.metadata.create_all(bind=engine)
+ensure_indexes(
+    # El índice único parcial lo crea setup_coalescing (tolera duplicados previos)
+    *(index for index in Maintenance.__table__.indexes if not index.unique),
+    *MaintenanceReport.__table__.indexes,
+    *TechnicianAssignment.__table__.indexes,
+    *Notification.__table__.indexes,
+)
+
+# **Agrupación de fallas repetidas (columnas e índice único parcial)**
+setup_coalescing(engine)
+
+# **Índices de búsqueda de texto completo (Postgres)**
+setup_search(engine)
+
+# **Pub/sub en tiempo real (puente LISTEN/NOTIFY opcional entre workers)**
+hub.setup(engine)
+
+# **Tareas periódicas**
+register_periodic("preventive_scheduler", SCHEDULER_INTERVAL, run_scheduled)
+register_periodic("idempotency_cleanup", IDEMPOTENCY_CLEANUP_INTERVAL, purge_expired_keys)
+register_periodic("archiver", ARCHIVE_INTERVAL, run_archiver)
+register_periodic("columnar_export", EXPORT_INTERVAL, run_export)
 
 # **Endpoint de Salud**
 @app.get("/health", tags=["Health"])
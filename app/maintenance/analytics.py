@@ -0,0 +1,366 @@
+# app/maintenance/analytics.py
+import argparse
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.maintenance.archive import with_archived
+from app.maintenance.models import (
+    DeviceIot,
+    Lot,
+    Maintenance,
+    MaintenanceDailyRollup,
+    MaintenanceDetail,
+    MaintenanceReport,
+    Property,
+    PropertyLot,
+    TechnicianAssignment,
+    TypeFailure,
+    User,
+)
+
+ROLLUP_KEYS = ("bucket_date", "source", "type_failure_id", "lot_id", "property_id", "technician_id")
+ROLLUP_METRICS = ("assigned_count", "assign_seconds", "repaired_count", "repair_seconds")
+
+# Dimensiones de agrupación expuestas en /maintenance/analytics
+GROUP_BY = {
+    "failure_type": (MaintenanceDailyRollup.type_failure_id, TypeFailure),
+    "lot":          (MaintenanceDailyRollup.lot_id,          Lot),
+    "property":     (MaintenanceDailyRollup.property_id,     Property),
+    "technician":   (MaintenanceDailyRollup.technician_id,   User),
+    "day":          (MaintenanceDailyRollup.bucket_date,     None),
+}
+
+
+def _naive(value: datetime | None) -> datetime | None:
+    """Normaliza fechas con zona horaria a hora local sin zona (como `datetime.now`)."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _seconds_between(later: datetime | None, earlier: datetime | None) -> float:
+    later, earlier = _naive(later), _naive(earlier)
+    if later is None or earlier is None:
+        return 0.0
+    return max(0.0, (later - earlier).total_seconds())
+
+
+def _item_dimensions(db: Session, assignment: TechnicianAssignment):
+    """Mantenimiento o reporte de la asignación y sus dimensiones de rollup."""
+    if assignment.maintenance_id:
+        item   = db.get(Maintenance, assignment.maintenance_id)
+        lot_id = db.query(DeviceIot.lot_id).filter(DeviceIot.id == item.device_iot_id).scalar()
+        source = "maintenance"
+    else:
+        item   = db.get(MaintenanceReport, assignment.report_id)
+        lot_id = item.lot_id
+        source = "report"
+    property_id = (
+        db.query(func.min(PropertyLot.property_id)).filter(PropertyLot.lot_id == lot_id).scalar()
+        if lot_id else None
+    )
+    return item, {
+        "source":          source,
+        "type_failure_id": item.type_failure_id or 0,
+        "lot_id":          lot_id or 0,
+        "property_id":     property_id or 0,
+        "technician_id":   assignment.user_id or 0,
+    }
+
+
+def _bump(db: Session, key: dict, increments: dict):
+    """Suma `increments` al bucket `key` con un upsert atómico (sin commit)."""
+    values = {m: 0 for m in ROLLUP_METRICS}
+    values.update(increments)
+    insert = dialect_insert(db.get_bind())
+    if insert is not None:
+        table = MaintenanceDailyRollup.__table__
+        stmt  = insert(table).values(**key, **values)
+        stmt  = stmt.on_conflict_do_update(
+            index_elements=list(ROLLUP_KEYS),
+            set_={m: table.c[m] + stmt.excluded[m] for m in increments},
+        )
+        db.execute(stmt)
+        return
+
+    row = db.query(MaintenanceDailyRollup).filter_by(**key).with_for_update().first()
+    if row is None:
+        row = MaintenanceDailyRollup(**key, **{m: 0 for m in ROLLUP_METRICS})
+        db.add(row)
+    for m, v in increments.items():
+        setattr(row, m, (getattr(row, m) or 0) + v)
+
+
+def _bump_many(db: Session, entries):
+    """
+    Igual que `_bump` para muchos buckets con las mismas métricas: un único
+    upsert ejecutado en bloque (executemany). No hace commit.
+    """
+    if not entries:
+        return
+    insert = dialect_insert(db.get_bind())
+    if insert is None:
+        for key, increments in entries:
+            _bump(db, key, increments)
+        return
+    table   = MaintenanceDailyRollup.__table__
+    metrics = list(entries[0][1])
+    stmt    = insert(table)
+    stmt    = stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEYS),
+        set_={m: table.c[m] + stmt.excluded[m] for m in metrics},
+    )
+    db.execute(stmt, [{**{m: 0 for m in ROLLUP_METRICS}, **key, **increments} for key, increments in entries])
+
+
+def record_assignment(db: Session, assignment: TechnicianAssignment, sign: int = 1):
+    """
+    Acumula una asignación en su bucket diario. Con `sign=-1` la descuenta
+    (se usa al reasignar, antes de cambiar técnico y fecha). No hace commit.
+    """
+    item, dims = _item_dimensions(db, assignment)
+    assigned_at = _naive(assignment.assignment_date) or datetime.now()
+    _bump(db, {"bucket_date": assigned_at.date(), **dims}, {
+        "assigned_count": sign,
+        "assign_seconds": sign * _seconds_between(assigned_at, item.date),
+    })
+
+
+def record_assignments(db: Session, assignments):
+    """
+    Versión en bloque de `record_assignment` para asignaciones masivas: carga
+    ítems y predios en pocas consultas y hace un solo upsert por bucket.
+    No hace commit.
+    """
+    maintenance_ids = [a.maintenance_id for a in assignments if a.maintenance_id]
+    report_ids      = [a.report_id for a in assignments if not a.maintenance_id]
+    items = {}
+    if maintenance_ids:
+        for r in (
+            db.query(Maintenance.id, Maintenance.date, Maintenance.type_failure_id, DeviceIot.lot_id)
+            .outerjoin(DeviceIot, DeviceIot.id == Maintenance.device_iot_id)
+            .filter(Maintenance.id.in_(maintenance_ids))
+        ):
+            items[("maintenance", r.id)] = r
+    if report_ids:
+        for r in (
+            db.query(MaintenanceReport.id, MaintenanceReport.date, MaintenanceReport.type_failure_id, MaintenanceReport.lot_id)
+            .filter(MaintenanceReport.id.in_(report_ids))
+        ):
+            items[("report", r.id)] = r
+
+    lot_ids = {r.lot_id for r in items.values() if r.lot_id}
+    lot_property = dict(
+        db.query(PropertyLot.lot_id, func.min(PropertyLot.property_id))
+        .filter(PropertyLot.lot_id.in_(lot_ids))
+        .group_by(PropertyLot.lot_id)
+        .all()
+    ) if lot_ids else {}
+
+    buckets = defaultdict(lambda: {"assigned_count": 0, "assign_seconds": 0.0})
+    for a in assignments:
+        source = "maintenance" if a.maintenance_id else "report"
+        item = items[(source, a.maintenance_id or a.report_id)]
+        assigned_at = _naive(a.assignment_date) or datetime.now()
+        key = (
+            assigned_at.date(), source, item.type_failure_id or 0, item.lot_id or 0,
+            lot_property.get(item.lot_id, 0) or 0, a.user_id or 0,
+        )
+        buckets[key]["assigned_count"] += 1
+        buckets[key]["assign_seconds"] += _seconds_between(assigned_at, item.date)
+
+    _bump_many(db, [(dict(zip(ROLLUP_KEYS, key)), increments) for key, increments in buckets.items()])
+
+
+def record_finalization(db: Session, assignment: TechnicianAssignment, detail: MaintenanceDetail, sign: int = 1):
+    """
+    Acumula una finalización (tiempo desde el reporte hasta la reparación).
+    Con `sign=-1` la descuenta (al reasignar un ítem finalizado o cambiar su
+    tipo de falla, antes del cambio). No hace commit.
+    """
+    item, dims = _item_dimensions(db, assignment)
+    finished_at = _naive(detail.date) or datetime.now()
+    _bump(db, {"bucket_date": finished_at.date(), **dims}, {
+        "repaired_count": sign,
+        "repair_seconds": sign * _seconds_between(finished_at, item.date),
+    })
+
+
+def backfill(db: Session, start: date | None = None, end: date | None = None) -> int:
+    """
+    Recalcula los buckets del rango [start, end] desde las tablas crudas,
+    incluido el histórico archivado. Borra los buckets existentes del rango
+    y los vuelve a insertar en bloque. Devuelve el número de buckets escritos.
+    """
+    lower = datetime.combine(start, datetime.min.time()) if start else None
+    upper = datetime.combine(end + timedelta(days=1), datetime.min.time()) if end else None
+
+    def _in_range(value):
+        value = _naive(value)
+        return value is not None and (lower is None or value >= lower) and (upper is None or value < upper)
+
+    def _range_filter(column):
+        conds = []
+        if lower is not None:
+            conds.append(column >= lower)
+        if upper is not None:
+            conds.append(column < upper)
+        return conds
+
+    stale = db.query(MaintenanceDailyRollup)
+    if start:
+        stale = stale.filter(MaintenanceDailyRollup.bucket_date >= start)
+    if end:
+        stale = stale.filter(MaintenanceDailyRollup.bucket_date <= end)
+    stale.delete(synchronize_session=False)
+
+    lot_property = dict(
+        db.query(PropertyLot.lot_id, func.min(PropertyLot.property_id)).group_by(PropertyLot.lot_id).all()
+    )
+    buckets = defaultdict(lambda: {m: 0 for m in ROLLUP_METRICS})
+
+    # El archivador no toca los buckets: el histórico movido sigue contando
+    TA = with_archived(TechnicianAssignment, True)
+    MD = with_archived(MaintenanceDetail, True)
+    M  = with_archived(Maintenance, True)
+    MR = with_archived(MaintenanceReport, True)
+    sources = (
+        ("maintenance", M, DeviceIot.lot_id,
+         lambda q: q.join(M, TA.maintenance_id == M.id)
+                    .join(DeviceIot, DeviceIot.id == M.device_iot_id)),
+        ("report", MR, MR.lot_id,
+         lambda q: q.join(MR, TA.report_id == MR.id)),
+    )
+    for source, Item, lot_column, joins in sources:
+        query = joins(db.query(
+            TA.user_id, TA.assignment_date, Item.date, Item.type_failure_id,
+            lot_column.label("lot_id"), MD.date.label("finished_at"),
+        ).select_from(TA)).outerjoin(MD, MD.technician_assignment_id == TA.id)
+
+        assign_conds = _range_filter(TA.assignment_date)
+        if assign_conds:
+            finish_conds = _range_filter(MD.date)
+            query = query.filter(or_(and_(*assign_conds), and_(*finish_conds)))
+
+        for r in query.yield_per(5000):
+            dims = (
+                source, r.type_failure_id or 0, r.lot_id or 0,
+                lot_property.get(r.lot_id, 0) or 0, r.user_id or 0,
+            )
+            if _in_range(r.assignment_date):
+                b = buckets[(_naive(r.assignment_date).date(),) + dims]
+                b["assigned_count"] += 1
+                b["assign_seconds"] += _seconds_between(r.assignment_date, r.date)
+            if _in_range(r.finished_at):
+                b = buckets[(_naive(r.finished_at).date(),) + dims]
+                b["repaired_count"] += 1
+                b["repair_seconds"] += _seconds_between(r.finished_at, r.date)
+
+    rows = [{**dict(zip(ROLLUP_KEYS, key)), **metrics} for key, metrics in buckets.items()]
+    if rows:
+        db.bulk_insert_mappings(MaintenanceDailyRollup, rows)
+    db.commit()
+    return len(rows)
+
+
+class AnalyticsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_analytics(self, start: date | None, end: date | None, group_by: str, source: str | None = None):
+        """
+        Tiempo medio de asignación y de reparación agrupado por la dimensión
+        pedida, leyendo solo los buckets diarios pre-agregados del rango.
+        """
+        end   = end or date.today()
+        start = start or end - timedelta(days=30)
+        if start > end:
+            raise HTTPException(status_code=400, detail="La fecha inicial no puede ser posterior a la final")
+        if group_by not in GROUP_BY:
+            raise HTTPException(status_code=400, detail=f"group_by debe ser uno de {list(GROUP_BY)}")
+
+        dim, catalog = GROUP_BY[group_by]
+        R = MaintenanceDailyRollup
+        query = (
+            self.db.query(
+                dim.label("key"),
+                func.sum(R.assigned_count).label("assigned_count"),
+                func.sum(R.assign_seconds).label("assign_seconds"),
+                func.sum(R.repaired_count).label("repaired_count"),
+                func.sum(R.repair_seconds).label("repair_seconds"),
+            )
+            .filter(R.bucket_date >= start, R.bucket_date <= end)
+        )
+        if source:
+            query = query.filter(R.source == source)
+        rows = (
+            query.group_by(dim)
+            .having(func.sum(R.assigned_count) + func.sum(R.repaired_count) > 0)
+            .order_by(dim)
+            .all()
+        )
+
+        names = {}
+        if catalog is not None:
+            keys = [r.key for r in rows if r.key]
+            if catalog is User:
+                names = {
+                    u.id: " ".join(filter(None, [u.name, u.first_last_name, u.second_last_name]))
+                    for u in self.db.query(User).filter(User.id.in_(keys))
+                }
+            elif keys:
+                names = dict(self.db.query(catalog.id, catalog.name).filter(catalog.id.in_(keys)).all())
+
+        def _hours(seconds, count):
+            return round(seconds / count / 3600, 2) if count else None
+
+        data = [{
+            "key":                        r.key,
+            "name":                       names.get(r.key),
+            "assigned_count":             r.assigned_count or 0,
+            "mean_time_to_assign_hours":  _hours(r.assign_seconds or 0, r.assigned_count or 0),
+            "repaired_count":             r.repaired_count or 0,
+            "mean_time_to_repair_hours":  _hours(r.repair_seconds or 0, r.repaired_count or 0),
+        } for r in rows]
+
+        assigned = sum(r.assigned_count or 0 for r in rows)
+        repaired = sum(r.repaired_count or 0 for r in rows)
+        totals = {
+            "assigned_count":            assigned,
+            "mean_time_to_assign_hours": _hours(sum(r.assign_seconds or 0 for r in rows), assigned),
+            "repaired_count":            repaired,
+            "mean_time_to_repair_hours": _hours(sum(r.repair_seconds or 0 for r in rows), repaired),
+        }
+        return JSONResponse(status_code=200, content=jsonable_encoder({
+            "success": True,
+            "data": {"start": start, "end": end, "group_by": group_by, "totals": totals, "groups": data},
+        }))
+
+
+def main(argv=None):
+    """CLI: python -m app.maintenance.analytics backfill [--start AAAA-MM-DD] [--end AAAA-MM-DD]"""
+    parser = argparse.ArgumentParser(description="Rollups de analítica de mantenimiento")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fill = sub.add_parser("backfill", help="Recalcula los buckets diarios desde las tablas crudas")
+    fill.add_argument("--start", type=date.fromisoformat, default=None)
+    fill.add_argument("--end",   type=date.fromisoformat, default=None)
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal, engine
+    MaintenanceDailyRollup.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        written = backfill(db, args.start, args.end)
+        print(f"Buckets escritos: {written}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# app/maintenance/archive.py
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import delete, exists, insert, literal, select, text, union_all, DateTime
+from sqlalchemy.orm import Session, aliased
+
+from app.maintenance.models import (
+    ARCHIVE_TABLES, Maintenance, MaintenanceDetail, MaintenanceReport, TechnicianAssignment
+)
+from app.maintenance.search import search_index
+from app.maintenance.snapshots import list_snapshots, owner_views, MAINTENANCES_SNAPSHOT, REPORTS_SNAPSHOT
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_INTERVAL   = float(os.getenv("ARCHIVE_INTERVAL", "0"))  # 0 = desactivado
+
+STATUS_FINALIZED = 25
+
+# Clave del advisory lock de Postgres que evita dos archivadores a la vez
+ARCHIVE_LOCK_KEY = 7_240_048
+
+
+# **Lectura de histórico**
+def with_archived(model, include_archived: bool = False, name: str | None = None):
+    """
+    Entidad para consultar `model`: la tabla caliente (o un alias con
+    `name`) o, con include_archived, un alias sobre
+    UNION ALL (caliente, archivo) con las mismas columnas, así las
+    consultas de los listados no cambian.
+    """
+    if not include_archived:
+        return aliased(model, name=name) if name else model
+    hot     = model.__table__
+    archive = ARCHIVE_TABLES[hot.name]
+    union = union_all(
+        select(*hot.columns),
+        select(*(archive.c[c.name] for c in hot.columns)),
+    ).subquery(name or f"{hot.name}_all")
+    return aliased(model, union, adapt_on_names=True)
+
+
+# **Archivador**
+def _acquire_lock(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return bool(db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ARCHIVE_LOCK_KEY}).scalar())
+
+
+def _move(db: Session, model, condition, archived_at: datetime):
+    """INSERT ... SELECT al archivo y DELETE de la tabla caliente en la misma transacción."""
+    hot     = model.__table__
+    archive = ARCHIVE_TABLES[hot.name]
+    columns = [c.name for c in hot.columns]
+    db.execute(
+        insert(archive).from_select(
+            columns + ["archived_at"],
+            select(*hot.columns, literal(archived_at, DateTime)).where(condition),
+        )
+    )
+    return db.execute(delete(hot).where(condition).execution_options(synchronize_session=False)).rowcount
+
+
+def _archivable_ids(db: Session, Item, fk, cutoff: datetime, limit: int):
+    """
+    IDs finalizados (25) más antiguos que `cutoff`: tanto la fecha del ítem
+    como la de su cierre (maintenance_detail.date) deben ser anteriores.
+    """
+    recent_detail = (
+        select(TechnicianAssignment.id)
+        .join(MaintenanceDetail, MaintenanceDetail.technician_assignment_id == TechnicianAssignment.id)
+        .where(fk == Item.id, MaintenanceDetail.date >= cutoff)
+    )
+    return [
+        item_id for (item_id,) in db.execute(
+            select(Item.id)
+            .where(Item.maintenance_status_id == STATUS_FINALIZED, Item.date < cutoff, ~exists(recent_detail))
+            .order_by(Item.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+    ]
+
+
+def archive_finalized(db: Session, now: datetime | None = None, older_than_days: int = ARCHIVE_AFTER_DAYS,
+                      batch_size: int = ARCHIVE_BATCH_SIZE, max_batches: int | None = None) -> dict:
+    """
+    Mueve por lotes los mantenimientos y reportes finalizados hace más de
+    `older_than_days`, con sus asignaciones y detalles, a las tablas
+    *_archive. Cada lote es una transacción propia (detalle, asignación e
+    ítem salen juntos), así una corrida larga no bloquea a la API y puede
+    interrumpirse sin dejar huérfanos.
+
+    No toca los rollups diarios ni `estimated_maintenance_date`: el backfill
+    de analítica y el recálculo de fechas leen también el archivo.
+    """
+    now    = now or datetime.now()
+    cutoff = now - timedelta(days=older_than_days)
+    moved  = {"maintenance": 0, "maintenance_report": 0, "technician_assignment": 0, "maintenance_detail": 0}
+    batches = 0
+
+    for Item, fk in (
+        (Maintenance,       TechnicianAssignment.maintenance_id),
+        (MaintenanceReport, TechnicianAssignment.report_id),
+    ):
+        while max_batches is None or batches < max_batches:
+            if not _acquire_lock(db):
+                logging.info("Archivador: otra corrida en curso, se omite.")
+                db.rollback()
+                return {**moved, "skipped": True}
+            ids = _archivable_ids(db, Item, fk, cutoff, batch_size)
+            if not ids:
+                db.rollback()
+                break
+            assignment_ids = select(TechnicianAssignment.id).where(fk.in_(ids)).scalar_subquery()
+            archived_at = datetime.utcnow()
+            moved["maintenance_detail"] += _move(
+                db, MaintenanceDetail, MaintenanceDetail.technician_assignment_id.in_(assignment_ids), archived_at
+            )
+            moved["technician_assignment"] += _move(db, TechnicianAssignment, fk.in_(ids), archived_at)
+            moved[Item.__tablename__] += _move(db, Item, Item.id.in_(ids), archived_at)
+            db.commit()
+            batches += 1
+            if len(ids) < batch_size:
+                break
+
+    if moved["maintenance"] or moved["maintenance_report"]:
+        # Los listados por defecto dejan de incluir lo archivado
+        list_snapshots.bump(MAINTENANCES_SNAPSHOT, REPORTS_SNAPSHOT)
+        owner_views.clear()
+        search_index.invalidate()
+        logging.info(
+            f"Archivador: {moved['maintenance']} mantenimientos y {moved['maintenance_report']} reportes "
+            f"finalizados antes de {cutoff:%Y-%m-%d} movidos al archivo."
+        )
+    return moved
+
+
+def run_archiver():
+    """Corrida periódica con su propia sesión (la registra app.main)."""
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        archive_finalized(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    """CLI: python -m app.maintenance.archive [--older-than-days N] [--batch-size N] [--max-batches N]"""
+    parser = argparse.ArgumentParser(description="Archiva mantenimientos y reportes finalizados antiguos")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None, help="Detener tras N lotes")
+    parser.add_argument("--now", type=datetime.fromisoformat, default=None, help="Fecha de referencia")
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        print(archive_finalized(db, args.now, args.older_than_days, args.batch_size, args.max_batches))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
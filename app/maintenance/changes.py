@@ -0,0 +1,200 @@
+# app/maintenance/changes.py
+from datetime import datetime
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, insert_returning_ids
+from app.maintenance.models import (
+    DeviceIot, Maintenance, MaintenanceChangeEvent, MaintenanceReport, PropertyLot
+)
+from app.notifications.hub import hub, reset_event, stream_topic
+
+CHANGES_TOPIC = "changes"
+CHANGES_PAGE_LIMIT = 1000
+STREAM_BACKLOG_LIMIT = 1000
+
+# Clave del advisory lock que ordena los commits de eventos en Postgres
+CHANGE_FEED_LOCK_KEY = 7_240_040
+
+
+def change_event(row: dict) -> dict:
+    """Evento compacto del feed (hub / SSE / catch-up)."""
+    return {
+        "event": "change",
+        "id":    row["seq"],
+        "data":  {
+            "seq":           row["seq"],
+            "kind":          row["kind"],
+            "id":            row["item_id"],
+            "action":        row["action"],
+            "status_id":     row["status_id"],
+            "technician_id": row["technician_id"],
+            "lot_id":        row["lot_id"],
+            "property_id":   row["property_id"],
+            "at":            row["created_at"],
+        },
+    }
+
+
+def _locations(db: Session, changes):
+    """
+    (kind, item_id) -> (lot_id, {property_id}), una consulta por tipo de
+    ítem. Un lote puede pertenecer a varios predios; el evento publica el
+    menor y la invalidación de vistas por propietario usa todos.
+    """
+    maintenance_ids = {c["item_id"] for c in changes if c["kind"] == "maintenance"}
+    report_ids      = {c["item_id"] for c in changes if c["kind"] == "report"}
+    locations = {}
+    for kind, ids, Item, lot_column, joins in (
+        ("maintenance", maintenance_ids, Maintenance, DeviceIot.lot_id,
+         lambda q: q.join(DeviceIot, DeviceIot.id == Maintenance.device_iot_id)),
+        ("report", report_ids, MaintenanceReport, MaintenanceReport.lot_id, lambda q: q),
+    ):
+        if not ids:
+            continue
+        rows = (
+            joins(db.query(Item.id, lot_column, PropertyLot.property_id))
+            .outerjoin(PropertyLot, PropertyLot.lot_id == lot_column)
+            .filter(Item.id.in_(ids))
+        )
+        for item_id, lot_id, property_id in rows:
+            _, properties = locations.setdefault((kind, item_id), (lot_id, set()))
+            if property_id is not None:
+                properties.add(property_id)
+    return locations
+
+
+def record_changes(db: Session, changes):
+    """
+    Agrega eventos al feed; se insertan y se anuncian por el hub al hacer
+    commit. Cada cambio es un dict con kind, item_id, action, status_id y
+    (opcional) technician_id. Requiere que los ítems ya estén en la sesión
+    (flush). No hace commit.
+
+    Los predios afectados quedan en `db.info["changed_properties"]` como
+    pares (kind, property_id) para invalidar, tras el commit, las vistas
+    en caché de sus propietarios.
+    """
+    if not changes:
+        return
+    locations = _locations(db, changes)
+    changed_properties = db.info.setdefault("changed_properties", set())
+    pending = db.info.setdefault("change_events_pending", [])
+    for c in changes:
+        lot_id, properties = locations.get((c["kind"], c["item_id"]), (None, ()))
+        changed_properties.update((c["kind"], property_id) for property_id in properties)
+        pending.append({
+            "kind":          c["kind"],
+            "item_id":       c["item_id"],
+            "action":        c["action"],
+            "status_id":     c.get("status_id"),
+            "technician_id": c.get("technician_id"),
+            "lot_id":        lot_id,
+            "property_id":   min(properties, default=None),
+        })
+
+
+# **Inserción al hacer commit**
+@event.listens_for(Session, "before_commit")
+def _insert_pending_changes(session):
+    """
+    Inserta los eventos acumulados justo antes del commit. En Postgres un
+    advisory lock de transacción serializa a los escritores del feed desde
+    aquí hasta su commit, así el orden de `seq` coincide con el de
+    visibilidad y un cliente que lee `since=N` nunca salta un evento que se
+    confirme más tarde con un seq menor. Tomarlo al final y no en cada
+    `record_changes` evita que el resto de la transacción (subidas, otras
+    consultas) quede serializada.
+    """
+    rows = session.info.pop("change_events_pending", None)
+    if not rows:
+        return
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGE_FEED_LOCK_KEY})
+    now = datetime.utcnow()
+    for row in rows:
+        row["created_at"] = now
+    seqs = insert_returning_ids(session, MaintenanceChangeEvent.__table__, rows)
+    for row, seq in zip(rows, seqs):
+        row["seq"] = seq
+    hub.publish_many(session, [(CHANGES_TOPIC, change_event(row)) for row in rows])
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_changes(session, previous_transaction):
+    session.info.pop("change_events_pending", None)
+
+
+def record_change(db: Session, kind: str, item_id: int, action: str, status_id: int | None = None,
+                  technician_id: int | None = None):
+    """Atajo de `record_changes` para un solo evento. No hace commit."""
+    return record_changes(db, [{
+        "kind": kind, "item_id": item_id, "action": action,
+        "status_id": status_id, "technician_id": technician_id,
+    }])
+
+
+def _events_since(db: Session, since: int, limit: int):
+    rows = (
+        db.query(MaintenanceChangeEvent)
+        .filter(MaintenanceChangeEvent.seq > since)
+        .order_by(MaintenanceChangeEvent.seq)
+        .limit(limit)
+        .all()
+    )
+    return [change_event({c.name: getattr(r, c.name) for c in MaintenanceChangeEvent.__table__.columns}) for r in rows]
+
+
+class ChangeFeedService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_changes(self, since: int = 0, limit: int = CHANGES_PAGE_LIMIT):
+        """
+        Modo catch-up: eventos con seq > since, en orden. `next_since` es el
+        cursor para la siguiente llamada y `latest` el último seq existente.
+        """
+        if since < 0:
+            raise HTTPException(status_code=400, detail="since no puede ser negativo")
+        events = _events_since(self.db, since, limit)
+        latest = self.db.query(func.max(MaintenanceChangeEvent.seq)).scalar() or 0
+        return JSONResponse(status_code=200, content=jsonable_encoder({
+            "success": True,
+            "data": {
+                "events":     [e["data"] for e in events],
+                "next_since": events[-1]["id"] if events else since,
+                "latest":     latest,
+                "has_more":   bool(events) and events[-1]["id"] < latest,
+            },
+        }))
+
+    @staticmethod
+    def stream(request, since: int | None = None):
+        """
+        Flujo SSE del feed. Con `since` (o Last-Event-ID) primero emite lo
+        pendiente desde la tabla y luego los eventos en vivo del hub. Si hay
+        más de STREAM_BACKLOG_LIMIT pendientes emite un evento `reset` y el
+        cliente se pone al día con GET /changes. No usa la sesión de la
+        petición: el backlog abre la suya.
+        """
+        def _backlog():
+            if since is None:
+                return []
+            db = SessionLocal()
+            try:
+                events = _events_since(db, since, STREAM_BACKLOG_LIMIT + 1)
+                if len(events) > STREAM_BACKLOG_LIMIT:
+                    last_id = db.query(func.max(MaintenanceChangeEvent.seq)).scalar()
+                    return [reset_event(last_id, "backlog_truncated", limit=STREAM_BACKLOG_LIMIT)]
+                return events
+            finally:
+                db.close()
+
+        return StreamingResponse(
+            stream_topic(request, CHANGES_TOPIC, _backlog),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
@@ -0,0 +1,143 @@
+# app/maintenance/coalesce.py
+import logging
+from datetime import datetime
+from sqlalchemy import bindparam, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert, ensure_columns, insert_returning_ids
+from app.maintenance.models import Maintenance, OPEN_MAINTENANCE_PREDICATE
+
+STATUS_UNASSIGNED = 24
+OPEN_STATUSES     = (23, 24)
+COALESCE_KEY      = ("device_iot_id", "type_failure_id")
+
+_table        = Maintenance.__table__
+_unique_index = next(i for i in _table.indexes if i.name == "uq_maintenance_open_failure")
+
+# False si la tabla existente tiene duplicados abiertos y no se pudo crear el índice
+_upsert_ready = True
+
+
+def setup_coalescing(engine):
+    """
+    Prepara una tabla maintenance existente: agrega occurrence_count /
+    last_seen_at y el índice único parcial que respalda el upsert. Si ya hay
+    órdenes abiertas duplicadas el índice no se puede crear; se registra el
+    error y se usa la ruta sin upsert hasta depurarlas.
+    """
+    global _upsert_ready
+    ensure_columns(_table.c.occurrence_count, _table.c.last_seen_at)
+    try:
+        _unique_index.create(bind=engine, checkfirst=True)
+        _upsert_ready = True
+    except IntegrityError as e:
+        _upsert_ready = False
+        logging.error(
+            "No se pudo crear uq_maintenance_open_failure: hay mantenimientos abiertos duplicados "
+            f"por dispositivo y tipo de fallo. Se agrupan sin upsert hasta depurarlos. ({e.orig})"
+        )
+
+
+def _upsert(db: Session, insert, params):
+    stmt = insert(_table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(COALESCE_KEY),
+        index_where=OPEN_MAINTENANCE_PREDICATE,
+        set_={
+            "occurrence_count": _table.c.occurrence_count + stmt.excluded.occurrence_count,
+            "last_seen_at":     stmt.excluded.last_seen_at,
+        },
+    ).returning(
+        _table.c.id, _table.c.device_iot_id, _table.c.type_failure_id,
+        _table.c.occurrence_count, _table.c.maintenance_status_id,
+    )
+    return {
+        (r.device_iot_id, r.type_failure_id): (r.id, r.occurrence_count, r.maintenance_status_id)
+        for r in db.execute(stmt, params)
+    }
+
+
+def _lookup_then_write(db: Session, params):
+    """Ruta sin upsert (otro motor o índice ausente): actualiza las abiertas e inserta el resto."""
+    keys = [(p["device_iot_id"], p["type_failure_id"]) for p in params]
+    existing = {
+        (r.device_iot_id, r.type_failure_id): r
+        for r in db.query(
+            Maintenance.id, Maintenance.device_iot_id, Maintenance.type_failure_id,
+            Maintenance.occurrence_count, Maintenance.maintenance_status_id,
+        ).filter(
+            tuple_(Maintenance.device_iot_id, Maintenance.type_failure_id).in_(keys),
+            Maintenance.maintenance_status_id.in_(OPEN_STATUSES),
+        )
+    }
+    result, bumps, new = {}, [], []
+    for p in params:
+        key = (p["device_iot_id"], p["type_failure_id"])
+        row = existing.get(key)
+        if row is None:
+            new.append(p)
+            continue
+        bumps.append({"b_id": row.id, "b_count": p["occurrence_count"], "b_seen": p["last_seen_at"]})
+        result[key] = (row.id, row.occurrence_count + p["occurrence_count"], row.maintenance_status_id)
+    if bumps:
+        db.execute(
+            update(_table)
+            .where(_table.c.id == bindparam("b_id"))
+            .values(
+                occurrence_count=_table.c.occurrence_count + bindparam("b_count"),
+                last_seen_at=bindparam("b_seen"),
+            ),
+            bumps,
+        )
+    for p, new_id in zip(new, insert_returning_ids(db, _table, new)):
+        result[(p["device_iot_id"], p["type_failure_id"])] = (new_id, p["occurrence_count"], p["maintenance_status_id"])
+    return result
+
+
+def upsert_maintenances(db: Session, items, now: datetime | None = None):
+    """
+    Crea mantenimientos sin asignar o los acumula en la orden abierta (23/24)
+    del mismo dispositivo y tipo de fallo: occurrence_count suma las
+    repeticiones y last_seen_at guarda la última. Con el índice único
+    parcial es un solo INSERT ... ON CONFLICT DO UPDATE por lote, correcto
+    ante inserciones concurrentes. Las repeticiones dentro del lote se
+    agrupan antes (un upsert no puede tocar dos veces la misma fila).
+
+    `items` son dicts con device_iot_id, type_failure_id y
+    description_failure. Devuelve, alineado con `items`, dicts con id,
+    created (la fila se insertó con ese ítem), occurrence_count y status_id.
+    No hace commit.
+    """
+    now = now or datetime.now()
+    grouped = {}
+    for item in items:
+        key = (item["device_iot_id"], item["type_failure_id"])
+        if key in grouped:
+            grouped[key]["occurrence_count"] += 1
+        else:
+            grouped[key] = {
+                "device_iot_id":         item["device_iot_id"],
+                "type_failure_id":       item["type_failure_id"],
+                "description_failure":   item.get("description_failure"),
+                "date":                  now,
+                "maintenance_status_id": STATUS_UNASSIGNED,
+                "occurrence_count":      1,
+                "last_seen_at":          now,
+            }
+    params = list(grouped.values())
+
+    insert = dialect_insert(db.get_bind()) if _upsert_ready else None
+    written = _upsert(db, insert, params) if insert is not None else _lookup_then_write(db, params)
+
+    results, seen = [], set()
+    for item in items:
+        key = (item["device_iot_id"], item["type_failure_id"])
+        item_id, occurrence_count, status_id = written[key]
+        # Insertada si el contador quedó igual a las repeticiones de este lote
+        created = key not in seen and occurrence_count == grouped[key]["occurrence_count"]
+        seen.add(key)
+        results.append({
+            "id": item_id, "created": created, "occurrence_count": occurrence_count, "status_id": status_id,
+        })
+    return results
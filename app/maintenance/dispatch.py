@@ -0,0 +1,283 @@
+# app/maintenance/dispatch.py
+import os
+from datetime import datetime
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
+
+from app.database import insert_returning_ids
+from app.maintenance.analytics import record_assignments
+from app.maintenance.changes import record_changes
+from app.maintenance.geo import OPEN_STATUSES, haversine_km
+from app.maintenance.models import (
+    DeviceIot,
+    Lot,
+    Maintenance,
+    MaintenanceReport,
+    Notification,
+    TechnicianAssignment,
+    User,
+    role_permission_table,
+    user_role_table,
+)
+from app.maintenance.services import workload_cache
+from app.maintenance.snapshots import list_snapshots, MAINTENANCES_SNAPSHOT, REPORTS_SNAPSHOT
+from app.notifications.hub import hub, user_topic
+from app.notifications.services import notification_event
+
+STATUS_UNASSIGNED = 24
+STATUS_ASSIGNED   = 23
+
+# Kilómetros de desplazamiento que "equivalen" a una asignación abierta más
+DISPATCH_LOAD_WEIGHT_KM = float(os.getenv("DISPATCH_LOAD_WEIGHT_KM", "10"))
+
+
+class DispatchService:
+    """
+    Asignación automática del trabajo sin asignar (estado 24) entre los
+    técnicos con permiso 80, equilibrando carga abierta y distancia.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _technicians(self, permission_id: int):
+        """Técnicos con su carga abierta y el centro de los lotes que ya atienden."""
+        technicians = (
+            self.db.query(User.id, User.name, User.first_last_name, User.second_last_name)
+            .join(user_role_table, user_role_table.c.user_id == User.id)
+            .join(role_permission_table, user_role_table.c.rol_id == role_permission_table.c.rol_id)
+            .filter(role_permission_table.c.permission_id == permission_id)
+            .distinct()
+            .order_by(User.id)
+            .all()
+        )
+        ids = [t.id for t in technicians]
+        stats = {tid: [0, 0, 0.0, 0.0] for tid in ids}  # abiertas, con lote, Σlat, Σlon
+
+        TA = TechnicianAssignment
+        paths = (
+            (Maintenance, lambda q: q.join(Maintenance, TA.maintenance_id == Maintenance.id)
+                                     .outerjoin(DeviceIot, DeviceIot.id == Maintenance.device_iot_id)
+                                     .outerjoin(Lot, Lot.id == DeviceIot.lot_id)),
+            (MaintenanceReport, lambda q: q.join(MaintenanceReport, TA.report_id == MaintenanceReport.id)
+                                           .outerjoin(Lot, Lot.id == MaintenanceReport.lot_id)),
+        )
+        for Item, joins in paths:
+            rows = (
+                joins(self.db.query(
+                    TA.user_id, func.count(TA.id), func.count(Lot.id),
+                    func.sum(Lot.latitude), func.sum(Lot.longitude),
+                ).select_from(TA))
+                .filter(TA.user_id.in_(ids), Item.maintenance_status_id.in_(OPEN_STATUSES))
+                .group_by(TA.user_id)
+                .all()
+            ) if ids else []
+            for user_id, open_count, located, sum_lat, sum_lon in rows:
+                s = stats[user_id]
+                s[0] += open_count
+                s[1] += located
+                s[2] += sum_lat or 0.0
+                s[3] += sum_lon or 0.0
+        return technicians, stats
+
+    def _unassigned(self, limit: int | None):
+        """Mantenimientos y reportes en estado 24 sin asignación, del más antiguo al más reciente."""
+        TA = TechnicianAssignment
+        maintenances = (
+            self.db.query(Maintenance.id, Maintenance.date, Lot.latitude, Lot.longitude)
+            .outerjoin(DeviceIot, DeviceIot.id == Maintenance.device_iot_id)
+            .outerjoin(Lot, Lot.id == DeviceIot.lot_id)
+            .filter(
+                Maintenance.maintenance_status_id == STATUS_UNASSIGNED,
+                ~self.db.query(TA.id).filter(TA.maintenance_id == Maintenance.id).exists(),
+            )
+            .all()
+        )
+        reports = (
+            self.db.query(MaintenanceReport.id, MaintenanceReport.date, Lot.latitude, Lot.longitude)
+            .outerjoin(Lot, Lot.id == MaintenanceReport.lot_id)
+            .filter(
+                MaintenanceReport.maintenance_status_id == STATUS_UNASSIGNED,
+                ~self.db.query(TA.id).filter(TA.report_id == MaintenanceReport.id).exists(),
+            )
+            .all()
+        )
+        items = [("maintenance", r) for r in maintenances] + [("report", r) for r in reports]
+        items.sort(key=lambda i: (i[1].date is None, i[1].date or datetime.min, i[0], i[1].id))
+        return items[:limit] if limit else items
+
+    def plan(self, items, stats, tech_ids, load_weight_km: float, max_per_technician: int | None):
+        """
+        Asignación voraz, del ítem más antiguo al más reciente: cada ítem va al
+        técnico con menor costo = distancia al centro de sus lotes (km)
+        + load_weight_km × asignaciones abiertas. Tras cada asignación se
+        actualizan carga y centro del técnico elegido. Devuelve, por ítem,
+        la posición del técnico (-1 si ninguno tiene cupo) y la distancia.
+        """
+        n_items, n_techs = len(items), len(tech_ids)
+        item_lat = np.array([r.latitude if r.latitude is not None else np.nan for _, r in items], dtype=float)
+        item_lon = np.array([r.longitude if r.longitude is not None else np.nan for _, r in items], dtype=float)
+
+        load    = np.array([stats[t][0] for t in tech_ids], dtype=float)
+        located = np.array([stats[t][1] for t in tech_ids], dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            anchor_lat = np.array([stats[t][2] for t in tech_ids]) / located
+            anchor_lon = np.array([stats[t][3] for t in tech_ids]) / located
+        # Técnicos sin lotes abiertos parten del centro del trabajo pendiente
+        if np.isfinite(item_lat).any():
+            anchor_lat = np.where(located > 0, anchor_lat, np.nanmean(item_lat))
+            anchor_lon = np.where(located > 0, anchor_lon, np.nanmean(item_lon))
+        new = np.zeros(n_techs, dtype=np.int64)
+
+        chosen   = np.full(n_items, -1, dtype=np.int64)
+        distance = np.full(n_items, np.nan)
+        for k in range(n_items):
+            has_coords = not np.isnan(item_lat[k])
+            travel = (
+                np.nan_to_num(haversine_km(item_lat[k], item_lon[k], anchor_lat, anchor_lon), nan=0.0)
+                if has_coords else np.zeros(n_techs)
+            )
+            cost = travel + load_weight_km * load
+            if max_per_technician:
+                cost = np.where(new >= max_per_technician, np.inf, cost)
+            t = int(np.argmin(cost))
+            if not np.isfinite(cost[t]):
+                continue
+            chosen[k] = t
+            load[t] += 1
+            new[t]  += 1
+            if has_coords:
+                distance[k] = travel[t]
+                if located[t] > 0:
+                    anchor_lat[t] = (anchor_lat[t] * located[t] + item_lat[k]) / (located[t] + 1)
+                    anchor_lon[t] = (anchor_lon[t] * located[t] + item_lon[k]) / (located[t] + 1)
+                else:
+                    anchor_lat[t], anchor_lon[t] = item_lat[k], item_lon[k]
+                located[t] += 1
+        return chosen, distance
+
+    def _commit(self, items, chosen, tech_ids):
+        """Crea asignaciones, cambia estados, acumula rollups y notifica, en una sola transacción."""
+        now, created_at = datetime.now(), datetime.utcnow()
+        assignments, notifications = [], []
+        maintenance_ids, report_ids = [], []
+        for (kind, r), t in zip(items, chosen):
+            if t < 0:
+                continue
+            user_id = tech_ids[t]
+            if kind == "maintenance":
+                maintenance_ids.append(r.id)
+                assignments.append({"maintenance_id": r.id, "report_id": None, "user_id": user_id, "assignment_date": now})
+                notifications.append({
+                    "user_id": user_id, "title": "Nueva asignación de mantenimiento",
+                    "message": f"Te han asignado el mantenimiento #{r.id}.",
+                    "type": "maintenance_assignment", "read": False, "created_at": created_at,
+                })
+            else:
+                report_ids.append(r.id)
+                assignments.append({"maintenance_id": None, "report_id": r.id, "user_id": user_id, "assignment_date": now})
+                notifications.append({
+                    "user_id": user_id, "title": "Nueva asignación de reporte",
+                    "message": f"Te han asignado el reporte #{r.id}.",
+                    "type": "report_assignment", "read": False, "created_at": created_at,
+                })
+
+        try:
+            # El filtro por estado 24 detecta ítems asignados a mano mientras se calculaba el plan
+            updated = 0
+            for Item, ids in ((Maintenance, maintenance_ids), (MaintenanceReport, report_ids)):
+                if ids:
+                    updated += self.db.execute(
+                        update(Item)
+                        .where(Item.id.in_(ids), Item.maintenance_status_id == STATUS_UNASSIGNED)
+                        .values(maintenance_status_id=STATUS_ASSIGNED)
+                        .execution_options(synchronize_session=False)
+                    ).rowcount
+            if updated != len(maintenance_ids) + len(report_ids):
+                raise HTTPException(
+                    status_code=409,
+                    detail="Algunos ítems fueron asignados durante el cálculo del plan; intente de nuevo",
+                )
+            # Inserciones en bloque (executemany) sin recuperar los IDs generados
+            self.db.execute(insert(TechnicianAssignment.__table__), assignments)
+            record_assignments(self.db, [TechnicianAssignment(**a) for a in assignments])
+            record_changes(self.db, [{
+                "kind":          "maintenance" if a["maintenance_id"] else "report",
+                "item_id":       a["maintenance_id"] or a["report_id"],
+                "action":        "assigned",
+                "status_id":     STATUS_ASSIGNED,
+                "technician_id": a["user_id"],
+            } for a in assignments])
+            notification_ids = insert_returning_ids(self.db, Notification.__table__, notifications)
+            hub.publish_many(self.db, [
+                (user_topic(n["user_id"]), notification_event(
+                    notification_id, n["user_id"], n["title"], n["message"], n["type"], n["created_at"],
+                ))
+                for notification_id, n in zip(notification_ids, notifications)
+            ])
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        workload_cache.clear()
+        list_snapshots.bump(MAINTENANCES_SNAPSHOT, REPORTS_SNAPSHOT)
+        return len(assignments)
+
+    def dispatch(
+        self,
+        dry_run: bool = False,
+        load_weight_km: float = DISPATCH_LOAD_WEIGHT_KM,
+        max_per_technician: int | None = None,
+        limit: int | None = None,
+        permission_id: int = 80,
+    ):
+        """
+        Calcula (y, salvo dry_run, confirma) la asignación automática de todo
+        el trabajo sin asignar. Con dry_run solo devuelve el plan propuesto.
+        """
+        technicians, stats = self._technicians(permission_id)
+        if not technicians:
+            raise HTTPException(status_code=404, detail="No hay técnicos con permiso 80")
+        tech_ids = [t.id for t in technicians]
+
+        items = self._unassigned(limit)
+        chosen, distance = self.plan(items, stats, tech_ids, load_weight_km, max_per_technician)
+
+        assigned = 0
+        if not dry_run and items:
+            assigned = self._commit(items, chosen, tech_ids)
+
+        names = {
+            t.id: " ".join(filter(None, [t.name, t.first_last_name, t.second_last_name]))
+            for t in technicians
+        }
+        plan = [{
+            "kind":            kind,
+            "item_id":         r.id,
+            "technician_id":   tech_ids[t],
+            "technician_name": names[tech_ids[t]],
+            "distance_km":     None if np.isnan(d) else round(float(d), 3),
+        } for (kind, r), t, d in zip(items, chosen.tolist(), distance) if t >= 0]
+        new_by_tech = np.bincount(chosen[chosen >= 0], minlength=len(tech_ids)).tolist()
+
+        return JSONResponse(status_code=200, content=jsonable_encoder({
+            "success": True,
+            "data": {
+                "dry_run":     dry_run,
+                "pending":     len(items),
+                "assigned":    assigned,
+                "unassigned":  [{"kind": kind, "item_id": r.id} for (kind, r), t in zip(items, chosen.tolist()) if t < 0],
+                "technicians": [{
+                    "technician_id":   tid,
+                    "technician_name": names[tid],
+                    "open_before":     stats[tid][0],
+                    "new":             new_by_tech[i],
+                    "open_after":      stats[tid][0] + new_by_tech[i],
+                } for i, tid in enumerate(tech_ids)],
+                "plan":        plan,
+            },
+        }))
@@ -0,0 +1,364 @@
+# app/maintenance/export.py
+import argparse
+import logging
+import os
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.maintenance.archive import with_archived
+from app.maintenance.models import (
+    DeviceIot, ExportWatermark, FailureSolution, Lot, Maintenance, MaintenanceChangeEvent, MaintenanceDetail,
+    MaintenanceReport, MaintenanceType, TechnicianAssignment, TypeFailure, User, Vars
+)
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "50000"))
+EXPORT_DIR        = os.getenv("EXPORT_DIR", "exports")
+EXPORT_FORMAT     = os.getenv("EXPORT_FORMAT", "parquet")
+EXPORT_INTERVAL   = float(os.getenv("EXPORT_INTERVAL", "0"))  # 0 = desactivado
+
+# Formato -> (extensión, media type)
+EXPORT_FORMATS = {
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow":   ("arrows",  "application/vnd.apache.arrow.stream"),
+}
+
+# Clave del advisory lock de Postgres que evita dos exportaciones del mismo conjunto a la vez
+EXPORT_LOCK_KEY = 7_240_049
+
+
+# **Conjuntos exportados**
+def _maintenance_dataset():
+    M = with_archived(Maintenance, True)
+    columns = [
+        ("id",                    M.id,                    "int"),
+        ("device_iot_id",         M.device_iot_id,         "int"),
+        ("lot_id",                DeviceIot.lot_id,        "int"),
+        ("type_failure_id",       M.type_failure_id,       "int"),
+        ("failure_type",          TypeFailure.name,        "str"),
+        ("description_failure",   M.description_failure,   "str"),
+        ("date",                  M.date,                  "ts"),
+        ("maintenance_status_id", M.maintenance_status_id, "int"),
+        ("status",                Vars.name,               "str"),
+        ("occurrence_count",      M.occurrence_count,      "int"),
+        ("last_seen_at",          M.last_seen_at,          "ts"),
+    ]
+    stmt = (
+        select(*(expr.label(name) for name, expr, _ in columns))
+        .select_from(M)
+        .outerjoin(DeviceIot, DeviceIot.id == M.device_iot_id)
+        .outerjoin(TypeFailure, TypeFailure.id == M.type_failure_id)
+        .outerjoin(Vars, Vars.id == M.maintenance_status_id)
+    )
+    return stmt, columns, (("maintenance", M.id),), M.id
+
+
+def _report_dataset():
+    R = with_archived(MaintenanceReport, True)
+    columns = [
+        ("id",                    R.id,                    "int"),
+        ("lot_id",                R.lot_id,                "int"),
+        ("lot_name",              Lot.name,                "str"),
+        ("type_failure_id",       R.type_failure_id,       "int"),
+        ("failure_type",          TypeFailure.name,        "str"),
+        ("description_failure",   R.description_failure,   "str"),
+        ("date",                  R.date,                  "ts"),
+        ("maintenance_status_id", R.maintenance_status_id, "int"),
+        ("status",                Vars.name,               "str"),
+    ]
+    stmt = (
+        select(*(expr.label(name) for name, expr, _ in columns))
+        .select_from(R)
+        .outerjoin(Lot, Lot.id == R.lot_id)
+        .outerjoin(TypeFailure, TypeFailure.id == R.type_failure_id)
+        .outerjoin(Vars, Vars.id == R.maintenance_status_id)
+    )
+    return stmt, columns, (("report", R.id),), R.id
+
+
+def _assignment_dataset():
+    TA = with_archived(TechnicianAssignment, True)
+    columns = [
+        ("id",              TA.id,              "int"),
+        ("maintenance_id",  TA.maintenance_id,  "int"),
+        ("report_id",       TA.report_id,       "int"),
+        ("technician_id",   TA.user_id,         "int"),
+        ("technician_name", User.name + " " + User.first_last_name, "str"),
+        ("assignment_date", TA.assignment_date, "ts"),
+    ]
+    stmt = (
+        select(*(expr.label(name) for name, expr, _ in columns))
+        .select_from(TA)
+        .outerjoin(User, User.id == TA.user_id)
+    )
+    return stmt, columns, (("maintenance", TA.maintenance_id), ("report", TA.report_id)), TA.id
+
+
+def _detail_dataset():
+    D  = with_archived(MaintenanceDetail, True)
+    TA = with_archived(TechnicianAssignment, True)
+    columns = [
+        ("id",                       D.id,                       "int"),
+        ("technician_assignment_id", D.technician_assignment_id, "int"),
+        ("maintenance_id",           TA.maintenance_id,          "int"),
+        ("report_id",                TA.report_id,               "int"),
+        ("technician_id",            TA.user_id,                 "int"),
+        ("type_failure_id",          D.type_failure_id,          "int"),
+        ("failure_type",             TypeFailure.name,           "str"),
+        ("type_maintenance_id",      D.type_maintenance_id,      "int"),
+        ("maintenance_type",         MaintenanceType.name,       "str"),
+        ("failure_solution_id",      D.failure_solution_id,      "int"),
+        ("failure_solution",         FailureSolution.name,       "str"),
+        ("fault_remarks",            D.fault_remarks,            "str"),
+        ("solution_remarks",         D.solution_remarks,         "str"),
+        ("evidence_failure_url",     D.evidence_failure_url,     "str"),
+        ("evidence_solution_url",    D.evidence_solution_url,    "str"),
+        ("date",                     D.date,                     "ts"),
+    ]
+    stmt = (
+        select(*(expr.label(name) for name, expr, _ in columns))
+        .select_from(D)
+        .outerjoin(TA, TA.id == D.technician_assignment_id)
+        .outerjoin(TypeFailure, TypeFailure.id == D.type_failure_id)
+        .outerjoin(MaintenanceType, MaintenanceType.id == D.type_maintenance_id)
+        .outerjoin(FailureSolution, FailureSolution.id == D.failure_solution_id)
+    )
+    return stmt, columns, (("maintenance", TA.maintenance_id), ("report", TA.report_id)), D.id
+
+
+# Nombre del conjunto -> constructor de (consulta, columnas, ítems del feed a los que pertenece la fila,
+# columna de orden)
+DATASETS = {
+    "maintenance":           _maintenance_dataset,
+    "maintenance_report":    _report_dataset,
+    "technician_assignment": _assignment_dataset,
+    "maintenance_detail":    _detail_dataset,
+}
+
+
+# **Lotes Arrow**
+def _schema(columns):
+    types = {"int": pa.int64(), "str": pa.string(), "ts": pa.timestamp("us")}
+    return pa.schema([pa.field(name, types[kind]) for name, _, kind in columns])
+
+
+def export_window(db: Session, since: int | None):
+    """
+    Ventana (since, until] de `seq` del feed de cambios a exportar; `until`
+    es el último seq confirmado. La marca no depende de las fechas de
+    negocio (que envía el cliente y pueden ser antiguas): toda creación,
+    asignación, edición o cierre agrega un evento con seq creciente, así
+    una fila cambiada vuelve a exportarse. Los eventos se confirman en
+    orden de seq, por lo que ninguno con seq <= until aparece más tarde.
+    """
+    until = db.query(func.max(MaintenanceChangeEvent.seq)).scalar() or 0
+    return since, until
+
+
+def iter_batches(db: Session, dataset: str, since: int | None, until: int,
+                 batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    RecordBatches con esquema explícito, leídos por lotes (yield_per) para
+    no materializar el histórico completo. Sin `since` exporta todas las
+    filas; con `since`, las de los ítems con eventos en (since, until], en
+    su estado actual.
+    """
+    stmt, columns, items, order_column = DATASETS[dataset]()
+    schema = _schema(columns)
+    if since is not None:
+        E = MaintenanceChangeEvent
+        stmt = stmt.where(or_(*(
+            item_id.in_(select(E.item_id).where(E.kind == kind, E.seq > since, E.seq <= until))
+            for kind, item_id in items
+        )))
+    stmt = stmt.order_by(order_column)
+
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)],
+            schema=schema,
+        )
+
+
+class _ChunkSink:
+    """Archivo en memoria que se vacía por trozos: el writer ve una posición continua."""
+    closed = False
+
+    def __init__(self):
+        self.chunks   = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _open_writer(fmt: str, sink, schema):
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    return pa.ipc.new_stream(sink, schema)
+
+
+def write_batches(db: Session, dataset: str, fmt: str, sink, since: int | None, until: int):
+    """
+    Escribe el conjunto en `sink` (Parquet con un row group por lote o
+    flujo IPC de Arrow). Generador: cede las filas de cada lote ya escrito,
+    así el endpoint vacía el sink al cliente entre lotes. El pie del
+    archivo se escribe al agotarse.
+    """
+    _, columns, _, _ = DATASETS[dataset]()
+    writer = _open_writer(fmt, sink, _schema(columns))
+    try:
+        for batch in iter_batches(db, dataset, since, until):
+            writer.write_batch(batch)
+            yield batch.num_rows
+    finally:
+        writer.close()
+
+
+# **Endpoint**
+class ExportService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def export(self, dataset: str, fmt: str = "parquet", since: int | None = None):
+        """
+        Descarga en streaming de un conjunto en Parquet o Arrow. Con `since`
+        (seq del feed) solo las filas cambiadas después; la cabecera
+        X-Export-Until es el `since` de la siguiente descarga incremental.
+        No mueve la marca de agua del job nocturno.
+        """
+        if dataset not in DATASETS:
+            raise HTTPException(status_code=404, detail=f"Conjunto '{dataset}' no exportable")
+        since, until = export_window(self.db, since)
+        extension, media_type = EXPORT_FORMATS[fmt]
+
+        def _stream():
+            # Sesión propia: la de la petición se cierra antes de enviar el cuerpo
+            db, sink = SessionLocal(), _ChunkSink()
+            try:
+                for _ in write_batches(db, dataset, fmt, sink, since, until):
+                    yield sink.drain()
+                yield sink.drain()
+            finally:
+                db.close()
+
+        headers = {
+            "Content-Disposition": f'attachment; filename="{dataset}-{since or 0}-{until}.{extension}"',
+            "X-Export-Until":      str(until),
+        }
+        if since is not None:
+            headers["X-Export-Since"] = str(since)
+        return StreamingResponse(_stream(), media_type=media_type, headers=headers)
+
+
+# **Job incremental**
+def _acquire_lock(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return bool(db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": EXPORT_LOCK_KEY}).scalar())
+
+
+def export_datasets(db: Session, out_dir: str = EXPORT_DIR, fmt: str = EXPORT_FORMAT, datasets=None,
+                    full: bool = False) -> dict:
+    """
+    Exporta cada conjunto a `out_dir/<conjunto>/<conjunto>-<since>-<until>.<ext>`
+    con las filas cambiadas después de su marca de agua (todas con `full`).
+    Una fila cambiada se exporta de nuevo con su estado actual: el
+    consumidor aplica los archivos en orden y se queda con la última
+    versión de cada `id`. El archivo se escribe con un nombre temporal y
+    se renombra al terminar; solo entonces avanza la marca, así una
+    corrida fallida se repite completa la noche siguiente.
+    Devuelve {conjunto: filas | None si se omitió}.
+    """
+    extension, _ = EXPORT_FORMATS[fmt]
+    summary = {}
+    for dataset in datasets or DATASETS:
+        if not _acquire_lock(db):
+            logging.info(f"Exportación: otra corrida en curso, se omite '{dataset}'.")
+            db.rollback()
+            summary[dataset] = None
+            continue
+        mark = db.get(ExportWatermark, dataset)
+        since, until = export_window(db, None if full or mark is None else mark.watermark)
+        if since is not None and since >= until:
+            db.rollback()
+            summary[dataset] = 0
+            continue
+
+        target_dir = os.path.join(out_dir, dataset)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, f"{dataset}-{since or 0}-{until}.{extension}")
+        try:
+            with open(target + ".tmp", "wb") as sink:
+                rows = sum(write_batches(db, dataset, fmt, sink, since, until))
+            if rows:
+                os.replace(target + ".tmp", target)
+            else:
+                os.remove(target + ".tmp")
+        except Exception:
+            db.rollback()
+            if os.path.exists(target + ".tmp"):
+                os.remove(target + ".tmp")
+            raise
+
+        if mark is None:
+            mark = ExportWatermark(dataset=dataset)
+            db.add(mark)
+        mark.watermark   = until
+        mark.exported_at = datetime.utcnow()
+        mark.rows        = rows
+        db.commit()
+        summary[dataset] = rows
+        logging.info(f"Exportación: {rows} filas de '{dataset}' hasta el seq {until}.")
+    return summary
+
+
+def run_export():
+    """Corrida periódica con su propia sesión (la registra app.main)."""
+    db = SessionLocal()
+    try:
+        export_datasets(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    """CLI: python -m app.maintenance.export [--out DIR] [--format parquet|arrow] [--full] [--datasets ...]"""
+    parser = argparse.ArgumentParser(description="Exporta mantenimientos y reportes a Parquet/Arrow")
+    parser.add_argument("--out", default=EXPORT_DIR, help="Directorio de salida")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default=EXPORT_FORMAT)
+    parser.add_argument("--datasets", nargs="+", choices=list(DATASETS), default=None)
+    parser.add_argument("--full", action="store_true", help="Ignorar la marca de agua y exportar todo")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        print(export_datasets(db, args.out, args.format, args.datasets, args.full))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
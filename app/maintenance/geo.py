@@ -0,0 +1,213 @@
+# app/maintenance/geo.py
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.maintenance.models import DeviceIot, Lot, Maintenance, MaintenanceReport, TypeFailure, Vars
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE   = math.pi * EARTH_RADIUS_KM / 180
+
+OPEN_STATUSES = (23, 24)
+
+GRID_CELL_DEGREES  = float(os.getenv("GEO_GRID_CELL_DEGREES", "0.05"))  # ~5.5 km
+GEO_INDEX_MAX_AGE  = float(os.getenv("GEO_INDEX_MAX_AGE", "30"))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Distancia en km sobre la esfera. Acepta escalares o arreglos NumPy y
+    respeta broadcasting (p. ej. columnas contra filas para una matriz).
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class LotGridIndex:
+    """
+    Índice espacial en memoria de las coordenadas de los lotes: una grilla
+    de celdas de `cell_degrees` grados que apunta a las posiciones de los
+    arreglos de latitud/longitud. Los lotes los administra otro servicio,
+    así que el índice se reconstruye cuando cambia la firma de la tabla
+    (conteo, ID máximo y suma de coordenadas), revisada cada `max_age` s.
+    """
+
+    def __init__(self, cell_degrees: float = GRID_CELL_DEGREES, max_age: float = GEO_INDEX_MAX_AGE):
+        self.cell_degrees = cell_degrees
+        self.max_age      = max_age
+        self._lock        = threading.Lock()
+        self._stale       = True
+        self._checked_at  = 0.0
+        self._signature   = None
+        self.ids          = np.empty(0, dtype=np.int64)
+        self.lats         = np.empty(0)
+        self.lons         = np.empty(0)
+        self.names        = {}
+        self.cells        = {}
+
+    def invalidate(self):
+        self._stale = True
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def refresh(self, db: Session):
+        with self._lock:
+            if not self._stale and time.monotonic() - self._checked_at <= self.max_age:
+                return
+            signature = tuple(db.query(
+                func.count(Lot.id), func.max(Lot.id), func.sum(Lot.latitude), func.sum(Lot.longitude)
+            ).one())
+            self._checked_at = time.monotonic()
+            if not self._stale and signature == self._signature:
+                return
+
+            rows = db.query(Lot.id, Lot.latitude, Lot.longitude, Lot.name).all()
+            self.ids   = np.fromiter((r.id for r in rows), dtype=np.int64, count=len(rows))
+            self.lats  = np.fromiter((r.latitude for r in rows), dtype=float, count=len(rows))
+            self.lons  = np.fromiter((r.longitude for r in rows), dtype=float, count=len(rows))
+            self.names = {r.id: r.name for r in rows}
+
+            cells = defaultdict(list)
+            for pos, (lat, lon) in enumerate(zip(self.lats.tolist(), self.lons.tolist())):
+                cells[self._cell(lat, lon)].append(pos)
+            self.cells = {key: np.asarray(v, dtype=np.int64) for key, v in cells.items()}
+
+            self._signature = signature
+            self._stale     = False
+
+    def bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> np.ndarray:
+        """Posiciones de los lotes dentro de la caja (bordes incluidos)."""
+        lo_y, lo_x = self._cell(min_lat, min_lon)
+        hi_y, hi_x = self._cell(max_lat, max_lon)
+        spanned = (hi_y - lo_y + 1) * (hi_x - lo_x + 1)
+        if spanned <= len(self.cells):
+            chunks = [
+                self.cells[(y, x)]
+                for y in range(lo_y, hi_y + 1)
+                for x in range(lo_x, hi_x + 1)
+                if (y, x) in self.cells
+            ]
+        else:
+            # Vista muy amplia: es más barato recorrer solo las celdas ocupadas
+            chunks = [
+                positions for (y, x), positions in self.cells.items()
+                if lo_y <= y <= hi_y and lo_x <= x <= hi_x
+            ]
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.concatenate(chunks)
+        lats, lons = self.lats[candidates], self.lons[candidates]
+        inside = (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+        return candidates[inside]
+
+    def radius(self, lat: float, lon: float, radius_km: float):
+        """Posiciones y distancias (km) de los lotes a menos de `radius_km` del punto."""
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        candidates = self.bbox(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        near = distances <= radius_km
+        return candidates[near], distances[near]
+
+
+lot_index = LotGridIndex()
+
+
+class GeoService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _items(self, lot_ids, kind: str | None, open_only: bool):
+        """Mantenimientos y reportes de los lotes dados, con tipo de fallo y estado."""
+        items = []
+        if kind in (None, "maintenance"):
+            query = (
+                self.db.query(
+                    Maintenance.id, Maintenance.date, Maintenance.description_failure,
+                    DeviceIot.lot_id, TypeFailure.name.label("failure_type"), Vars.name.label("status"),
+                )
+                .join(DeviceIot, DeviceIot.id == Maintenance.device_iot_id)
+                .outerjoin(TypeFailure, TypeFailure.id == Maintenance.type_failure_id)
+                .outerjoin(Vars, Vars.id == Maintenance.maintenance_status_id)
+                .filter(DeviceIot.lot_id.in_(lot_ids))
+            )
+            if open_only:
+                query = query.filter(Maintenance.maintenance_status_id.in_(OPEN_STATUSES))
+            items += [("maintenance", r) for r in query]
+        if kind in (None, "report"):
+            query = (
+                self.db.query(
+                    MaintenanceReport.id, MaintenanceReport.date, MaintenanceReport.description_failure,
+                    MaintenanceReport.lot_id, TypeFailure.name.label("failure_type"), Vars.name.label("status"),
+                )
+                .outerjoin(TypeFailure, TypeFailure.id == MaintenanceReport.type_failure_id)
+                .outerjoin(Vars, Vars.id == MaintenanceReport.maintenance_status_id)
+                .filter(MaintenanceReport.lot_id.in_(lot_ids))
+            )
+            if open_only:
+                query = query.filter(MaintenanceReport.maintenance_status_id.in_(OPEN_STATUSES))
+            items += [("report", r) for r in query]
+        return items
+
+    def _respond(self, positions, distances, kind, open_only, limit):
+        lot_ids = lot_index.ids[positions].tolist()
+        coords = {
+            lot_id: (lat, lon)
+            for lot_id, lat, lon in zip(lot_ids, lot_index.lats[positions].tolist(), lot_index.lons[positions].tolist())
+        }
+        distance_by_lot = dict(zip(lot_ids, distances.tolist())) if distances is not None else {}
+
+        items = self._items(lot_ids, kind, open_only) if lot_ids else []
+        data = [{
+            "kind":                item_kind,
+            "id":                  r.id,
+            "lot_id":              r.lot_id,
+            "lot_name":            lot_index.names.get(r.lot_id),
+            "latitude":            coords[r.lot_id][0],
+            "longitude":           coords[r.lot_id][1],
+            "distance_km":         round(distance_by_lot[r.lot_id], 3) if distances is not None else None,
+            "date":                r.date,
+            "failure_type":        r.failure_type,
+            "description_failure": r.description_failure,
+            "status":              r.status,
+        } for item_kind, r in items]
+
+        if distances is not None:
+            data.sort(key=lambda d: d["distance_km"])
+        else:
+            data.sort(key=lambda d: d["date"].timestamp() if d["date"] else 0, reverse=True)
+
+        return JSONResponse(status_code=200, content=jsonable_encoder({
+            "success": True,
+            "data": {"total": len(data), "results": data[:limit]},
+        }))
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon, kind=None, open_only=True, limit=500):
+        """
+        Mantenimientos y reportes cuyos lotes caen en la vista del mapa,
+        del más reciente al más antiguo.
+        """
+        if min_lat > max_lat or min_lon > max_lon:
+            raise HTTPException(status_code=400, detail="La caja es inválida: el mínimo supera al máximo")
+        lot_index.refresh(self.db)
+        positions = lot_index.bbox(min_lat, min_lon, max_lat, max_lon)
+        return self._respond(positions, None, kind, open_only, limit)
+
+    def within_radius(self, lat, lon, radius_km, kind=None, open_only=True, limit=500):
+        """Mantenimientos y reportes a menos de `radius_km` del punto, del más cercano al más lejano."""
+        lot_index.refresh(self.db)
+        positions, distances = lot_index.radius(lat, lon, radius_km)
+        return self._respond(positions, distances, kind, open_only, limit)
@@ -0,0 +1,136 @@
+# app/maintenance/ingest.py
+import json
+import os
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.maintenance.changes import record_changes
+from app.maintenance.coalesce import upsert_maintenances
+from app.maintenance.models import DeviceIot, TypeFailure
+from app.maintenance.schemas import MaintenanceCreate
+from app.maintenance.search import search_index
+from app.maintenance.snapshots import list_snapshots, MAINTENANCES_SNAPSHOT
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "10000"))
+
+
+def parse_bulk_body(body: bytes, content_type: str):
+    """
+    Devuelve [(línea, objeto | None, error | None)]. En NDJSON cada línea no
+    vacía es un ítem y un JSON inválido solo invalida esa línea; en un
+    arreglo JSON la "línea" es la posición (desde 1) dentro del arreglo.
+    """
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        entries = []
+        for number, raw in enumerate(body.splitlines(), start=1):
+            if not raw.strip():
+                continue
+            try:
+                entries.append((number, json.loads(raw), None))
+            except ValueError as e:
+                entries.append((number, None, f"JSON inválido: {e}"))
+        return entries
+
+    try:
+        items = json.loads(body or b"null")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"JSON inválido: {e}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Se esperaba un arreglo JSON o NDJSON")
+    return [(number, item, None) for number, item in enumerate(items, start=1)]
+
+
+class BulkIngestService:
+    """Alta masiva de mantenimientos generados por los gateways IoT."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _validate(self, entries):
+        """Valida cada ítem; las FKs se comprueban contra conjuntos cargados una sola vez."""
+        results, valid = {}, []
+        for number, obj, error in entries:
+            if error:
+                results[number] = {"line": number, "status": "error", "errors": [{"field": None, "message": error}]}
+                continue
+            try:
+                valid.append((number, MaintenanceCreate.model_validate(obj)))
+            except ValidationError as e:
+                results[number] = {"line": number, "status": "error", "errors": [
+                    {"field": err["loc"][-1] if err["loc"] else None, "message": err["msg"]} for err in e.errors()
+                ]}
+
+        device_ids = {item.device_iot_id for _, item in valid}
+        known_devices = {
+            row[0] for row in self.db.query(DeviceIot.id).filter(DeviceIot.id.in_(device_ids))
+        } if device_ids else set()
+        known_failures = {row[0] for row in self.db.query(TypeFailure.id)}
+
+        accepted = []
+        for number, item in valid:
+            errors = []
+            if item.device_iot_id not in known_devices:
+                errors.append({"field": "device_iot_id", "message": f"Dispositivo {item.device_iot_id} no existe"})
+            if item.type_failure_id not in known_failures:
+                errors.append({"field": "type_failure_id", "message": f"Tipo de fallo {item.type_failure_id} no existe"})
+            if errors:
+                results[number] = {"line": number, "status": "error", "errors": errors}
+            else:
+                accepted.append((number, item))
+        return results, accepted
+
+    def ingest(self, body: bytes, content_type: str):
+        """
+        Crea en una sola transacción todos los ítems válidos (estado 24) con
+        un upsert executemany: las fallas de un dispositivo y tipo que ya
+        tienen orden abierta se acumulan en ella (`coalesced`). Los
+        inválidos se informan por línea sin afectar al resto.
+        """
+        entries = parse_bulk_body(body, content_type)
+        if not entries:
+            raise HTTPException(status_code=400, detail="No se recibieron ítems")
+        if len(entries) > BULK_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Máximo {BULK_MAX_ITEMS} ítems por petición")
+
+        results, accepted = self._validate(entries)
+
+        created = coalesced = 0
+        if accepted:
+            try:
+                written = upsert_maintenances(self.db, [item.dict() for _, item in accepted])
+                # Un evento por orden: "created" si nació en este lote, "coalesced" si ya existía
+                changed = {}
+                for w in written:
+                    if w["created"] or w["id"] not in changed:
+                        changed[w["id"]] = "created" if w["created"] else "coalesced"
+                status = {w["id"]: w["status_id"] for w in written}
+                record_changes(self.db, [
+                    {"kind": "maintenance", "item_id": mid, "action": action, "status_id": status[mid]}
+                    for mid, action in changed.items()
+                ])
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                raise HTTPException(status_code=500, detail=f"Error en la carga masiva: {e}")
+            for (number, _), w in zip(accepted, written):
+                results[number] = {"line": number, "status": "created" if w["created"] else "coalesced", "id": w["id"]}
+            created   = sum(1 for w in written if w["created"])
+            coalesced = len(written) - created
+            list_snapshots.bump(MAINTENANCES_SNAPSHOT)
+            if created:
+                search_index.invalidate()
+
+        ordered = [results[number] for number, _, _ in entries]
+        return JSONResponse(status_code=200, content=jsonable_encoder({
+            "success": True,
+            "data": {
+                "received":  len(entries),
+                "created":   created,
+                "coalesced": coalesced,
+                "failed":    len(entries) - len(accepted),
+                "results":   ordered,
+            },
+        }))
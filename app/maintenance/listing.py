@@ -0,0 +1,97 @@
+# app/maintenance/listing.py
+from operator import attrgetter
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+
+class ListQuery:
+    """
+    Constructor de los listados con campos a demanda (`?fields=`). Cada
+    campo declara sus columnas y los joins que necesita, y cada join de
+    qué joins depende; la consulta solo agrega los joins de los campos
+    pedidos, así una petición estrecha es una consulta más barata.
+
+    Los joins que deciden qué filas aparecen no pueden omitirse sin más:
+    `required` los agrega siempre y `scope` es un filtro equivalente y más
+    barato (p. ej. un EXISTS) que se usa cuando ningún campo pedido los
+    necesita. Pedir menos campos nunca cambia las filas devueltas.
+    """
+
+    def __init__(self, db: Session, root):
+        self.db       = db
+        self.root     = root
+        self._joins   = {}  # nombre -> (destino, condición, dependencias, outer, required, scope)
+        self._fields  = {}  # nombre -> (columnas etiquetadas, joins, valor)
+        self._filters = []
+
+    def join(self, name: str, target, onclause, after=(), outer: bool = False, required: bool = False, scope=None):
+        """Registra un join; deben registrarse después de sus dependencias (`after`)."""
+        self._joins[name] = (target, onclause, tuple(after), outer, required, scope)
+        return self
+
+    def field(self, name: str, *columns, joins=(), value=None):
+        """
+        Registra un campo de la respuesta con las columnas etiquetadas que
+        necesita. El valor es la columna con el nombre del campo, salvo que
+        `value(row)` lo calcule a partir de varias.
+        """
+        self._fields[name] = (columns, tuple(joins), value or attrgetter(name))
+        return self
+
+    def filter(self, *criteria):
+        self._filters.extend(criteria)
+        return self
+
+    def parse_fields(self, raw: str | None):
+        """
+        Campos pedidos en `?fields=a,b` en el orden de la respuesta completa.
+        Devuelve None (todos) si no se indicó ninguno o se pidieron todos.
+        """
+        if raw is None:
+            return None
+        requested = {name.strip() for name in raw.split(",") if name.strip()}
+        unknown   = requested - self._fields.keys()
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Campos desconocidos: {', '.join(sorted(unknown))}. Disponibles: {', '.join(self._fields)}"
+            )
+        if not requested or requested == self._fields.keys():
+            return None
+        return [name for name in self._fields if name in requested]
+
+    def _add_with_dependencies(self, names, needed: set):
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self._joins[name][2])
+
+    def query(self, fields=None):
+        fields  = fields or list(self._fields)
+        columns = {}
+        needed  = set()
+        for name in fields:
+            field_columns, joins, _ = self._fields[name]
+            for column in field_columns:
+                columns.setdefault(column.name, column)
+            self._add_with_dependencies(joins, needed)
+        self._add_with_dependencies([name for name, j in self._joins.items() if j[4]], needed)
+        for name, (_, _, after, _, _, scope) in self._joins.items():
+            if scope is not None and name not in needed:
+                self._add_with_dependencies(after, needed)
+
+        q = self.db.query(*columns.values()).select_from(self.root)
+        for name, (target, onclause, _, outer, _, scope) in self._joins.items():
+            if name in needed:
+                q = q.outerjoin(target, onclause) if outer else q.join(target, onclause)
+            elif scope is not None:
+                q = q.filter(scope)
+        return q.filter(*self._filters)
+
+    def all(self, fields=None):
+        """Filas como dicts con los campos pedidos (todos con None)."""
+        fields  = fields or list(self._fields)
+        getters = [(name, self._fields[name][2]) for name in fields]
+        return [{name: get(row) for name, get in getters} for row in self.query(fields)]
@@ -3,7 +3,7 @@
 from datetime import datetime
 from sqlalchemy import (
     Table, Column, Integer, String, DateTime, JSON, ForeignKey,
-    Float, Date, CheckConstraint , Boolean
+    Float, Date, CheckConstraint , Boolean, UniqueConstraint, Index, LargeBinary, text
 )
 from sqlalchemy.orm import relationship, validates
 from app.database import Base
@@ -235,6 +235,17 @@ class Notification(Base):
     read       = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Bandeja paginada por keyset (user_id, created_at, id)
+        Index("ix_notifications_user_created", "user_id", "created_at", "id"),
+        # Índice parcial: el conteo de no leídas solo recorre las filas pendientes
+        Index(
+            "ix_notifications_user_unread", "user_id",
+            postgresql_where=read.is_(False),
+            sqlite_where=read.is_(False),
+        ),
+    )
+
     # relación inversa
     user = relationship("User", backref="notifications")
 
@@ -242,6 +253,11 @@ class Notification(Base):
         return f"<Notification(id={self.id}, type={self.type}, user_id={self.user_id})>"
     
 
+# Mantenimiento abierto (sin asignar o en proceso); mismo texto en el índice
+# parcial y en el ON CONFLICT para que Postgres/SQLite infieran el índice
+OPEN_MAINTENANCE_PREDICATE = text("maintenance_status_id IN (23, 24)")
+
+
 class Maintenance(Base):
     __tablename__ = 'maintenance'
 
@@ -251,12 +267,29 @@ class Maintenance(Base):
     description_failure   = Column(String,  nullable=True)
     date                  = Column(DateTime, default=datetime.now)
     maintenance_status_id = Column(Integer, ForeignKey('vars.id'), nullable=False)
+    # Fallas repetidas del mismo dispositivo y tipo se acumulan en la orden abierta
+    occurrence_count      = Column(Integer, nullable=False, default=1, server_default="1")
+    last_seen_at          = Column(DateTime, nullable=True)
 
     device_iot   = relationship('DeviceIot', back_populates='maintenances')
     type_failure = relationship('TypeFailure')
     status       = relationship('Vars')
     assignments  = relationship('TechnicianAssignment', back_populates='maintenance', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        # Búsqueda de mantenimientos abiertos por dispositivo (planificador preventivo)
+        Index("ix_maintenance_device_status", "device_iot_id", "maintenance_status_id"),
+        # Finalizados antiguos que mueve el archivador
+        Index("ix_maintenance_status_date", "maintenance_status_id", "date"),
+        # Como máximo una orden abierta por dispositivo y tipo de fallo
+        Index(
+            "uq_maintenance_open_failure", "device_iot_id", "type_failure_id",
+            unique=True,
+            postgresql_where=OPEN_MAINTENANCE_PREDICATE,
+            sqlite_where=OPEN_MAINTENANCE_PREDICATE,
+        ),
+    )
+
 
 class MaintenanceReport(Base):
     __tablename__ = 'maintenance_report'
@@ -273,6 +306,10 @@ class MaintenanceReport(Base):
     status       = relationship('Vars')
     assignments  = relationship('TechnicianAssignment', back_populates='report', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        Index("ix_maintenance_report_status_date", "maintenance_status_id", "date"),
+    )
+
 
 class TechnicianAssignment(Base):
     __tablename__ = 'technician_assignment'
@@ -289,6 +326,9 @@ class TechnicianAssignment(Base):
             "(maintenance_id IS NULL AND report_id IS NOT NULL)",
             name="ck_assignment_one_fk"
         ),
+        Index("ix_technician_assignment_maintenance_id", "maintenance_id"),
+        Index("ix_technician_assignment_report_id", "report_id"),
+        Index("ix_technician_assignment_user_id", "user_id"),
     )
 
     maintenance = relationship('Maintenance', back_populates='assignments')
@@ -332,3 +372,139 @@ class MaintenanceType(Base):
     name    = Column(String(50), nullable=False)
 
     details = relationship('MaintenanceDetail', back_populates='maintenance_type')
+
+
+class MaintenanceDailyRollup(Base):
+    """
+    Agregados diarios para analítica (tiempo medio de asignación y de
+    reparación). Cada fila acumula los eventos de un día para una
+    combinación de origen, tipo de fallo, lote, predio y técnico;
+    0 indica dimensión desconocida.
+    """
+    __tablename__ = 'maintenance_daily_rollup'
+
+    id              = Column(Integer, primary_key=True, index=True)
+    bucket_date     = Column(Date,       nullable=False, index=True)
+    source          = Column(String(12), nullable=False)  # 'maintenance' | 'report'
+    type_failure_id = Column(Integer,    nullable=False, default=0)
+    lot_id          = Column(Integer,    nullable=False, default=0)
+    property_id     = Column(Integer,    nullable=False, default=0)
+    technician_id   = Column(Integer,    nullable=False, default=0)
+    assigned_count  = Column(Integer,    nullable=False, default=0)
+    assign_seconds  = Column(Float,      nullable=False, default=0)
+    repaired_count  = Column(Integer,    nullable=False, default=0)
+    repair_seconds  = Column(Float,      nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "bucket_date", "source", "type_failure_id", "lot_id", "property_id", "technician_id",
+            name="uq_rollup_bucket"
+        ),
+    )
+
+
+class MaintenanceChangeEvent(Base):
+    """
+    Feed de cambios de mantenimientos y reportes para tableros: cada
+    creación, asignación, reasignación, edición o finalización agrega una
+    fila con `seq` creciente que los clientes usan como cursor (`since`).
+    """
+    __tablename__ = 'maintenance_change_event'
+
+    seq           = Column(Integer,    primary_key=True, autoincrement=True)
+    created_at    = Column(DateTime,   nullable=False, default=datetime.utcnow)
+    kind          = Column(String(12), nullable=False)  # 'maintenance' | 'report'
+    item_id       = Column(Integer,    nullable=False)
+    action        = Column(String(16), nullable=False)  # created | assigned | reassigned | updated | finalized
+    status_id     = Column(Integer,    nullable=True)
+    technician_id = Column(Integer,    nullable=True)
+    lot_id        = Column(Integer,    nullable=True)
+    property_id   = Column(Integer,    nullable=True)
+
+    # En SQLite, AUTOINCREMENT evita reutilizar el último seq si se borra la fila
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class IdempotencyKey(Base):
+    """
+    Respuesta guardada de una petición con cabecera Idempotency-Key. Mientras
+    la petición original se procesa `status_code` es NULL (reserva); al
+    terminar guarda estado, cabeceras y cuerpo para repetirlos en los
+    reintentos hasta `expires_at`.
+    """
+    __tablename__ = 'idempotency_key'
+
+    id               = Column(Integer,     primary_key=True, index=True)
+    key              = Column(String(255), nullable=False)
+    method           = Column(String(8),   nullable=False)
+    path             = Column(String(255), nullable=False)
+    request_hash     = Column(String(64),  nullable=False)
+    status_code      = Column(Integer,     nullable=True)
+    response_headers = Column(JSON,        nullable=True)
+    response_body    = Column(LargeBinary, nullable=True)
+    created_at       = Column(DateTime,    nullable=False, default=datetime.utcnow)
+    expires_at       = Column(DateTime,    nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("key", "method", "path", name="uq_idempotency_key"),
+        Index("ix_idempotency_key_expires_at", "expires_at"),
+    )
+
+
+class ExportWatermark(Base):
+    """
+    Marca de agua de la exportación columnar incremental: por cada
+    conjunto, el último `seq` de maintenance_change_event ya exportado. La
+    siguiente corrida exporta solo las filas con eventos posteriores.
+    """
+    __tablename__ = 'export_watermark'
+
+    dataset     = Column(String(40), primary_key=True)
+    watermark   = Column(Integer,    nullable=False)
+    exported_at = Column(DateTime,   nullable=False, default=datetime.utcnow)
+    rows        = Column(Integer,    nullable=False, default=0)
+
+
+# **Histórico archivado**
+def _archive_table(model, *indexes):
+    """
+    Copia de las columnas de `model` (mismos IDs, sin FKs ni autoincremento)
+    más `archived_at`. El archivador mueve aquí el histórico finalizado
+    para que las tablas calientes solo guarden el trabajo reciente.
+    """
+    hot = model.__table__
+    return Table(
+        f"{hot.name}_archive", Base.metadata,
+        *(
+            Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable, autoincrement=False)
+            for c in hot.columns
+        ),
+        Column("archived_at", DateTime, nullable=False),
+        *indexes,
+    )
+
+
+maintenance_archive = _archive_table(
+    Maintenance,
+    Index("ix_maintenance_archive_device_iot_id", "device_iot_id"),
+)
+maintenance_report_archive = _archive_table(
+    MaintenanceReport,
+    Index("ix_maintenance_report_archive_lot_id", "lot_id"),
+)
+technician_assignment_archive = _archive_table(
+    TechnicianAssignment,
+    Index("ix_technician_assignment_archive_maintenance_id", "maintenance_id"),
+    Index("ix_technician_assignment_archive_report_id", "report_id"),
+    Index("ix_technician_assignment_archive_user_id", "user_id"),
+)
+maintenance_detail_archive = _archive_table(
+    MaintenanceDetail,
+    Index("ix_maintenance_detail_archive_assignment_id", "technician_assignment_id", unique=True),
+)
+
+# Tabla caliente -> tabla de archivo
+ARCHIVE_TABLES = {
+    archive.name.removesuffix("_archive"): archive
+    for archive in (maintenance_archive, maintenance_report_archive, technician_assignment_archive, maintenance_detail_archive)
+}
@@ -1,11 +1,20 @@
 # app/maintenance/routes.py
-from datetime import datetime
-from fastapi import APIRouter, Depends, Body, Form, File, UploadFile
-from typing import List, Dict, Any
+from datetime import datetime, date
+from fastapi import APIRouter, Depends, Body, Form, File, UploadFile, Query, Header, Request
+from typing import List, Dict, Any, Literal, Optional
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.database import get_db
 from app.maintenance.services import MaintenanceService
+from app.maintenance.analytics import AnalyticsService
+from app.maintenance.search import SearchService
+from app.maintenance.changes import ChangeFeedService
+from app.maintenance.ingest import BulkIngestService
+from app.maintenance.export import ExportService
+from app.maintenance.geo import GeoService
+from app.maintenance.routing import RouteService
+from app.maintenance.dispatch import DispatchService, DISPATCH_LOAD_WEIGHT_KM
 from app.maintenance.schemas import (
     MaintenanceCreate,
     MaintenanceReportCreate,
@@ -27,9 +36,14 @@ from app.maintenance.schemas import (
 router = APIRouter(prefix="/maintenance", tags=["Maintenance"])
 
 @router.get("/", response_model=Dict)
-def get_maintenances(db: Session = Depends(get_db)) -> Any:
-    """Obtener todos los mantenimientos (tabla maintenance)."""
-    return MaintenanceService(db).get_maintenances()
+def get_maintenances(
+    include_archived: bool = Query(False, description="Incluir el histórico finalizado archivado"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por coma (por defecto todos)"),
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    db: Session = Depends(get_db),
+) -> Any:
+    """Obtener todos los mantenimientos (tabla maintenance), comprimidos con gzip/br si el cliente lo acepta."""
+    return MaintenanceService(db).get_maintenances(accept_encoding or "", include_archived, fields)
 
 @router.get("/maintenance-types", response_model=List[MaintenanceTypeSchema])
 def list_maintenance_types(db: Session = Depends(get_db)):
@@ -44,6 +58,22 @@ def create_maintenance(
     """Crear un nuevo mantenimiento (tabla maintenance)."""
     return MaintenanceService(db).create_maintenance(report)
 
+@router.post(
+    "/bulk",
+    response_model=Dict,
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/x-ndjson": {"schema": {"type": "string"}},
+        "application/json":     {"schema": {"type": "array", "items": MaintenanceCreate.model_json_schema()}},
+    }}},
+)
+async def bulk_create_maintenances(request: Request, db: Session = Depends(get_db)) -> Any:
+    """
+    Alta masiva para gateways IoT: NDJSON (un MaintenanceCreate por línea)
+    o un arreglo JSON. Responde el resultado de cada línea.
+    """
+    body = await request.body()
+    return await run_in_threadpool(BulkIngestService(db).ingest, body, request.headers.get("content-type", ""))
+
 @router.post(
     "/{maintenance_id}/assign",
     response_model=Dict
@@ -58,9 +88,14 @@ def assign_maintenance(
     return MaintenanceService(db).assign_technician(maintenance_id, user_id, assignment_date)
 
 @router.get("/reports", response_model=List[MaintenanceReportResponse])
-def get_reports(db: Session = Depends(get_db)) -> Any:
-    """Obtener todos los reportes por lote (tabla maintenance_report)."""
-    return MaintenanceService(db).get_reports()
+def get_reports(
+    include_archived: bool = Query(False, description="Incluir el histórico finalizado archivado"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por coma (por defecto todos)"),
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    db: Session = Depends(get_db),
+) -> Any:
+    """Obtener todos los reportes por lote (tabla maintenance_report), comprimidos con gzip/br si el cliente lo acepta."""
+    return MaintenanceService(db).get_reports(accept_encoding or "", include_archived, fields)
 
 @router.post(
     "/reports",
@@ -73,6 +108,17 @@ def create_report(
     """Crear un nuevo reporte por lote."""
     return MaintenanceService(db).create_report(report)
 
+@router.post("/dispatch", response_model=Dict)
+def auto_dispatch(
+    dry_run:            bool = Query(False, description="Solo devuelve el plan propuesto, sin guardar"),
+    load_weight_km:     float = Query(DISPATCH_LOAD_WEIGHT_KM, ge=0, description="Km equivalentes a una asignación abierta más"),
+    max_per_technician: Optional[int] = Query(None, ge=1, description="Máximo de asignaciones nuevas por técnico"),
+    limit:              Optional[int] = Query(None, ge=1, description="Máximo de ítems a asignar (los más antiguos)"),
+    db:                 Session = Depends(get_db)
+) -> Any:
+    """Asigna automáticamente el trabajo sin asignar equilibrando carga y distancia."""
+    return DispatchService(db).dispatch(dry_run, load_weight_km, max_per_technician, limit)
+
 @router.post("/reports/{report_id}/assign", response_model=Dict)
 def assign_report(report_id: int, assign: MaintenanceReportAssign = Body(...), db: Session = Depends(get_db)) -> Any:
     return MaintenanceService(db).assign_report_technician(report_id, assign.user_id)
@@ -82,19 +128,118 @@ def get_technicians(db: Session = Depends(get_db)) -> Any:
     """Obtener todos los usuarios con permiso 80 (técnicos)."""
     return MaintenanceService(db).get_users_with_permission()
 
+@router.get("/technicians/workload", response_model=Dict)
+def get_technicians_workload(db: Session = Depends(get_db)) -> Any:
+    """Carga de trabajo (abiertas, en proceso, finalizadas) de cada técnico con permiso 80."""
+    return MaintenanceService(db).get_technician_workload()
+
+@router.get("/analytics", response_model=Dict)
+def get_analytics(
+    start:    Optional[date] = Query(None, description="Fecha inicial (AAAA-MM-DD), por defecto hace 30 días"),
+    end:      Optional[date] = Query(None, description="Fecha final (AAAA-MM-DD), por defecto hoy"),
+    group_by: Literal["failure_type", "lot", "property", "technician", "day"] = Query("failure_type"),
+    source:   Optional[Literal["maintenance", "report"]] = Query(None, description="Filtrar por origen"),
+    db:       Session = Depends(get_db)
+) -> Any:
+    """Tiempo medio de asignación y de reparación sobre los rollups diarios."""
+    return AnalyticsService(db).get_analytics(start, end, group_by, source)
+
+@router.get("/search", response_model=Dict)
+def search(
+    q:         str = Query(..., min_length=1, description="Texto a buscar (sin distinguir acentos ni mayúsculas)"),
+    page:      int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    kind:      Optional[Literal["maintenance", "report", "detail"]] = Query(None, description="Limitar a un tipo de documento"),
+    db:        Session = Depends(get_db)
+) -> Any:
+    """Búsqueda por relevancia en descripciones de fallo y observaciones técnicas."""
+    return SearchService(db).search(q, page, page_size, kind)
+
+@router.get("/changes", response_model=Dict)
+def get_changes(
+    since: int = Query(0, ge=0, description="Último seq recibido; se devuelven los posteriores"),
+    limit: int = Query(1000, ge=1, le=5000),
+    db:    Session = Depends(get_db)
+) -> Any:
+    """Feed de cambios de estado (catch-up por cursor `seq`)."""
+    return ChangeFeedService(db).get_changes(since, limit)
+
+@router.get("/changes/stream")
+def stream_changes(
+    request:       Request,
+    since:         Optional[int] = Query(None, ge=0, description="Reenviar eventos con seq mayor a este"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """Server-Sent Events con cada creación, asignación, actualización y cierre."""
+    return ChangeFeedService.stream(request, last_event_id if last_event_id is not None else since)
+
+@router.get("/export/{dataset}")
+def export_dataset(
+    dataset: str,
+    format:  Literal["parquet", "arrow"] = Query("parquet", description="Parquet o flujo IPC de Arrow"),
+    since:   Optional[int] = Query(None, ge=0, description="Solo filas cambiadas después de este seq (X-Export-Until anterior)"),
+    db:      Session = Depends(get_db)
+):
+    """
+    Descarga columnar en streaming de maintenance, maintenance_report,
+    technician_assignment o maintenance_detail, con nombres de catálogo.
+    """
+    return ExportService(db).export(dataset, format, since)
+
+@router.get("/geo/bbox", response_model=Dict)
+def get_within_bbox(
+    min_lat:   float = Query(..., ge=-90,  le=90),
+    min_lon:   float = Query(..., ge=-180, le=180),
+    max_lat:   float = Query(..., ge=-90,  le=90),
+    max_lon:   float = Query(..., ge=-180, le=180),
+    kind:      Optional[Literal["maintenance", "report"]] = Query(None),
+    open_only: bool = Query(True, description="Solo estados sin asignar y en proceso"),
+    limit:     int = Query(500, ge=1, le=5000),
+    db:        Session = Depends(get_db)
+) -> Any:
+    """Mantenimientos y reportes dentro de la vista del mapa (caja de coordenadas)."""
+    return GeoService(db).within_bbox(min_lat, min_lon, max_lat, max_lon, kind, open_only, limit)
+
+@router.get("/geo/nearby", response_model=Dict)
+def get_nearby(
+    lat:       float = Query(..., ge=-90,  le=90),
+    lon:       float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5.0, gt=0, le=500),
+    kind:      Optional[Literal["maintenance", "report"]] = Query(None),
+    open_only: bool = Query(True, description="Solo estados sin asignar y en proceso"),
+    limit:     int = Query(500, ge=1, le=5000),
+    db:        Session = Depends(get_db)
+) -> Any:
+    """Mantenimientos y reportes a menos de `radius_km` del punto, ordenados por distancia."""
+    return GeoService(db).within_radius(lat, lon, radius_km, kind, open_only, limit)
+
 @router.get("/assigned/{technician_id}/maintenances", response_model=Dict[str, Any])
 def get_assigned_maintenances(
-    technician_id: int,
-    db:             Session = Depends(get_db)
+    technician_id:    int,
+    include_archived: bool = Query(False, description="Incluir el histórico finalizado archivado"),
+    fields:           Optional[str] = Query(None, description="Campos a devolver separados por coma (por defecto todos)"),
+    db:               Session = Depends(get_db)
 ) -> Any:
-    return MaintenanceService(db).get_assigned_maintenances_for_technician(technician_id)
+    return MaintenanceService(db).get_assigned_maintenances_for_technician(technician_id, include_archived, fields)
 
 @router.get("/assigned/{technician_id}/reports", response_model=Dict[str, Any])
 def get_assigned_reports(
+    technician_id:    int,
+    include_archived: bool = Query(False, description="Incluir el histórico finalizado archivado"),
+    fields:           Optional[str] = Query(None, description="Campos a devolver separados por coma (por defecto todos)"),
+    db:               Session = Depends(get_db)
+) -> Any:
+    return MaintenanceService(db).get_assigned_reports_for_technician(technician_id, include_archived, fields)
+
+@router.get("/assigned/{technician_id}/route", response_model=Dict[str, Any])
+def get_technician_route(
     technician_id: int,
-    db:             Session = Depends(get_db)
+    start_lat:     Optional[float] = Query(None, ge=-90,  le=90,  description="Latitud de partida del técnico"),
+    start_lon:     Optional[float] = Query(None, ge=-180, le=180, description="Longitud de partida del técnico"),
+    db:            Session = Depends(get_db)
 ) -> Any:
-    return MaintenanceService(db).get_assigned_reports_for_technician(technician_id)
+    """Asignaciones abiertas del técnico ordenadas en una ruta de visita corta."""
+    return RouteService(db).plan_route(technician_id, start_lat, start_lon)
 
 @router.post(
     "/finalize",
@@ -185,28 +330,32 @@ def maintenance_detail(
     response_model=Dict[str, Any]
 )
 def get_user_maintenances(
-    user_id: int,
-    db:      Session = Depends(get_db)
+    user_id:          int,
+    include_archived: bool = Query(False, description="Incluir el histórico finalizado archivado"),
+    fields:           Optional[str] = Query(None, description="Campos a devolver separados por coma (por defecto todos)"),
+    db:               Session = Depends(get_db)
 ) -> Any:
     """
     GET /maintenance/user/{user_id}/maintenances
     Obtiene todos los mantenimientos IoT creados en predios del usuario.
     """
-    return MaintenanceService(db).get_maintenances_by_user(user_id)
+    return MaintenanceService(db).get_maintenances_by_user(user_id, include_archived, fields)
 
 @router.get(
     "/user/{user_id}/reports",
     response_model=Dict[str, Any]
 )
 def get_user_reports(
-    user_id: int,
-    db:      Session = Depends(get_db)
+    user_id:          int,
+    include_archived: bool = Query(False, description="Incluir el histórico finalizado archivado"),
+    fields:           Optional[str] = Query(None, description="Campos a devolver separados por coma (por defecto todos)"),
+    db:               Session = Depends(get_db)
 ) -> Any:
     """
     GET /maintenance/user/{user_id}/reports
     Obtiene todos los reportes por lote creados en predios del usuario.
     """
-    return MaintenanceService(db).get_reports_by_user(user_id)
+    return MaintenanceService(db).get_reports_by_user(user_id, include_archived, fields)
 
 
 
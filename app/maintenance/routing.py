@@ -0,0 +1,173 @@
+# app/maintenance/routing.py
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.maintenance.geo import OPEN_STATUSES, haversine_km
+from app.maintenance.models import (
+    DeviceIot, Lot, Maintenance, MaintenanceReport, TechnicianAssignment, TypeFailure, User
+)
+
+MAX_TWO_OPT_PASSES = 50
+
+
+def distance_matrix(lats, lons) -> np.ndarray:
+    """Matriz n x n de distancias haversine (km), calculada en bloque con broadcasting."""
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    return haversine_km(lats[:, None], lons[:, None], lats[None, :], lons[None, :])
+
+
+def nearest_neighbour(dist: np.ndarray, start: int = 0) -> np.ndarray:
+    """Recorrido voraz: desde `start`, siempre al nodo no visitado más cercano."""
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    order = np.empty(n, dtype=np.int64)
+    current = start
+    for k in range(n):
+        order[k] = current
+        visited[current] = True
+        if k == n - 1:
+            break
+        candidates = np.where(visited, np.inf, dist[current])
+        current = int(np.argmin(candidates))
+    return order
+
+
+def two_opt(order: np.ndarray, dist: np.ndarray, max_passes: int = MAX_TWO_OPT_PASSES) -> np.ndarray:
+    """
+    Mejora 2-opt de un camino abierto con el primer nodo fijo: invierte el
+    tramo order[i..j] si acorta el recorrido. Para cada i se evalúan todos
+    los j a la vez con NumPy y se aplica la mejor inversión.
+    """
+    order = order.copy()
+    n = len(order)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            a, b = order[i - 1], order[i]
+            js = np.arange(i + 1, n)
+            c = order[js]
+            # Nodo siguiente a cada j; el último tramo no tiene siguiente (camino abierto)
+            has_next = js + 1 < n
+            d = order[np.minimum(js + 1, n - 1)]
+            delta = (
+                dist[a, c] - dist[a, b]
+                + np.where(has_next, dist[b, d] - dist[c, d], 0.0)
+            )
+            k = int(np.argmin(delta))
+            if delta[k] < -1e-9:
+                j = js[k]
+                order[i:j + 1] = order[i:j + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return order
+
+
+def path_length(order: np.ndarray, dist: np.ndarray) -> float:
+    return float(dist[order[:-1], order[1:]].sum()) if len(order) > 1 else 0.0
+
+
+class RouteService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _open_stops(self, technician_id: int):
+        """Asignaciones abiertas del técnico (mantenimientos y reportes) con las coordenadas del lote."""
+        A = TechnicianAssignment
+        maintenances = (
+            self.db.query(
+                A.id.label("technician_assignment_id"), A.assignment_date,
+                Maintenance.id.label("item_id"), Maintenance.description_failure,
+                TypeFailure.name.label("failure_type"),
+                Lot.id.label("lot_id"), Lot.name.label("lot_name"), Lot.latitude, Lot.longitude,
+            )
+            .select_from(A)
+            .join(Maintenance, A.maintenance_id == Maintenance.id)
+            .join(DeviceIot,   Maintenance.device_iot_id == DeviceIot.id)
+            .join(Lot,         DeviceIot.lot_id == Lot.id)
+            .outerjoin(TypeFailure, Maintenance.type_failure_id == TypeFailure.id)
+            .filter(A.user_id == technician_id, Maintenance.maintenance_status_id.in_(OPEN_STATUSES))
+            .all()
+        )
+        reports = (
+            self.db.query(
+                A.id.label("technician_assignment_id"), A.assignment_date,
+                MaintenanceReport.id.label("item_id"), MaintenanceReport.description_failure,
+                TypeFailure.name.label("failure_type"),
+                Lot.id.label("lot_id"), Lot.name.label("lot_name"), Lot.latitude, Lot.longitude,
+            )
+            .select_from(A)
+            .join(MaintenanceReport, A.report_id == MaintenanceReport.id)
+            .join(Lot,               MaintenanceReport.lot_id == Lot.id)
+            .outerjoin(TypeFailure, MaintenanceReport.type_failure_id == TypeFailure.id)
+            .filter(A.user_id == technician_id, MaintenanceReport.maintenance_status_id.in_(OPEN_STATUSES))
+            .all()
+        )
+        stops = [("maintenance", r) for r in maintenances] + [("report", r) for r in reports]
+        # Orden actual (por fecha de asignación) como referencia del ahorro
+        stops.sort(key=lambda s: (s[1].assignment_date is None, s[1].assignment_date or 0, s[1].technician_assignment_id))
+        return stops
+
+    def plan_route(self, technician_id: int, start_lat: float | None = None, start_lon: float | None = None):
+        """
+        Ordena las asignaciones abiertas del técnico en una ruta corta:
+        matriz de distancias haversine vectorizada, vecino más cercano y 2-opt.
+        Sin punto de partida se agrega un nodo ficticio a distancia 0 de todos,
+        de modo que la ruta puede empezar en cualquier parada.
+        """
+        if (start_lat is None) != (start_lon is None):
+            raise HTTPException(status_code=400, detail="start_lat y start_lon deben enviarse juntos")
+        if not self.db.get(User, technician_id):
+            raise HTTPException(status_code=404, detail="Técnico no encontrado")
+
+        stops = self._open_stops(technician_id)
+        has_start = start_lat is not None
+
+        lats = [s.latitude for _, s in stops]
+        lons = [s.longitude for _, s in stops]
+        if has_start:
+            dist = distance_matrix([start_lat] + lats, [start_lon] + lons)
+        else:
+            dist = np.zeros((len(stops) + 1, len(stops) + 1))
+            dist[1:, 1:] = distance_matrix(lats, lons)
+
+        baseline = np.arange(len(stops) + 1)
+        order = two_opt(nearest_neighbour(dist), dist) if stops else baseline
+
+        data, cumulative = [], 0.0
+        for position, node in enumerate(order[1:], start=1):
+            kind, s = stops[node - 1]
+            leg = float(dist[order[position - 1], node])
+            cumulative += leg
+            data.append({
+                "sequence":                 position,
+                "technician_assignment_id": s.technician_assignment_id,
+                "kind":                     kind,
+                "maintenance_id":           s.item_id if kind == "maintenance" else None,
+                "report_id":                s.item_id if kind == "report" else None,
+                "lot_id":                   s.lot_id,
+                "lot_name":                 s.lot_name,
+                "latitude":                 s.latitude,
+                "longitude":                s.longitude,
+                "failure_type":             s.failure_type,
+                "description_failure":      s.description_failure,
+                "assigned_at":              s.assignment_date,
+                "leg_km":                   round(leg, 3),
+                "cumulative_km":            round(cumulative, 3),
+            })
+
+        return JSONResponse(status_code=200, content=jsonable_encoder({
+            "success": True,
+            "data": {
+                "technician_id":         technician_id,
+                "start":                 {"latitude": start_lat, "longitude": start_lon} if has_start else None,
+                "stops":                 len(data),
+                "total_distance_km":     round(path_length(order, dist), 3),
+                "unordered_distance_km": round(path_length(baseline, dist), 3),
+                "route":                 data,
+            },
+        }))
@@ -0,0 +1,274 @@
+# app/maintenance/scheduler.py
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import (
+    DateTime, Integer, String, column, exists, func, insert, literal, select, text, update, values
+)
+from sqlalchemy.orm import Session
+
+from app.maintenance.archive import with_archived
+from app.maintenance.changes import record_changes
+from app.maintenance.snapshots import list_snapshots, MAINTENANCES_SNAPSHOT
+from app.database import dialect_insert
+from app.maintenance.models import (
+    DeviceIot, Maintenance, MaintenanceDetail, MaintenanceInterval, OPEN_MAINTENANCE_PREDICATE,
+    TechnicianAssignment,
+)
+
+PREVENTIVE_TYPE_FAILURE_ID = int(os.getenv("PREVENTIVE_TYPE_FAILURE_ID", "1"))
+PREVENTIVE_DESCRIPTION     = "Mantenimiento preventivo programado"
+SCHEDULER_INTERVAL         = float(os.getenv("MAINTENANCE_SCHEDULER_INTERVAL", "0"))  # 0 = desactivado
+
+STATUS_UNASSIGNED = 24
+OPEN_STATUSES     = (23, 24)
+
+# Clave del advisory lock de Postgres que serializa corridas solapadas
+SCHEDULER_LOCK_KEY = 7_240_032
+
+UPDATE_CHUNK = 5000
+
+
+def next_due_date(previous: datetime, days: int, now: datetime) -> datetime:
+    """Avanza `previous` en múltiplos de `days` hasta quedar después de `now` (conserva la cadencia)."""
+    if previous is None:
+        return now + timedelta(days=days)
+    periods = (now - previous).days // days + 1
+    return previous + timedelta(days=days * periods)
+
+
+def _acquire_lock(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        # SQLite serializa las escrituras; la sentencia única ya es atómica
+        return True
+    return bool(db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": SCHEDULER_LOCK_KEY}).scalar())
+
+
+def _due_devices(now: datetime):
+    """
+    Condiciones de dispositivo vencido; requieren el join con
+    MaintenanceInterval. Sin intervalo válido (nulo o días <= 0) no hay
+    reprogramación posible y el dispositivo recibiría una orden en cada
+    corrida, así que queda fuera del conteo, del INSERT y del UPDATE.
+    """
+    open_maintenance = exists().where(
+        Maintenance.device_iot_id == DeviceIot.id,
+        Maintenance.maintenance_status_id.in_(OPEN_STATUSES),
+    )
+    return DeviceIot.estimated_maintenance_date <= now, MaintenanceInterval.days > 0, ~open_maintenance
+
+
+def generate_due_maintenances(
+    db: Session,
+    now: datetime | None = None,
+    type_failure_id: int = PREVENTIVE_TYPE_FAILURE_ID,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Genera mantenimientos preventivos (estado 24) para todos los dispositivos
+    con `estimated_maintenance_date` vencida, intervalo de días positivo y
+    sin mantenimiento abierto:
+      - un único INSERT ... SELECT crea todas las órdenes
+      - la próxima fecha de cada dispositivo avanza según MaintenanceInterval.days
+        con un UPDATE masivo por clave primaria
+    Corridas solapadas no generan duplicados: el advisory lock de Postgres las
+    serializa y el NOT EXISTS se evalúa en la misma sentencia del INSERT; el
+    ON CONFLICT sobre uq_maintenance_open_failure cubre a los demás escritores.
+    """
+    now = now or datetime.now()
+
+    if dry_run:
+        due = (
+            db.query(DeviceIot.id)
+            .join(MaintenanceInterval, MaintenanceInterval.id == DeviceIot.maintenance_interval_id)
+            .filter(*_due_devices(now))
+            .count()
+        )
+        return {"due": due, "created": 0, "rescheduled": 0}
+
+    if not _acquire_lock(db):
+        logging.info("Planificador preventivo: otra corrida en curso, se omite.")
+        return {"due": None, "created": 0, "rescheduled": 0, "skipped": True}
+
+    source = select(
+        DeviceIot.id,
+        literal(type_failure_id, Integer),
+        literal(PREVENTIVE_DESCRIPTION, String),
+        literal(now, DateTime),
+        literal(STATUS_UNASSIGNED, Integer),
+        literal(now, DateTime),
+    ).join(MaintenanceInterval, MaintenanceInterval.id == DeviceIot.maintenance_interval_id).where(*_due_devices(now))
+
+    columns = ["device_iot_id", "type_failure_id", "description_failure", "date", "maintenance_status_id", "last_seen_at"]
+    upsert_insert = dialect_insert(db.get_bind())
+    if upsert_insert is not None:
+        # Una orden abierta creada en paralelo (gateway, carga masiva) gana sin abortar la corrida
+        stmt = upsert_insert(Maintenance).from_select(columns, source).on_conflict_do_nothing(
+            index_elements=["device_iot_id", "type_failure_id"], index_where=OPEN_MAINTENANCE_PREDICATE,
+        )
+    else:
+        stmt = insert(Maintenance).from_select(columns, source)
+    stmt = stmt.returning(Maintenance.id, Maintenance.device_iot_id)
+    created = db.execute(stmt).all()
+    device_ids = [row.device_iot_id for row in created]
+
+    rescheduled = 0
+    for i in range(0, len(device_ids), UPDATE_CHUNK):
+        chunk = device_ids[i:i + UPDATE_CHUNK]
+        rows = (
+            db.query(DeviceIot.id, DeviceIot.estimated_maintenance_date, MaintenanceInterval.days)
+            .join(MaintenanceInterval, MaintenanceInterval.id == DeviceIot.maintenance_interval_id)
+            .filter(DeviceIot.id.in_(chunk), MaintenanceInterval.days > 0)
+            .all()
+        )
+        params = [
+            {"id": r.id, "estimated_maintenance_date": next_due_date(r.estimated_maintenance_date, r.days, now)}
+            for r in rows
+        ]
+        if params:
+            db.execute(update(DeviceIot), params)
+            rescheduled += len(params)
+
+    record_changes(db, [
+        {"kind": "maintenance", "item_id": row.id, "action": "created", "status_id": STATUS_UNASSIGNED}
+        for row in created
+    ])
+    db.commit()
+    if device_ids:
+        list_snapshots.bump(MAINTENANCES_SNAPSHOT)
+    logging.info(f"Planificador preventivo: {len(device_ids)} mantenimientos creados, {rescheduled} dispositivos reprogramados.")
+    return {"due": len(device_ids), "created": len(device_ids), "rescheduled": rescheduled}
+
+
+def advance_device_schedule(db: Session, device_iot_id: int, serviced_at: datetime):
+    """
+    Tras finalizar un mantenimiento, fija la próxima fecha del dispositivo
+    en `serviced_at` + días de su intervalo. No hace commit.
+    """
+    days = (
+        db.query(MaintenanceInterval.days)
+        .join(DeviceIot, DeviceIot.maintenance_interval_id == MaintenanceInterval.id)
+        .filter(DeviceIot.id == device_iot_id)
+        .scalar()
+    )
+    if not days or days <= 0:
+        return None
+    next_date = serviced_at + timedelta(days=days)
+    db.execute(
+        update(DeviceIot)
+        .where(DeviceIot.id == device_iot_id)
+        .values(estimated_maintenance_date=next_date)
+        .execution_options(synchronize_session=False)
+    )
+    return next_date
+
+
+def recompute_estimated_dates(db: Session) -> dict:
+    """
+    Recalcula `estimated_maintenance_date` de toda la flota:
+      próxima fecha = último servicio (o instalación) + días del intervalo.
+    El último servicio incluye el histórico archivado, así un dispositivo
+    cuyo cierre ya se archivó no vuelve a su fecha de instalación.
+    Los datos se leen en una sola consulta, el cálculo se hace vectorizado con
+    NumPy y solo se escriben los dispositivos cuya fecha cambia, con un UPDATE
+    masivo desde una lista VALUES en Postgres (executemany en otros motores).
+    """
+    TA = with_archived(TechnicianAssignment, True)
+    MD = with_archived(MaintenanceDetail, True)
+    M  = with_archived(Maintenance, True)
+    last_service = (
+        select(
+            M.device_iot_id.label("device_iot_id"),
+            func.max(MD.date).label("last_service"),
+        )
+        .join(TA, TA.maintenance_id == M.id)
+        .join(MD, MD.technician_assignment_id == TA.id)
+        .group_by(M.device_iot_id)
+        .subquery()
+    )
+    rows = (
+        db.query(
+            DeviceIot.id,
+            MaintenanceInterval.days,
+            func.coalesce(last_service.c.last_service, DeviceIot.installation_date),
+            DeviceIot.estimated_maintenance_date,
+        )
+        .join(MaintenanceInterval, MaintenanceInterval.id == DeviceIot.maintenance_interval_id)
+        .outerjoin(last_service, last_service.c.device_iot_id == DeviceIot.id)
+        .filter(MaintenanceInterval.days > 0)
+        .all()
+    )
+    if not rows:
+        return {"devices": 0, "updated": 0}
+
+    ids, days, base, current = zip(*rows)
+    ids     = np.asarray(ids, dtype=np.int64)
+    days    = np.asarray(days, dtype="timedelta64[D]")
+    base    = np.asarray(base, dtype="datetime64[us]")
+    current = np.asarray(current, dtype="datetime64[us]")
+
+    next_dates = base + days
+    changed = ~np.isnat(next_dates) & (np.isnat(current) | (next_dates != current))
+
+    params = list(zip(ids[changed].tolist(), next_dates[changed].tolist()))
+    for i in range(0, len(params), UPDATE_CHUNK):
+        _bulk_update_dates(db, params[i:i + UPDATE_CHUNK])
+    db.commit()
+    return {"devices": len(ids), "updated": len(params)}
+
+
+def _bulk_update_dates(db: Session, params):
+    if db.get_bind().dialect.name == "postgresql":
+        data = values(column("id", Integer), column("next_date", DateTime), name="v").data(params)
+        db.execute(
+            update(DeviceIot)
+            .where(DeviceIot.id == data.c.id)
+            .values(estimated_maintenance_date=data.c.next_date)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        db.execute(update(DeviceIot), [{"id": i, "estimated_maintenance_date": d} for i, d in params])
+
+
+def run_scheduled():
+    """Corrida periódica con su propia sesión (la registra app.main)."""
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        generate_due_maintenances(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    """
+    CLI: python -m app.maintenance.scheduler [--dry-run] [--now AAAA-MM-DDTHH:MM] [--type-failure-id N]
+         python -m app.maintenance.scheduler --recompute-dates
+    """
+    parser = argparse.ArgumentParser(description="Genera mantenimientos preventivos vencidos")
+    parser.add_argument("--now", type=datetime.fromisoformat, default=None, help="Fecha de referencia")
+    parser.add_argument("--type-failure-id", type=int, default=PREVENTIVE_TYPE_FAILURE_ID)
+    parser.add_argument("--dry-run", action="store_true", help="Solo cuenta los dispositivos vencidos")
+    parser.add_argument("--recompute-dates", action="store_true",
+                        help="Recalcula estimated_maintenance_date de toda la flota en lugar de generar órdenes")
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        if args.recompute_dates:
+            result = recompute_estimated_dates(db)
+        else:
+            result = generate_due_maintenances(db, args.now, args.type_failure_id, args.dry_run)
+        print(result)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# app/maintenance/search.py
+import bisect
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from collections import defaultdict
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.maintenance.models import Maintenance, MaintenanceDetail, MaintenanceReport, TechnicianAssignment
+
+SEARCH_KINDS = ("maintenance", "report", "detail")
+
+# **Postgres: tsvector (español, sin acentos) + trigramas**
+_PG_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() no es IMMUTABLE; el envoltorio permite usarlo en índices
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_maintenance_description_fts ON maintenance
+    USING gin (to_tsvector('spanish', f_unaccent(coalesce(description_failure, ''))))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_maintenance_description_trgm ON maintenance
+    USING gin (f_unaccent(lower(coalesce(description_failure, ''))) gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_maintenance_report_description_fts ON maintenance_report
+    USING gin (to_tsvector('spanish', f_unaccent(coalesce(description_failure, ''))))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_maintenance_report_description_trgm ON maintenance_report
+    USING gin (f_unaccent(lower(coalesce(description_failure, ''))) gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_maintenance_detail_remarks_fts ON maintenance_detail
+    USING gin (to_tsvector('spanish', f_unaccent(coalesce(fault_remarks, '') || ' ' || coalesce(solution_remarks, ''))))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_maintenance_detail_remarks_trgm ON maintenance_detail
+    USING gin (f_unaccent(lower(coalesce(fault_remarks, '') || ' ' || coalesce(solution_remarks, ''))) gin_trgm_ops)
+    """,
+]
+
+_PG_TSQUERY = "websearch_to_tsquery('spanish', f_unaccent(:q))"
+_PG_PATTERN = "'%' || f_unaccent(lower(:q)) || '%'"
+
+# (kind, FROM, id, maintenance_id, report_id, documento indexado, fecha)
+_PG_SOURCES = {
+    "maintenance": (
+        "maintenance m", "m.id", "m.id", "NULL::int",
+        "coalesce(m.description_failure, '')", "m.date",
+    ),
+    "report": (
+        "maintenance_report r", "r.id", "NULL::int", "r.id",
+        "coalesce(r.description_failure, '')", "r.date",
+    ),
+    "detail": (
+        "maintenance_detail d JOIN technician_assignment ta ON ta.id = d.technician_assignment_id",
+        "d.id", "ta.maintenance_id", "ta.report_id",
+        "coalesce(d.fault_remarks, '') || ' ' || coalesce(d.solution_remarks, '')", "d.date",
+    ),
+}
+
+
+def _pg_search_sql(kinds) -> str:
+    """
+    Una rama por tabla; las condiciones repiten exactamente las expresiones
+    de los índices GIN para que el planificador pueda usarlos.
+    """
+    branches = []
+    for kind in kinds:
+        source, id_col, maintenance_id, report_id, doc, date_col = _PG_SOURCES[kind]
+        branches.append(f"""
+        SELECT '{kind}' AS kind, {id_col} AS id, {maintenance_id} AS maintenance_id, {report_id} AS report_id,
+               {doc} AS text, {date_col} AS date,
+               ts_rank(to_tsvector('spanish', f_unaccent({doc})), {_PG_TSQUERY})
+                 + CASE WHEN f_unaccent(lower({doc})) LIKE {_PG_PATTERN} THEN 0.1 ELSE 0 END AS score
+        FROM {source}
+        WHERE to_tsvector('spanish', f_unaccent({doc})) @@ {_PG_TSQUERY}
+           OR f_unaccent(lower({doc})) LIKE {_PG_PATTERN}""")
+    return (
+        "SELECT docs.*, count(*) OVER () AS total FROM ("
+        + " UNION ALL ".join(branches)
+        + ") docs ORDER BY score DESC, date DESC LIMIT :limit OFFSET :offset"
+    )
+
+
+_pg_search_ready = False
+
+
+def setup_search(engine):
+    """
+    Crea en Postgres los índices GIN de texto completo y trigramas. Si el
+    motor no es Postgres o faltan privilegios para las extensiones, la
+    búsqueda usa el índice invertido en memoria.
+    """
+    global _pg_search_ready
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as conn:
+            for ddl in _PG_SETUP:
+                conn.execute(text(ddl))
+        _pg_search_ready = True
+    except Exception as e:
+        logging.warning(f"Búsqueda de texto completo en Postgres no disponible, se usa índice en memoria: {e}")
+
+
+# **Índice invertido en memoria (SQLite / pruebas)**
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los",
+    "no", "o", "para", "por", "se", "sin", "su", "un", "una", "y",
+}
+_SUFFIXES = (
+    "amientos", "imientos", "amiento", "imiento", "aciones", "uciones", "adoras", "adores",
+    "ancias", "encias", "acion", "ucion", "mente", "adora", "ador", "ancia", "encia",
+    "ando", "iendo", "adas", "idas", "ados", "idos", "ada", "ida", "ado", "ido",
+    "ces", "es", "as", "os", "s", "a", "o", "e",
+)
+
+
+def fold(value: str) -> str:
+    """Minúsculas y sin acentos: 'Válvula' -> 'valvula'."""
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stem(token: str) -> str:
+    """Stemmer ligero para español: recorta el sufijo más largo dejando al menos 3 letras."""
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)]
+    return token
+
+
+def analyze(value: str | None):
+    if not value:
+        return []
+    return [stem(t) for t in _TOKEN.findall(fold(value)) if t not in _STOPWORDS]
+
+
+class InvertedIndex:
+    """
+    Índice invertido de las observaciones de mantenimientos, reportes y
+    detalles. Se reconstruye de forma perezosa cuando los servicios lo
+    invalidan o cuando cambia la firma (conteo e ID máximo) de las tablas.
+    """
+
+    def __init__(self, max_age: float = 60.0):
+        self.max_age    = max_age
+        self._lock      = threading.Lock()
+        self._stale     = True
+        self._built_at  = 0.0
+        self._signature = None
+        self.postings   = {}
+        self.vocabulary = []
+        self.docs       = {}
+
+    def invalidate(self):
+        self._stale = True
+
+    def _table_signature(self, db: Session):
+        return tuple(
+            tuple(db.query(func.count(model.id), func.max(model.id)).one())
+            for model in (Maintenance, MaintenanceReport, MaintenanceDetail)
+        )
+
+    def _load_documents(self, db: Session):
+        for r in db.query(Maintenance.id, Maintenance.description_failure, Maintenance.date):
+            yield ("maintenance", r.id), {"maintenance_id": r.id, "report_id": None, "text": r.description_failure, "date": r.date}
+        for r in db.query(MaintenanceReport.id, MaintenanceReport.description_failure, MaintenanceReport.date):
+            yield ("report", r.id), {"maintenance_id": None, "report_id": r.id, "text": r.description_failure, "date": r.date}
+        rows = (
+            db.query(
+                MaintenanceDetail.id, MaintenanceDetail.fault_remarks, MaintenanceDetail.solution_remarks,
+                MaintenanceDetail.date, TechnicianAssignment.maintenance_id, TechnicianAssignment.report_id,
+            )
+            .join(TechnicianAssignment, TechnicianAssignment.id == MaintenanceDetail.technician_assignment_id)
+        )
+        for r in rows:
+            body = " ".join(filter(None, [r.fault_remarks, r.solution_remarks]))
+            yield ("detail", r.id), {"maintenance_id": r.maintenance_id, "report_id": r.report_id, "text": body, "date": r.date}
+
+    def refresh(self, db: Session):
+        with self._lock:
+            expired = time.monotonic() - self._built_at > self.max_age
+            if not (self._stale or expired):
+                return
+            signature = self._table_signature(db)
+            if not self._stale and signature == self._signature:
+                self._built_at = time.monotonic()
+                return
+
+            postings = defaultdict(dict)
+            docs = {}
+            for key, doc in self._load_documents(db):
+                docs[key] = doc
+                for token in analyze(doc["text"]):
+                    postings[token][key] = postings[token].get(key, 0) + 1
+
+            self.postings   = dict(postings)
+            self.vocabulary = sorted(self.postings)
+            self.docs       = docs
+            self._signature = signature
+            self._built_at  = time.monotonic()
+            self._stale     = False
+
+    def _matching_terms(self, term: str):
+        """Términos del vocabulario que empiezan por `term` (búsqueda por prefijo)."""
+        i = bisect.bisect_left(self.vocabulary, term)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(term):
+            yield self.vocabulary[i]
+            i += 1
+
+    def search(self, query: str, kind: str | None = None):
+        terms = analyze(query)
+        if not terms:
+            return []
+        total_docs = max(1, len(self.docs))
+        scores = None
+        for term in terms:
+            term_scores = defaultdict(float)
+            for vocab_term in self._matching_terms(term):
+                postings = self.postings[vocab_term]
+                idf = math.log(1 + total_docs / len(postings))
+                for key, tf in postings.items():
+                    term_scores[key] += idf * tf / (tf + 1)
+            # Todas las palabras de la consulta deben aparecer (AND)
+            scores = term_scores if scores is None else {
+                k: v + term_scores[k] for k, v in scores.items() if k in term_scores
+            }
+            if not scores:
+                return []
+        results = [
+            (score, key) for key, score in scores.items() if kind is None or key[0] == kind
+        ]
+        results.sort(key=lambda item: (item[0], self.docs[item[1]]["date"] or datetime.min), reverse=True)
+        return results
+
+
+search_index = InvertedIndex()
+
+
+class SearchService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def search(self, q: str, page: int = 1, page_size: int = 20, kind: str | None = None):
+        """
+        Búsqueda por relevancia sobre descripciones de fallo y observaciones
+        técnicas, paginada. Postgres usa tsvector en español sin acentos más
+        trigramas; otros motores usan el índice invertido en memoria.
+        """
+        q = (q or "").strip()
+        if not q:
+            raise HTTPException(status_code=400, detail="El parámetro q es obligatorio")
+        if kind is not None and kind not in SEARCH_KINDS:
+            raise HTTPException(status_code=400, detail=f"kind debe ser uno de {list(SEARCH_KINDS)}")
+
+        offset = (page - 1) * page_size
+        if _pg_search_ready:
+            sql = _pg_search_sql([kind] if kind else SEARCH_KINDS)
+            rows = self.db.execute(text(sql), {"q": q, "limit": page_size, "offset": offset}).mappings().all()
+            total = rows[0]["total"] if rows else 0
+            results = [{
+                "kind":           r["kind"],
+                "id":             r["id"],
+                "maintenance_id": r["maintenance_id"],
+                "report_id":      r["report_id"],
+                "text":           r["text"],
+                "date":           r["date"],
+                "score":          round(float(r["score"]), 4),
+            } for r in rows]
+        else:
+            search_index.refresh(self.db)
+            matches = search_index.search(q, kind)
+            total = len(matches)
+            results = []
+            for score, (doc_kind, doc_id) in matches[offset:offset + page_size]:
+                doc = search_index.docs[(doc_kind, doc_id)]
+                results.append({
+                    "kind":           doc_kind,
+                    "id":             doc_id,
+                    "maintenance_id": doc["maintenance_id"],
+                    "report_id":      doc["report_id"],
+                    "text":           doc["text"],
+                    "date":           doc["date"],
+                    "score":          round(score, 4),
+                })
+
+        return JSONResponse(status_code=200, content=jsonable_encoder({
+            "success": True,
+            "data": {"total": total, "page": page, "page_size": page_size, "results": results},
+        }))
@@ -1,12 +1,17 @@
 # app/maintenance/services.py
+import os
 from typing import List
 from datetime import datetime
 from uuid import uuid4
 from fastapi import HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, case, exists, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, aliased  
 from app.firebase_config import bucket  
+from app.metrics import UPLOAD_DURATION
+from app.cache import TTLCache
 
 from app.maintenance.models import (
     Maintenance,
@@ -29,6 +34,18 @@ from app.maintenance.models import (
     failure_solution_maintenance_type_table
 )
 from app.maintenance.schemas import MaintenanceDetailCreate , MaintenanceTypeSchema , MaintenanceUpdate
+from app.maintenance.analytics import record_assignment, record_finalization
+from app.maintenance.scheduler import advance_device_schedule
+from app.maintenance.search import search_index
+from app.maintenance.changes import record_change
+from app.maintenance.coalesce import upsert_maintenances
+from app.maintenance.archive import with_archived
+from app.maintenance.listing import ListQuery
+from app.maintenance.snapshots import list_snapshots, owner_views, MAINTENANCES_SNAPSHOT, REPORTS_SNAPSHOT
+from app.notifications.services import publish_notification
+
+# Carga de trabajo por técnico: se invalida al asignar/finalizar y expira pronto
+workload_cache = TTLCache(ttl=float(os.getenv("WORKLOAD_CACHE_TTL", "30")))
 
 def _upload(file: UploadFile, folder: str) -> str:
     """
@@ -37,76 +54,141 @@ def _upload(file: UploadFile, folder: str) -> str:
     """
     ext = file.filename.rsplit('.', 1)[-1]
     blob_name = f"{folder}/{uuid4()}.{ext}"
-    blob = bucket.blob(blob_name)
-    content = file.file.read()
-    blob.upload_from_string(content, content_type=file.content_type)
-    blob.make_public()  
+    with UPLOAD_DURATION.time(folder):
+        blob = bucket.blob(blob_name)
+        content = file.file.read()
+        blob.upload_from_string(content, content_type=file.content_type)
+        blob.make_public()  
     return blob.public_url
 
+def _primary_owners():
+    """
+    Subconsulta property_id -> owner_id con un único propietario por predio
+    (el de menor user_id). Unir los listados a user_property directamente
+    repetía cada mantenimiento o reporte una vez por copropietario.
+    """
+    return (
+        select(PropertyUser.property_id, func.min(PropertyUser.user_id).label("owner_id"))
+        .group_by(PropertyUser.property_id)
+        .subquery("primary_owner")
+    )
+
+def _location_joins(q: ListQuery, lot_id, after=()):
+    """
+    Lote, predio (property_lot) y nombre del predio a partir de la FK
+    `lot_id`. property_lot define las filas (un ítem por predio del lote)
+    y siempre se une; lot y property solo si se piden sus campos.
+    """
+    q.join("lot",          Lot,         Lot.id == lot_id,                       after=after)
+    q.join("property_lot", PropertyLot, PropertyLot.lot_id == lot_id,           after=after, required=True)
+    q.join("property",     Property,    Property.id == PropertyLot.property_id, after=("property_lot",))
+
+def _owner_joins(q: ListQuery):
+    """
+    Propietario principal del predio. Solo se une si se pide
+    owner_document; si no, un EXISTS sobre user_property conserva las
+    mismas filas sin el GROUP BY de _primary_owners.
+    """
+    PrimaryOwner = _primary_owners()
+    Owner        = aliased(User, name="owner")
+    q.join(
+        "primary_owner", PrimaryOwner, PrimaryOwner.c.property_id == PropertyLot.property_id,
+        after=("property_lot",), scope=exists().where(PropertyUser.property_id == PropertyLot.property_id),
+    )
+    q.join("owner", Owner, Owner.id == PrimaryOwner.c.owner_id, after=("primary_owner",))
+    return Owner
+
+def _catalog_joins(q: ListQuery, Item):
+    q.join("type_failure", TypeFailure, Item.type_failure_id == TypeFailure.id)
+    q.join("status",       Vars,        Item.maintenance_status_id == Vars.id)
+
+def _rebucket(db: Session, asgmt: TechnicianAssignment, change):
+    """
+    Mueve los buckets de analítica de una asignación (y de su reparación,
+    si ya se cerró) cuando cambia una de sus dimensiones: los descuenta,
+    aplica `change()` y los vuelve a sumar con los valores nuevos.
+    """
+    record_assignment(db, asgmt, sign=-1)
+    if asgmt.detail:
+        record_finalization(db, asgmt, asgmt.detail, sign=-1)
+    change()
+    record_assignment(db, asgmt)
+    if asgmt.detail:
+        record_finalization(db, asgmt, asgmt.detail)
+
+def _technician_name(row):
+    # Si no hay técnico asignado: technician_id = None, name = None
+    if not row.technician_id:
+        return None
+    # filter(None, ...) quita None o cadenas vacías
+    return " ".join(filter(None, [row.tech_name, row.tech_last1, row.tech_last2]))
+
+def _technician_fields(q: ListQuery, TA, onclause):
+    """technician_id y technician_name de la asignación (si existe) del ítem."""
+    Tech = aliased(User, name="tech")
+    q.join("ta",   TA,   onclause,              outer=True)
+    q.join("tech", Tech, Tech.id == TA.user_id, outer=True, after=("ta",))
+    q.field("technician_id", TA.user_id.label("technician_id"), joins=("ta",))
+    q.field(
+        "technician_name",
+        TA.user_id.label("technician_id"),
+        Tech.name.label("tech_name"),
+        Tech.first_last_name.label("tech_last1"),
+        Tech.second_last_name.label("tech_last2"),
+        joins=("tech",), value=_technician_name,
+    )
+
 class MaintenanceService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_maintenances(self):
+    def get_maintenances(self, accept_encoding: str = "", include_archived: bool = False, fields: str | None = None):
         """
         Obtener todos los mantenimientos (tabla maintenance), incluyendo
-        property_id, owner_document, técnico asignado.
+        property_id, owner_document, técnico asignado. Se sirve desde el
+        snapshot serializado (y comprimido según Accept-Encoding) mientras
+        ninguna escritura lo invalide. Con include_archived se suma el
+        histórico archivado y con `fields` solo esos campos, sin caché.
         """
+        # Solo se arma la consulta si no se sirve del snapshot
+        query = None
+        if include_archived or fields is not None:
+            query  = self._maintenance_list(include_archived)
+            fields = query.parse_fields(fields)
         try:
-            Owner = aliased(User, name="owner")
-            TA    = aliased(TechnicianAssignment, name="ta")
-            Tech  = aliased(User, name="tech")
-
-            rows = (
-                self.db.query(
-                    Maintenance.id.label("id"),
-                    PropertyLot.property_id.label("property_id"),
-                    Lot.id.label("lot_id"),
-                    Owner.document_number.label("owner_document"),
-                    TypeFailure.name.label("failure_type"),
-                    Maintenance.description_failure,
-                    Maintenance.date,
-                    Vars.name.label("status"),
-                    TA.user_id.label("technician_id"),
-                    Tech.name.label("tech_name"),
-                    Tech.first_last_name.label("tech_last1"),
-                    Tech.second_last_name.label("tech_last2"),
-                )
-                .join(DeviceIot, Maintenance.device_iot_id == DeviceIot.id)
-                .join(Lot, DeviceIot.lot_id == Lot.id)
-                .join(PropertyLot, PropertyLot.lot_id == Lot.id)
-                .join(PropertyUser, PropertyUser.property_id == PropertyLot.property_id)
-                .join(Owner, Owner.id == PropertyUser.user_id)
-                .join(TypeFailure, Maintenance.type_failure_id == TypeFailure.id)
-                .join(Vars, Maintenance.maintenance_status_id == Vars.id)
-                .outerjoin(TA, TA.maintenance_id == Maintenance.id)
-                .outerjoin(Tech, Tech.id == TA.user_id)
-                .all()
-            )
-            data = []
-            for r in rows:
-                full_name = None
-                if r.technician_id:
-                    parts = [r.tech_name, r.tech_last1, r.tech_last2]
-                    full_name = " ".join(filter(None, parts))
-
-                data.append({
-                    "id": r.id,
-                    "property_id": r.property_id,
-                    "lot_id": r.lot_id,
-                    "owner_document": r.owner_document,
-                    "failure_type": r.failure_type,
-                    "description_failure": r.description_failure,
-                    "date": r.date,
-                    "status": r.status,
-                    "technician_id": r.technician_id,
-                    "technician_name": full_name,
-                })
-
-            return JSONResponse(status_code=200, content=jsonable_encoder({"success": True, "data": data}))
+            if include_archived or fields:
+                return JSONResponse(status_code=200, content=jsonable_encoder({"success": True, "data": query.all(fields)}))
+            return list_snapshots.response(MAINTENANCES_SNAPSHOT, accept_encoding, self._maintenances_content)
         except Exception as e:
             return JSONResponse(status_code=500, content={"success": False, "data": str(e)})
-        
+
+    def _maintenances_content(self):
+        """Contenido del snapshot de /maintenance/ (todas las filas y campos)."""
+        return jsonable_encoder({"success": True, "data": self._maintenance_list().all()})
+
+    def _maintenance_list(self, include_archived: bool = False) -> ListQuery:
+        M  = with_archived(Maintenance, include_archived)
+        TA = with_archived(TechnicianAssignment, include_archived, name="ta")
+
+        q = ListQuery(self.db, M)
+        q.join("device", DeviceIot, M.device_iot_id == DeviceIot.id, required=True)
+        _location_joins(q, DeviceIot.lot_id, after=("device",))
+        Owner = _owner_joins(q)
+        _catalog_joins(q, M)
+
+        q.field("id",                  M.id.label("id"))
+        q.field("property_id",         PropertyLot.property_id.label("property_id"))
+        q.field("lot_id",              DeviceIot.lot_id.label("lot_id"))
+        q.field("owner_document",      Owner.document_number.label("owner_document"), joins=("owner",))
+        q.field("failure_type",        TypeFailure.name.label("failure_type"), joins=("type_failure",))
+        q.field("description_failure", M.description_failure.label("description_failure"))
+        q.field("date",                M.date.label("date"))
+        q.field("occurrence_count",    M.occurrence_count.label("occurrence_count"))
+        q.field("last_seen_at",        M.last_seen_at.label("last_seen_at"))
+        q.field("status",              Vars.name.label("status"), joins=("status",))
+        _technician_fields(q, TA, TA.maintenance_id == M.id)
+        return q
+
     def create_notification(self, user_id: int, title: str, message: str, notification_type: str):
         """
         Crea una notificación para un usuario específico.
@@ -120,6 +202,8 @@ class MaintenanceService:
                 created_at = datetime.utcnow()
             )
             self.db.add(notif)
+            self.db.flush()
+            publish_notification(self.db, notif)
             self.db.commit()
             self.db.refresh(notif)
         except Exception:
@@ -136,16 +220,26 @@ class MaintenanceService:
     def create_maintenance(self, data):
         """
         Crear un nuevo registro en maintenance con status = 24 (Sin asignar).
+        Si ya hay uno abierto (23/24) para el mismo dispositivo y tipo de
+        fallo, se acumula en él (occurrence_count, last_seen_at) y la
+        respuesta lo indica con coalesced = true.
         """
         try:
-            payload = data.dict()
-            payload['maintenance_status_id'] = 24
-            obj = Maintenance(**payload)
-            self.db.add(obj)
+            result = upsert_maintenances(self.db, [data.dict()])[0]
+            record_change(
+                self.db, "maintenance", result["id"],
+                "created" if result["created"] else "coalesced", result["status_id"],
+            )
             self.db.commit()
-            self.db.refresh(obj)
-            return JSONResponse(status_code=200, content=jsonable_encoder({"success": True, "data": obj}))
+            list_snapshots.bump(MAINTENANCES_SNAPSHOT)
+            obj = self.db.get(Maintenance, result["id"])
+            if result["created"]:
+                search_index.invalidate()
+            return JSONResponse(status_code=200, content=jsonable_encoder({
+                "success": True, "coalesced": not result["created"], "data": obj,
+            }))
         except Exception as e:
+            self.db.rollback()
             raise HTTPException(status_code=500, detail=f"Error al crear mantenimiento: {e}")
 
     def assign_technician(self, maintenance_id: int, user_id: int, assignment_date: datetime):
@@ -183,8 +277,13 @@ class MaintenanceService:
         )
         maint.maintenance_status_id = 23
         self.db.add(assignment)
+        self.db.flush()
+        record_assignment(self.db, assignment)
+        record_change(self.db, "maintenance", maintenance_id, "assigned", 23, user_id)
         self.db.commit()
         self.db.refresh(assignment)
+        workload_cache.clear()
+        list_snapshots.bump(MAINTENANCES_SNAPSHOT)
 
         self.create_notification(
            user_id           = assignment.user_id,
@@ -200,77 +299,54 @@ class MaintenanceService:
         }
         return JSONResponse(status_code=200, content=jsonable_encoder({"success": True, "data": result}))
 
-    def get_reports(self):
+    def get_reports(self, accept_encoding: str = "", include_archived: bool = False, fields: str | None = None):
         """
         Obtener todos los reportes por lote, incluyendo:
         - property_id + property_name
         - lot_id      + lot_name
         - owner_document, tipo de fallo, fecha y estado
         - technician_id y technician_name (si está asignado)
+        Se sirve desde el snapshot serializado, como get_maintenances; con
+        include_archived o `fields` se consulta sin caché.
         """
+        # Solo se arma la consulta si no se sirve del snapshot
+        query = None
+        if include_archived or fields is not None:
+            query  = self._report_list(include_archived)
+            fields = query.parse_fields(fields)
         try:
-            Owner = aliased(User, name="owner")
-            TA    = aliased(TechnicianAssignment, name="ta")
-            Tech  = aliased(User, name="tech")
-
-            rows = (
-                self.db.query(
-                    MaintenanceReport.id.label("id"),
-                    PropertyLot.property_id.label("property_id"),
-                    Property.name.label("property_name"),
-                    MaintenanceReport.lot_id.label("lot_id"),
-                    Lot.name.label("lot_name"),
-                    Owner.document_number.label("owner_document"),
-                    TypeFailure.name.label("failure_type"),
-                    MaintenanceReport.description_failure,
-                    MaintenanceReport.date,
-                    Vars.name.label("status"),
-                    TA.user_id.label("technician_id"),
-                    Tech.name.label("tech_name"),
-                    Tech.first_last_name.label("tech_last1"),
-                    Tech.second_last_name.label("tech_last2"),
-                )
-                .join(PropertyLot, PropertyLot.lot_id == MaintenanceReport.lot_id)
-                .join(Property,    Property.id == PropertyLot.property_id)
-                .join(Lot,         Lot.id == MaintenanceReport.lot_id)
-                .join(PropertyUser, PropertyUser.property_id == PropertyLot.property_id)
-                .join(Owner,        Owner.id == PropertyUser.user_id)
-                .join(TypeFailure,  MaintenanceReport.type_failure_id == TypeFailure.id)
-                .join(Vars,         MaintenanceReport.maintenance_status_id == Vars.id)
-                .outerjoin(TA,    TA.report_id == MaintenanceReport.id)
-                .outerjoin(Tech,  Tech.id == TA.user_id)
-                .all()
-            )
-
-            data = []
-            for r in rows:
-                # Si no hay técnico asignado: technician_id = None, name = None
-                if r.technician_id:
-                    parts = [r.tech_name, r.tech_last1, r.tech_last2]
-                    # filter(None, ...) quita None o cadenas vacías
-                    full_name = " ".join(filter(None, parts))
-                else:
-                    full_name = None
-
-                data.append({
-                    "id":                   r.id,
-                    "property_id":          r.property_id,
-                    "property_name":        r.property_name,
-                    "lot_id":               r.lot_id,
-                    "lot_name":             r.lot_name,
-                    "owner_document":       r.owner_document,
-                    "failure_type":         r.failure_type,
-                    "description_failure":  r.description_failure,
-                    "date":                 r.date,
-                    "status":               r.status,
-                    "technician_id":        r.technician_id,
-                    "technician_name":      full_name,
-                })
-
-            return JSONResponse(status_code=200, content=jsonable_encoder({"success": True, "data": data}))
+            if include_archived or fields:
+                return JSONResponse(status_code=200, content=jsonable_encoder({"success": True, "data": query.all(fields)}))
+            return list_snapshots.response(REPORTS_SNAPSHOT, accept_encoding, self._reports_content)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
+    def _reports_content(self):
+        """Contenido del snapshot de /maintenance/reports (todas las filas y campos)."""
+        return jsonable_encoder({"success": True, "data": self._report_list().all()})
+
+    def _report_list(self, include_archived: bool = False) -> ListQuery:
+        R  = with_archived(MaintenanceReport, include_archived)
+        TA = with_archived(TechnicianAssignment, include_archived, name="ta")
+
+        q = ListQuery(self.db, R)
+        _location_joins(q, R.lot_id)
+        Owner = _owner_joins(q)
+        _catalog_joins(q, R)
+
+        q.field("id",                  R.id.label("id"))
+        q.field("property_id",         PropertyLot.property_id.label("property_id"))
+        q.field("property_name",       Property.name.label("property_name"), joins=("property",))
+        q.field("lot_id",              R.lot_id.label("lot_id"))
+        q.field("lot_name",            Lot.name.label("lot_name"), joins=("lot",))
+        q.field("owner_document",      Owner.document_number.label("owner_document"), joins=("owner",))
+        q.field("failure_type",        TypeFailure.name.label("failure_type"), joins=("type_failure",))
+        q.field("description_failure", R.description_failure.label("description_failure"))
+        q.field("date",                R.date.label("date"))
+        q.field("status",              Vars.name.label("status"), joins=("status",))
+        _technician_fields(q, TA, TA.report_id == R.id)
+        return q
+
     def create_report(self, data):
         """
         Crear un nuevo registro en maintenance_report con status = 24.
@@ -280,8 +356,12 @@ class MaintenanceService:
             payload['maintenance_status_id'] = 24
             obj = MaintenanceReport(**payload)
             self.db.add(obj)
+            self.db.flush()
+            record_change(self.db, "report", obj.id, "created", obj.maintenance_status_id)
             self.db.commit()
             self.db.refresh(obj)
+            search_index.invalidate()
+            list_snapshots.bump(REPORTS_SNAPSHOT)
             return JSONResponse(status_code=200, content=jsonable_encoder({"success": True, "data": obj}))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error al crear reporte: {e}")
@@ -316,8 +396,13 @@ class MaintenanceService:
         assignment = TechnicianAssignment(report_id=report_id, user_id=user_id)
         rpt.maintenance_status_id = 23
         self.db.add(assignment)
+        self.db.flush()
+        record_assignment(self.db, assignment)
+        record_change(self.db, "report", report_id, "assigned", 23, user_id)
         self.db.commit()
         self.db.refresh(assignment)
+        workload_cache.clear()
+        list_snapshots.bump(REPORTS_SNAPSHOT)
 
 
         self.create_notification(
@@ -356,108 +441,131 @@ class MaintenanceService:
         } for u in users]
         return JSONResponse(status_code=200, content=jsonable_encoder({"success": True, "data": data}))
 
-    def get_assigned_maintenances_for_technician(self, technician_id: int):
-        tech = self.db.get(User, technician_id)
-        if not tech:
-            raise HTTPException(status_code=404, detail="Técnico no encontrado")
+    def get_technician_workload(self, permission_id: int = 80):
+        """
+        Carga de trabajo de cada técnico (permiso 80) en una sola consulta
+        agrupada sobre technician_assignment:
+          - in_progress: asignaciones abiertas (estado 23; un ítem asignado
+                         nunca está en 24, así que son todas las sin finalizar)
+          - finalized:   asignaciones finalizadas (estado 25)
+          - oldest_open_assignment_date: fecha de la asignación abierta más antigua
+        """
+        cached = workload_cache.get(permission_id)
+        if cached is not None:
+            return JSONResponse(status_code=200, content=cached)
+
+        technicians = (
+            self.db.query(user_role_table.c.user_id)
+            .join(role_permission_table, user_role_table.c.rol_id == role_permission_table.c.rol_id)
+            .filter(role_permission_table.c.permission_id == permission_id)
+            .distinct()
+            .subquery()
+        )
+        TA     = aliased(TechnicianAssignment, name="ta")
+        status = func.coalesce(Maintenance.maintenance_status_id, MaintenanceReport.maintenance_status_id)
+        is_open = status == 23
 
-        Owner = aliased(User, name="owner")
-        A = aliased(TechnicianAssignment, name="asgmt")
         rows = (
             self.db.query(
-                A.id.label("technician_assignment_id"),
-                Maintenance.id.label("maintenance_id"),
-                DeviceIot.id.label("device_iot_id"),
-                Lot.id.label("lot_id"),
-                Lot.name.label("lot_name"),                     
-                PropertyLot.property_id.label("property_id"),
-                Property.name.label("property_name"),            
-                Maintenance.date.label("report_date"),
-                TypeFailure.name.label("failure_type"),
-                Owner.document_number.label("owner_document"),
-                Maintenance.description_failure,
-                Vars.name.label("status"),
-                A.assignment_date.label("assigned_at"),
+                User.id,
+                User.name,
+                User.first_last_name,
+                User.second_last_name,
+                User.document_number,
+                func.sum(case((is_open, 1), else_=0)).label("in_progress"),
+                func.sum(case((status == 25, 1), else_=0)).label("finalized"),
+                func.min(case((is_open, TA.assignment_date))).label("oldest_open"),
             )
-            .select_from(A)
-            .join(Maintenance,   A.maintenance_id == Maintenance.id)
-            .join(DeviceIot,     Maintenance.device_iot_id == DeviceIot.id)
-            .join(Lot,           DeviceIot.lot_id == Lot.id)
-            .join(PropertyLot,   PropertyLot.lot_id == Lot.id)
-            .join(Property,      Property.id == PropertyLot.property_id)     
-            .join(PropertyUser,  PropertyUser.property_id == PropertyLot.property_id)
-            .join(Owner,         Owner.id == PropertyUser.user_id)
-            .join(TypeFailure,   Maintenance.type_failure_id == TypeFailure.id)
-            .join(Vars,          Maintenance.maintenance_status_id == Vars.id)
-            .filter(A.user_id == technician_id, A.maintenance_id.isnot(None))
+            .join(technicians, technicians.c.user_id == User.id)
+            .outerjoin(TA, TA.user_id == User.id)
+            .outerjoin(Maintenance, Maintenance.id == TA.maintenance_id)
+            .outerjoin(MaintenanceReport, MaintenanceReport.id == TA.report_id)
+            .group_by(User.id, User.name, User.first_last_name, User.second_last_name, User.document_number)
+            .order_by(User.id)
             .all()
         )
         data = [{
-            "technician_assignment_id": r.technician_assignment_id,
-            "maintenance_id":      r.maintenance_id,
-            "device_iot_id":       r.device_iot_id,
-            "lot_id":              r.lot_id,
-            "lot_name":            r.lot_name,                 
-            "property_id":         r.property_id,
-            "property_name":       r.property_name,
-            "owner_document":      r.owner_document,           
-            "report_date":         r.report_date,
-            "failure_type":        r.failure_type,
-            "description_failure": r.description_failure,
-            "status":              r.status,
-            "assigned_at":         r.assigned_at,
+            "technician_id":    r.id,
+            "technician_name":  " ".join(filter(None, [r.name, r.first_last_name, r.second_last_name])),
+            "document_number":  r.document_number,
+            "in_progress":      r.in_progress or 0,
+            "finalized":        r.finalized or 0,
+            "oldest_open_assignment_date": r.oldest_open,
         } for r in rows]
-        return JSONResponse(content=jsonable_encoder({"success": True, "data": data}), status_code=200)
 
-    def get_assigned_reports_for_technician(self, technician_id: int):
+        content = jsonable_encoder({"success": True, "data": data})
+        workload_cache.set(permission_id, content)
+        return JSONResponse(status_code=200, content=content)
+
+    def get_assigned_maintenances_for_technician(self, technician_id: int, include_archived: bool = False,
+                                                 fields: str | None = None):
+        query  = self._assigned_maintenance_list(technician_id, include_archived)
+        fields = query.parse_fields(fields)
         tech = self.db.get(User, technician_id)
         if not tech:
             raise HTTPException(status_code=404, detail="Técnico no encontrado")
-
-        Owner = aliased(User, name="owner")
-        A = aliased(TechnicianAssignment, name="asgmt")
-        rows = (
-            self.db.query(
-                A.id.label("technician_assignment_id"),
-                MaintenanceReport.id.label("report_id"),
-                MaintenanceReport.lot_id.label("lot_id"),
-                Lot.name.label("lot_name"),                      
-                PropertyLot.property_id.label("property_id"),
-                Property.name.label("property_name"),            
-                MaintenanceReport.date.label("report_date"),
-                Owner.document_number.label("owner_document"),
-                TypeFailure.name.label("failure_type"),
-                MaintenanceReport.description_failure,
-                Vars.name.label("status"),
-                A.assignment_date.label("assigned_at"),
-            )
-            .select_from(A)
-            .join(MaintenanceReport, A.report_id == MaintenanceReport.id)
-            .join(Lot,              Lot.id == MaintenanceReport.lot_id)     
-            .join(PropertyLot,      PropertyLot.lot_id == MaintenanceReport.lot_id)
-            .join(Property,         Property.id == PropertyLot.property_id)  
-            .join(PropertyUser,     PropertyUser.property_id == PropertyLot.property_id)
-            .join(Owner,            Owner.id == PropertyUser.user_id)
-            .join(TypeFailure,      MaintenanceReport.type_failure_id == TypeFailure.id)
-            .join(Vars,             MaintenanceReport.maintenance_status_id == Vars.id)
-            .filter(A.user_id == technician_id, A.report_id.isnot(None))
-            .all()
-        )
-        data = [{
-            "technician_assignment_id": r.technician_assignment_id,
-            "report_id":           r.report_id,
-            "lot_id":              r.lot_id,
-            "lot_name":            r.lot_name,                 
-            "property_id":         r.property_id,
-            "property_name":       r.property_name,     
-            "owner_document":      r.owner_document,      
-            "report_date":         r.report_date,
-            "failure_type":        r.failure_type,
-            "description_failure": r.description_failure,
-            "status":              r.status,
-            "assigned_at":         r.assigned_at,
-        } for r in rows]
-        return JSONResponse(content=jsonable_encoder({"success": True, "data": data}), status_code=200)
+        return JSONResponse(content=jsonable_encoder({"success": True, "data": query.all(fields)}), status_code=200)
+
+    def _assigned_maintenance_list(self, technician_id: int, include_archived: bool = False) -> ListQuery:
+        M = with_archived(Maintenance, include_archived)
+        A = with_archived(TechnicianAssignment, include_archived, name="asgmt")
+
+        q = ListQuery(self.db, A)
+        q.join("maintenance", M,         A.maintenance_id == M.id,      required=True)
+        q.join("device",      DeviceIot, M.device_iot_id == DeviceIot.id, after=("maintenance",), required=True)
+        _location_joins(q, DeviceIot.lot_id, after=("device",))
+        Owner = _owner_joins(q)
+        _catalog_joins(q, M)
+        q.filter(A.user_id == technician_id, A.maintenance_id.isnot(None))
+
+        q.field("technician_assignment_id", A.id.label("technician_assignment_id"))
+        q.field("maintenance_id",      M.id.label("maintenance_id"))
+        q.field("device_iot_id",       DeviceIot.id.label("device_iot_id"))
+        q.field("lot_id",              DeviceIot.lot_id.label("lot_id"))
+        q.field("lot_name",            Lot.name.label("lot_name"), joins=("lot",))
+        q.field("property_id",         PropertyLot.property_id.label("property_id"))
+        q.field("property_name",       Property.name.label("property_name"), joins=("property",))
+        q.field("owner_document",      Owner.document_number.label("owner_document"), joins=("owner",))
+        q.field("report_date",         M.date.label("report_date"))
+        q.field("failure_type",        TypeFailure.name.label("failure_type"), joins=("type_failure",))
+        q.field("description_failure", M.description_failure.label("description_failure"))
+        q.field("status",              Vars.name.label("status"), joins=("status",))
+        q.field("assigned_at",         A.assignment_date.label("assigned_at"))
+        return q
+
+    def get_assigned_reports_for_technician(self, technician_id: int, include_archived: bool = False,
+                                            fields: str | None = None):
+        query  = self._assigned_report_list(technician_id, include_archived)
+        fields = query.parse_fields(fields)
+        tech = self.db.get(User, technician_id)
+        if not tech:
+            raise HTTPException(status_code=404, detail="Técnico no encontrado")
+        return JSONResponse(content=jsonable_encoder({"success": True, "data": query.all(fields)}), status_code=200)
+
+    def _assigned_report_list(self, technician_id: int, include_archived: bool = False) -> ListQuery:
+        R = with_archived(MaintenanceReport, include_archived)
+        A = with_archived(TechnicianAssignment, include_archived, name="asgmt")
+
+        q = ListQuery(self.db, A)
+        q.join("report", R, A.report_id == R.id, required=True)
+        _location_joins(q, R.lot_id, after=("report",))
+        Owner = _owner_joins(q)
+        _catalog_joins(q, R)
+        q.filter(A.user_id == technician_id, A.report_id.isnot(None))
+
+        q.field("technician_assignment_id", A.id.label("technician_assignment_id"))
+        q.field("report_id",           R.id.label("report_id"))
+        q.field("lot_id",              R.lot_id.label("lot_id"))
+        q.field("lot_name",            Lot.name.label("lot_name"), joins=("lot",))
+        q.field("property_id",         PropertyLot.property_id.label("property_id"))
+        q.field("property_name",       Property.name.label("property_name"), joins=("property",))
+        q.field("owner_document",      Owner.document_number.label("owner_document"), joins=("owner",))
+        q.field("report_date",         R.date.label("report_date"))
+        q.field("failure_type",        TypeFailure.name.label("failure_type"), joins=("type_failure",))
+        q.field("description_failure", R.description_failure.label("description_failure"))
+        q.field("status",              Vars.name.label("status"), joins=("status",))
+        q.field("assigned_at",         A.assignment_date.label("assigned_at"))
+        return q
 
     async def finalize_assignment(
             self,
@@ -496,8 +604,19 @@ class MaintenanceService:
                 obj = self.db.get(MaintenanceReport, asgmt.report_id)
             obj.maintenance_status_id = 25
 
+            self.db.flush()
+            record_finalization(self.db, asgmt, detail)
+            if asgmt.maintenance_id:
+                # El dispositivo recibió servicio: avanzar su próxima fecha de mantenimiento
+                advance_device_schedule(self.db, obj.device_iot_id, detail.date)
+            record_change(
+                self.db, "maintenance" if asgmt.maintenance_id else "report", obj.id, "finalized", 25, asgmt.user_id
+            )
             self.db.commit()
             self.db.refresh(detail)
+            workload_cache.clear()
+            search_index.invalidate()
+            list_snapshots.bump(MAINTENANCES_SNAPSHOT if asgmt.maintenance_id else REPORTS_SNAPSHOT)
 
             
             # Notificación de finalización
@@ -546,6 +665,7 @@ class MaintenanceService:
             self.db.query(User)
             .join(PropertyUser, PropertyUser.user_id == User.id)
             .filter(PropertyUser.property_id == prop_id)
+            .order_by(User.id)
             .first()
         )
 
@@ -628,6 +748,7 @@ class MaintenanceService:
         owner = self.db.query(User) \
                     .join(PropertyUser, PropertyUser.user_id == User.id) \
                     .filter(PropertyUser.property_id == prop_id) \
+                    .order_by(User.id) \
                     .first()
 
         # asignación y detalle
@@ -691,110 +812,119 @@ class MaintenanceService:
 
     
 
-    def get_maintenances_by_user(self, user_id: int):
+    def _owner_view(self, kind: str, user_id: int, build, cached: bool = True):
         """
-        Obtener todos los mantenimientos IoT de un usuario,
-        incluyendo nombre de predio, nombre de lote y estado.
+        Respuesta en caché de un listado por propietario. En un acierto no se
+        consulta la BD; al construirla, la existencia del usuario y sus
+        predios salen de una sola consulta. La entrada depende de los pares
+        (kind, property_id) de esos predios, así un cambio en un reporte no
+        invalida el listado de mantenimientos.
         """
-        if not self.db.get(User, user_id):
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-
-        rows = (
-            self.db.query(
-                Maintenance.id.label("maintenance_id"),
-                DeviceIot.id.label("device_iot_id"),
-                Lot.id.label("lot_id"),
-                Lot.name.label("lot_name"),                    
-                PropertyLot.property_id.label("property_id"),
-                Property.name.label("property_name"),          
-                Maintenance.date.label("report_date"),
-                Maintenance.maintenance_status_id.label("status_id"),
-                TypeFailure.name.label("failure_type"),
-                Maintenance.description_failure,
-                Vars.name.label("status"),                     
-            )
-            .join(DeviceIot, Maintenance.device_iot_id == DeviceIot.id)
-            .join(Lot, DeviceIot.lot_id == Lot.id)
-            .join(PropertyLot, PropertyLot.lot_id == Lot.id)
-            .join(Property, Property.id == PropertyLot.property_id)
-            .join(PropertyUser, PropertyUser.property_id == PropertyLot.property_id)
-            .join(TypeFailure, Maintenance.type_failure_id == TypeFailure.id)
-            .join(Vars, Maintenance.maintenance_status_id == Vars.id)
-            .filter(PropertyUser.user_id == user_id)
+        key  = (kind, user_id)
+        body = owner_views.get(key) if cached else None
+        if body is not None:
+            return Response(content=body, status_code=200, media_type="application/json")
+
+        generation = owner_views.generation()
+        owned = (
+            self.db.query(User.id, PropertyUser.property_id)
+            .outerjoin(PropertyUser, PropertyUser.user_id == User.id)
+            .filter(User.id == user_id)
             .all()
         )
-        data = [
-            {
-                "maintenance_id":      r.maintenance_id,
-                "device_iot_id":       r.device_iot_id,
-                "lot_id":              r.lot_id,
-                "lot_name":            r.lot_name,              
-                "property_id":         r.property_id,
-                "property_name":       r.property_name,         
-                "report_date":         r.report_date,
-                "failure_type":        r.failure_type,
-                "description_failure": r.description_failure,
-                "status":              r.status,
-                "status_id":           r.status_id                
-            }
-            for r in rows
-        ]
-        return JSONResponse(
+        if not owned:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+        response = JSONResponse(
             status_code=200,
-            content=jsonable_encoder({"success": True, "data": data})
+            content=jsonable_encoder({"success": True, "data": build()})
         )
-    
-    def get_reports_by_user(self, user_id: int):
+        if cached:
+            owner_views.set(key, response.body, {(kind, r.property_id) for r in owned if r.property_id is not None}, generation)
+        return response
+
+    def get_maintenances_by_user(self, user_id: int, include_archived: bool = False, fields: str | None = None):
         """
-        Obtener todos los reportes por lote de un usuario,
+        Obtener todos los mantenimientos IoT de un usuario,
         incluyendo nombre de predio, nombre de lote y estado.
+        Se sirve desde la caché por usuario mientras no cambien sus predios
+        (salvo con include_archived, que suma el histórico archivado, o con
+        `fields`).
         """
-        if not self.db.get(User, user_id):
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        # En un acierto de la caché no se arma la consulta
+        if fields is not None:
+            fields = self._user_maintenance_list(user_id).parse_fields(fields)
+        return self._owner_view(
+            "maintenance", user_id, lambda: self._user_maintenance_list(user_id, include_archived).all(fields),
+            cached=not include_archived and fields is None,
+        )
 
-        rows = (
-            self.db.query(
-                MaintenanceReport.id.label("report_id"),
-                MaintenanceReport.lot_id.label("lot_id"),
-                Lot.name.label("lot_name"),                     
-                PropertyLot.property_id.label("property_id"),
-                Property.name.label("property_name"),           
-                MaintenanceReport.date.label("report_date"),
-                TypeFailure.name.label("failure_type"),
-                MaintenanceReport.description_failure,
-                Vars.name.label("status"),
-                MaintenanceReport.maintenance_status_id.label("status_id")                      
-            )
-            .join(Lot, Lot.id == MaintenanceReport.lot_id)
-            .join(PropertyLot, PropertyLot.lot_id == MaintenanceReport.lot_id)
-            .join(Property, Property.id == PropertyLot.property_id)
-            .join(PropertyUser, PropertyUser.property_id == PropertyLot.property_id)
-            .join(TypeFailure, MaintenanceReport.type_failure_id == TypeFailure.id)
-            .join(Vars, MaintenanceReport.maintenance_status_id == Vars.id)
-            .filter(PropertyUser.user_id == user_id)
-            .all()
+    def _user_maintenance_list(self, user_id: int, include_archived: bool = False) -> ListQuery:
+        M = with_archived(Maintenance, include_archived)
+
+        q = ListQuery(self.db, M)
+        q.join("device", DeviceIot, M.device_iot_id == DeviceIot.id, required=True)
+        _location_joins(q, DeviceIot.lot_id, after=("device",))
+        q.join(
+            "property_user", PropertyUser, PropertyUser.property_id == PropertyLot.property_id,
+            after=("property_lot",), required=True,
         )
-        data = [
-            {
-                "report_id":           r.report_id,
-                "lot_id":              r.lot_id,
-                "lot_name":            r.lot_name,              
-                "property_id":         r.property_id,
-                "property_name":       r.property_name,         
-                "report_date":         r.report_date,
-                "failure_type":        r.failure_type,
-                "description_failure": r.description_failure,
-                "status":              r.status,
-                "status_id":           r.status_id     
-                           
-            }
-            for r in rows
-        ]
-        return JSONResponse(
-            status_code=200,
-            content=jsonable_encoder({"success": True, "data": data})
+        _catalog_joins(q, M)
+        q.filter(PropertyUser.user_id == user_id)
+
+        q.field("maintenance_id",      M.id.label("maintenance_id"))
+        q.field("device_iot_id",       DeviceIot.id.label("device_iot_id"))
+        q.field("lot_id",              DeviceIot.lot_id.label("lot_id"))
+        q.field("lot_name",            Lot.name.label("lot_name"), joins=("lot",))
+        q.field("property_id",         PropertyLot.property_id.label("property_id"))
+        q.field("property_name",       Property.name.label("property_name"), joins=("property",))
+        q.field("report_date",         M.date.label("report_date"))
+        q.field("failure_type",        TypeFailure.name.label("failure_type"), joins=("type_failure",))
+        q.field("description_failure", M.description_failure.label("description_failure"))
+        q.field("status",              Vars.name.label("status"), joins=("status",))
+        q.field("status_id",           M.maintenance_status_id.label("status_id"))
+        return q
+
+    def get_reports_by_user(self, user_id: int, include_archived: bool = False, fields: str | None = None):
+        """
+        Obtener todos los reportes por lote de un usuario,
+        incluyendo nombre de predio, nombre de lote y estado.
+        Se sirve desde la caché por usuario mientras no cambien sus predios
+        (salvo con include_archived, que suma el histórico archivado, o con
+        `fields`).
+        """
+        # En un acierto de la caché no se arma la consulta
+        if fields is not None:
+            fields = self._user_report_list(user_id).parse_fields(fields)
+        return self._owner_view(
+            "report", user_id, lambda: self._user_report_list(user_id, include_archived).all(fields),
+            cached=not include_archived and fields is None,
         )
 
+    def _user_report_list(self, user_id: int, include_archived: bool = False) -> ListQuery:
+        R = with_archived(MaintenanceReport, include_archived)
+
+        q = ListQuery(self.db, R)
+        _location_joins(q, R.lot_id)
+        q.join(
+            "property_user", PropertyUser, PropertyUser.property_id == PropertyLot.property_id,
+            after=("property_lot",), required=True,
+        )
+        _catalog_joins(q, R)
+        q.filter(PropertyUser.user_id == user_id)
+
+        q.field("report_id",           R.id.label("report_id"))
+        q.field("lot_id",              R.lot_id.label("lot_id"))
+        q.field("lot_name",            Lot.name.label("lot_name"), joins=("lot",))
+        q.field("property_id",         PropertyLot.property_id.label("property_id"))
+        q.field("property_name",       Property.name.label("property_name"), joins=("property",))
+        q.field("report_date",         R.date.label("report_date"))
+        q.field("failure_type",        TypeFailure.name.label("failure_type"), joins=("type_failure",))
+        q.field("description_failure", R.description_failure.label("description_failure"))
+        q.field("status",              Vars.name.label("status"), joins=("status",))
+        q.field("status_id",           R.maintenance_status_id.label("status_id"))
+        return q
+
     def update_report(self, report_id: int, data):
         """
         Edición parcial del reporte (maintenance_report).
@@ -805,11 +935,22 @@ class MaintenanceService:
             raise HTTPException(status_code=404, detail="Reporte no encontrado")
 
         payload = data.dict(exclude_unset=True)
-        for k, v in payload.items():
-            setattr(rpt, k, v)
-
+        def _apply():
+            for k, v in payload.items():
+                setattr(rpt, k, v)
+        asgmt = self.db.query(TechnicianAssignment).filter_by(report_id=report_id).first()
+        if asgmt and payload.get("type_failure_id", rpt.type_failure_id) != rpt.type_failure_id:
+            # El tipo de fallo es dimensión de los rollups
+            _rebucket(self.db, asgmt, _apply)
+        else:
+            _apply()
+
+        self.db.flush()
+        record_change(self.db, "report", rpt.id, "updated", rpt.maintenance_status_id)
         self.db.commit()
         self.db.refresh(rpt)
+        search_index.invalidate()
+        list_snapshots.bump(REPORTS_SNAPSHOT)
         return JSONResponse(status_code=200, content=jsonable_encoder({"success": True, "data": rpt}))
 
 
@@ -828,6 +969,7 @@ class MaintenanceService:
         if not detail:
             raise HTTPException(status_code=404, detail="Detalle no encontrado")
 
+        asgmt = self.db.get(TechnicianAssignment, detail.technician_assignment_id)
         payload = data.dict(exclude_unset=True)
         for k, v in payload.items():
             setattr(detail, k, v)
@@ -837,8 +979,12 @@ class MaintenanceService:
         if evidence_solution:
             detail.evidence_solution_url = _upload(evidence_solution, "solutions")
 
+        if asgmt:
+            kind, item = ("maintenance", asgmt.maintenance) if asgmt.maintenance_id else ("report", asgmt.report)
+            record_change(self.db, kind, item.id, "updated", item.maintenance_status_id, asgmt.user_id)
         self.db.commit()
         self.db.refresh(detail)
+        search_index.invalidate()
         return JSONResponse(status_code=200, content=jsonable_encoder({"success": True, "data": detail}))
     
 
@@ -848,10 +994,30 @@ class MaintenanceService:
         if not maint:
             raise HTTPException(status_code=404, detail="Mantenimiento no encontrado")
         payload = data.dict(exclude_unset=True)
-        for k, v in payload.items():
-            setattr(maint, k, v)
+        def _apply():
+            for k, v in payload.items():
+                setattr(maint, k, v)
+        try:
+            asgmt = self.db.query(TechnicianAssignment).filter_by(maintenance_id=maintenance_id).first()
+            if asgmt and payload.get("type_failure_id", maint.type_failure_id) != maint.type_failure_id:
+                # El tipo de fallo es dimensión de los rollups
+                _rebucket(self.db, asgmt, _apply)
+            else:
+                _apply()
+            self.db.flush()
+        except IntegrityError:
+            self.db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail="Ya existe un mantenimiento abierto para este dispositivo y tipo de fallo",
+            )
+        record_change(self.db, "maintenance", maint.id, "updated", maint.maintenance_status_id)
         self.db.commit()
         self.db.refresh(maint)
+        search_index.invalidate()
+        list_snapshots.bump(MAINTENANCES_SNAPSHOT)
+        if "maintenance_status_id" in payload:
+            workload_cache.clear()
         return JSONResponse(status_code=200, content=jsonable_encoder({"success": True, "data": maint}))
 
     def update_maintenance_assignment(self, maintenance_id: int, user_id: int, assignment_date: datetime):
@@ -862,10 +1028,15 @@ class MaintenanceService:
         )
         if not asgmt:
             raise HTTPException(status_code=404, detail="Asignación no encontrada")
-        asgmt.user_id = user_id
-        asgmt.assignment_date = assignment_date
+        def _reassign():
+            asgmt.user_id = user_id
+            asgmt.assignment_date = assignment_date
+        _rebucket(self.db, asgmt, _reassign)
+        record_change(self.db, "maintenance", maintenance_id, "reassigned", asgmt.maintenance.maintenance_status_id, user_id)
         self.db.commit()
         self.db.refresh(asgmt)
+        workload_cache.clear()
+        list_snapshots.bump(MAINTENANCES_SNAPSHOT)
 
         # Notificación de reasignación
         self.create_notification(
@@ -890,10 +1061,15 @@ class MaintenanceService:
         )
         if not asgmt:
             raise HTTPException(status_code=404, detail="Asignación no encontrada")
-        asgmt.user_id = user_id
-        asgmt.assignment_date = assignment_date
+        def _reassign():
+            asgmt.user_id = user_id
+            asgmt.assignment_date = assignment_date
+        _rebucket(self.db, asgmt, _reassign)
+        record_change(self.db, "report", report_id, "reassigned", asgmt.report.maintenance_status_id, user_id)
         self.db.commit()
         self.db.refresh(asgmt)
+        workload_cache.clear()
+        list_snapshots.bump(REPORTS_SNAPSHOT)
 
 
                 # Notificación de reasignación
@@ -0,0 +1,33 @@
+# app/maintenance/snapshots.py
+import os
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.cache import SnapshotCache, VersionedLRUCache
+
+# Listados completos sin filtros (/maintenance/ y /maintenance/reports), iguales para todo administrador
+MAINTENANCES_SNAPSHOT = "maintenances"
+REPORTS_SNAPSHOT      = "reports"
+
+list_snapshots = SnapshotCache(ttl=float(os.getenv("SNAPSHOT_CACHE_TTL", "60")))
+
+# Listados por propietario (/maintenance/user/{id}/...): dependen de los predios del usuario
+owner_views = VersionedLRUCache(
+    "owner_views",
+    max_bytes=int(os.getenv("OWNER_VIEW_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl=float(os.getenv("OWNER_VIEW_CACHE_TTL", "60")),
+)
+
+
+# **Invalidación tras el commit**
+@event.listens_for(Session, "after_commit")
+def _bump_changed_properties(session):
+    # record_changes deja aquí los predios de los lotes afectados
+    properties = session.info.pop("changed_properties", None)
+    if properties:
+        owner_views.bump(*properties)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changed_properties(session, previous_transaction):
+    session.info.pop("changed_properties", None)
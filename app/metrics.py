@@ -0,0 +1,211 @@
+# app/metrics.py
+import bisect
+import threading
+import time
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+# Buckets en segundos (mismos límites por defecto que los clientes de Prometheus)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, labels, extra=None):
+    pairs = list(zip(labelnames, labels))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monótono por combinación de etiquetas."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name       = name
+        self.help       = help
+        self.labelnames = tuple(labelnames)
+        self._values    = {}
+        self._lock      = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    """
+    Valor instantáneo. Si se indica `callback`, el valor se lee
+    en el momento del scrape (p. ej. estado del pool de conexiones).
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames=(), callback=None):
+        super().__init__(name, help, labelnames)
+        self.callback = callback
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self):
+        if self.callback is not None:
+            value = self.callback()
+            if value is not None:
+                yield self.name, "", value
+            return
+        yield from super().samples()
+
+
+class Histogram:
+    """
+    Histograma de buckets fijos. `observe` solo hace una búsqueda
+    binaria y tres sumas bajo un lock, por lo que cuesta microsegundos.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name       = name
+        self.help       = help
+        self.labelnames = tuple(labelnames)
+        self.buckets    = tuple(sorted(buckets))
+        self._series    = {}
+        self._lock      = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield (
+                    f"{self.name}_bucket",
+                    _format_labels(self.labelnames, labels, ("le", _format_value(bound))),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), count
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels):
+        self.histogram = histogram
+        self.labels    = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Serializa todas las métricas en formato de texto de Prometheus."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# **Métricas HTTP**
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds",
+    "Latencia de las peticiones HTTP por plantilla de ruta y estado",
+    ("method", "route", "status"),
+))
+REQUESTS_IN_PROGRESS = REGISTRY.register(Gauge(
+    "http_requests_in_progress",
+    "Peticiones HTTP en curso",
+))
+
+# **Agrupación de peticiones (single-flight)**
+SINGLE_FLIGHT_REQUESTS = REGISTRY.register(Counter(
+    "http_singleflight_requests_total",
+    "GETs agrupados: leader ejecuta el endpoint, follower reutiliza su respuesta, fallback reintenta",
+    ("path", "role"),
+))
+
+# **Cachés en memoria**
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "app_cache_requests_total",
+    "Lecturas de cachés en memoria por caché y resultado (hit/miss)",
+    ("cache", "result"),
+))
+
+# **Métricas de almacenamiento**
+UPLOAD_DURATION = REGISTRY.register(Histogram(
+    "storage_upload_duration_seconds",
+    "Duración de las subidas de evidencias a Firebase Storage",
+    ("folder",),
+))
+
+
+def register_pool_gauges(engine):
+    """Expone el estado del pool de conexiones del engine como gauges."""
+    pool = engine.pool
+    for name, attr, help in (
+        ("db_pool_size",        "size",       "Tamaño configurado del pool de conexiones"),
+        ("db_pool_checked_out", "checkedout", "Conexiones actualmente en uso"),
+        ("db_pool_checked_in",  "checkedin",  "Conexiones libres en el pool"),
+        ("db_pool_overflow",    "overflow",   "Conexiones abiertas por encima del tamaño del pool"),
+    ):
+        getter = getattr(pool, attr, None)
+        if getter is not None:
+            REGISTRY.register(Gauge(name, help, callback=getter))
+
+
+router = APIRouter(tags=["Metrics"])
+
+@router.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """Exposición de métricas en formato de texto de Prometheus."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
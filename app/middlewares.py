@@ -4,6 +4,11 @@ from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import Match
+from app.metrics import REQUEST_LATENCY, REQUESTS_IN_PROGRESS
+from app.query_stats import ENV, begin_request_stats, log_repeated_queries
+from app.idempotency import IdempotencyMiddleware
+from app.singleflight import SingleFlightMiddleware
 
 # **Middleware de Logging para registrar peticiones**
 class LoggingMiddleware(BaseHTTPMiddleware):
@@ -22,6 +27,88 @@ class LoggingMiddleware(BaseHTTPMiddleware):
 
         return response
 
+# **Middleware de métricas (latencia por plantilla de ruta)**
+def _route_template(scope) -> str:
+    """
+    Plantilla de la ruta de la petición. FastAPI la deja en scope["route"]
+    al enrutar; las respuestas que un middleware interno da antes del
+    enrutado (seguidores del single-flight, repeticiones idempotentes) se
+    resuelven aquí contra las rutas de la app.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    router = getattr(scope.get("app"), "router", None)
+    for candidate in getattr(router, "routes", ()):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return candidate.path
+    return "unmatched"
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro: evita el coste de BaseHTTPMiddleware para que
+    registrar una petición cueste solo unos microsegundos. La etiqueta de
+    ruta es la plantilla (`/maintenance/{maintenance_id}/detail`), que
+    FastAPI deja en `scope["route"]` al resolver el endpoint.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                _route_template(scope),
+                status,
+            )
+            REQUESTS_IN_PROGRESS.dec()
+
+# **Middleware de conteo de consultas SQL por petición**
+class QueryStatsMiddleware:
+    """
+    Cuenta las sentencias SQL y el tiempo de BD de cada petición. Fuera de
+    producción los expone en las cabeceras X-DB-Query-Count / X-DB-Time (ms)
+    y siempre advierte cuando una misma sentencia se repite demasiado (N+1).
+    """
+    def __init__(self, app):
+        self.app = app
+        self.expose_headers = ENV != "production"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = begin_request_stats()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.expose_headers:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.count).encode()))
+                headers.append((b"x-db-time", f"{stats.total_time * 1000:.2f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            log_repeated_queries(stats, scope["method"], scope["path"])
+
 # Función para agregar todos los middlewares
 def setup_middlewares(app):
     """Agrega los middlewares a la aplicación FastAPI."""
@@ -29,14 +116,26 @@ def setup_middlewares(app):
     # Protección contra Host Header Attacks
     # app.add_middleware(TrustedHostMiddleware, allowed_hosts=["example.com", "*.example.com", "localhost", "127.0.0.1"])
 
+    # Idempotency-Key en los POST reintentables (el más interno: CORS también aplica a las repeticiones)
+    app.add_middleware(IdempotencyMiddleware)
+
+    # GETs idénticos simultáneos comparten una sola ejecución (dentro de CORS: cada seguidor recibe sus cabeceras)
+    app.add_middleware(SingleFlightMiddleware)
+
     # Configuración CORS
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],  # Cambiar a dominios específicos en producción
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-        allow_headers=["Authorization", "Content-Type", "X-Request-ID"],
+        allow_headers=["Authorization", "Content-Type", "X-Request-ID", "Idempotency-Key"],
     )
 
     # Middleware de Logging
     app.add_middleware(LoggingMiddleware)
+
+    # Conteo de consultas SQL por petición
+    app.add_middleware(QueryStatsMiddleware)
+
+    # Middleware de métricas (el más externo, mide la petición completa)
+    app.add_middleware(MetricsMiddleware)
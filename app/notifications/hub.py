@@ -0,0 +1,213 @@
+# app/notifications/hub.py
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from collections import defaultdict
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+# Puente entre workers: NOTIFY en la misma transacción que escribe el evento
+HUB_PG_BRIDGE    = os.getenv("HUB_PG_BRIDGE", "0") == "1"
+HUB_PG_CHANNEL   = os.getenv("HUB_PG_CHANNEL", "maintenance_hub")
+HUB_QUEUE_SIZE   = int(os.getenv("HUB_QUEUE_SIZE", "256"))
+_LISTEN_TIMEOUT  = 5.0
+
+
+class PubSubHub:
+    """
+    Pub/sub en proceso para eventos en tiempo real (SSE). Cada suscriptor
+    es una cola asyncio acotada ligada a su event loop; publicar es seguro
+    desde cualquier hilo (endpoints síncronos en el threadpool, el hilo
+    LISTEN). Si un cliente lento llena su cola se descarta el evento más
+    antiguo: al reconectar recupera lo perdido con Last-Event-ID / since.
+
+    Con el puente activo (Postgres y HUB_PG_BRIDGE=1) los eventos viajan por
+    NOTIFY y cada worker los reparte a sus suscriptores desde un hilo LISTEN.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock        = threading.Lock()
+        self._engine      = None
+        self._listener    = None
+        self._stop        = threading.Event()
+        self.bridge       = False
+
+    # **Configuración**
+    def setup(self, engine):
+        self._engine = engine
+        self.bridge  = HUB_PG_BRIDGE and engine.dialect.name == "postgresql"
+
+    # **Suscripción**
+    def subscribe(self, topic: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=HUB_QUEUE_SIZE)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers[topic].add(entry)
+        if self.bridge:
+            self._ensure_listener()
+        queue._hub_entry = entry
+        return queue
+
+    def unsubscribe(self, topic: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(queue._hub_entry)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def subscriber_count(self, topic: str | None = None) -> int:
+        with self._lock:
+            if topic is not None:
+                return len(self._subscribers.get(topic, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+    # **Publicación**
+    def deliver(self, topic: str, event: dict):
+        """Entrega local a los suscriptores de este proceso."""
+        with self._lock:
+            targets = list(self._subscribers.get(topic, ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(_put_dropping_oldest, queue, event)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró
+                pass
+
+    def publish(self, db: Session, topic: str, event: dict):
+        """
+        Publica `event` cuando la transacción de `db` haga commit (nunca
+        antes, para no anunciar filas que podrían revertirse). No hace commit.
+        """
+        self.publish_many(db, [(topic, event)])
+
+    def publish_many(self, db: Session, events):
+        events = [(topic, jsonable_encoder(event)) for topic, event in events]
+        if not events:
+            return
+        if self.bridge:
+            # pg_notify es transaccional: Postgres lo entrega solo tras el commit
+            db.execute(
+                text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+                {
+                    "channel":  HUB_PG_CHANNEL,
+                    "payloads": [json.dumps({"topic": t, "event": e}) for t, e in events],
+                },
+            )
+        else:
+            db.info.setdefault("hub_pending", []).extend(events)
+
+    # **Puente LISTEN/NOTIFY**
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._stop.clear()
+            self._listener = threading.Thread(target=self._listen, name="hub-listen", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while not self._stop.is_set():
+            raw = None
+            try:
+                raw = self._engine.raw_connection()
+                raw.detach()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {HUB_PG_CHANNEL}")
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], _LISTEN_TIMEOUT) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        message = json.loads(conn.notifies.pop(0).payload)
+                        self.deliver(message["topic"], message["event"])
+            except Exception as e:
+                logging.warning(f"Hub LISTEN desconectado, reintentando: {e}")
+                self._stop.wait(_LISTEN_TIMEOUT)
+            finally:
+                if raw is not None:
+                    raw.close()
+
+
+def _put_dropping_oldest(queue: asyncio.Queue, event: dict):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+hub = PubSubHub()
+
+
+# **Entrega local tras el commit**
+@event.listens_for(Session, "after_commit")
+def _deliver_pending(session):
+    for topic, payload in session.info.pop("hub_pending", ()):
+        hub.deliver(topic, payload)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session, previous_transaction):
+    session.info.pop("hub_pending", None)
+
+
+def user_topic(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def sse_event(event: str, data: dict, event_id=None) -> str:
+    """Serializa un evento con el formato text/event-stream."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(jsonable_encoder(data), separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def reset_event(last_id, reason: str, **extra) -> dict:
+    """
+    Evento `reset`: el cliente no puede ponerse al día por el flujo y debe
+    recargar el estado completo. Lleva como `id` el último persistido, así
+    la próxima reconexión continúa desde ahí.
+    """
+    return {"event": "reset", "id": last_id, "data": {"reason": reason, "last_id": last_id, **extra}}
+
+
+async def stream_topic(request, topic: str, load_backlog=None, keepalive: float = 15.0):
+    """
+    Generador SSE de un tópico. Los eventos son dicts {"event", "id", "data"}
+    con `id` creciente. Se suscribe primero y luego llama a `load_backlog`
+    (función síncrona, corre en el threadpool) para emitir lo ya persistido;
+    los eventos en vivo con id ya enviado se omiten, así no hay huecos ni
+    duplicados. Si el backlog no cabe, `load_backlog` devuelve un
+    `reset_event` en lugar de una parte de él. Envía comentarios keep-alive
+    para que los proxies no corten.
+    """
+    queue = hub.subscribe(topic)
+    try:
+        yield "retry: 3000\n\n"
+        last_id = None
+        if load_backlog is not None:
+            for item in await run_in_threadpool(load_backlog):
+                last_id = item["id"]
+                yield sse_event(item["event"], item["data"], item["id"])
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            if last_id is not None and item["id"] is not None and item["id"] <= last_id:
+                continue
+            yield sse_event(item["event"], item["data"], item["id"])
+    finally:
+        hub.unsubscribe(topic, queue)
@@ -0,0 +1,42 @@
+# app/notifications/routes.py
+from fastapi import APIRouter, Depends, Body, Header, Query, Request
+from typing import Dict, Any, Optional
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.notifications.services import NotificationService
+from app.notifications.schemas import NotificationMarkRead
+
+router = APIRouter(prefix="/notifications", tags=["Notifications"])
+
+@router.get("", response_model=Dict)
+def list_notifications(
+    user_id:     int = Query(..., description="ID del usuario"),
+    cursor:      Optional[str] = Query(None, description="Cursor `next_cursor` de la página anterior"),
+    limit:       int = Query(20, ge=1, le=100),
+    unread_only: bool = Query(False),
+    type:        Optional[str] = Query(None, description="Filtrar por tipo de notificación"),
+    db:          Session = Depends(get_db)
+) -> Any:
+    """Bandeja de notificaciones del usuario, paginada por cursor (más recientes primero)."""
+    return NotificationService(db).list_notifications(user_id, cursor, limit, unread_only, type)
+
+@router.get("/stream")
+def stream_notifications(
+    request:       Request,
+    user_id:       int = Query(..., description="ID del usuario"),
+    since:         Optional[int] = Query(None, description="Reenviar notificaciones con ID mayor a este"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """Server-Sent Events con las notificaciones nuevas del usuario (reemplaza el polling)."""
+    return NotificationService.stream(request, user_id, last_event_id if last_event_id is not None else since)
+
+@router.get("/unread-count", response_model=Dict)
+def unread_count(user_id: int = Query(...), db: Session = Depends(get_db)) -> Any:
+    """Número de notificaciones sin leer del usuario."""
+    return NotificationService(db).unread_count(user_id)
+
+@router.post("/mark-read", response_model=Dict)
+def mark_read(data: NotificationMarkRead = Body(...), db: Session = Depends(get_db)) -> Any:
+    """Marca como leídas las notificaciones indicadas, o todas con `all=true`."""
+    return NotificationService(db).mark_read(data.user_id, data.ids, data.all)
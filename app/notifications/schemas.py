@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+# --- MARCAR COMO LEÍDAS ---
+
+class NotificationMarkRead(BaseModel):
+    user_id: int                  = Field(..., description="ID del usuario dueño de las notificaciones")
+    ids:     Optional[List[int]]  = Field(None, description="IDs a marcar; si se omite se usan los demás filtros")
+    all:     bool                 = Field(False, description="Marcar todas las no leídas del usuario")
@@ -0,0 +1,174 @@
+# app/notifications/services.py
+import base64
+from datetime import datetime
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.maintenance.models import Notification
+from app.notifications.hub import hub, reset_event, stream_topic, user_topic
+
+UNREAD = Notification.read.is_(False)  # misma expresión que el índice parcial
+STREAM_BACKLOG_LIMIT = 500
+
+
+def notification_event(notification_id: int, user_id: int, title: str, message: str,
+                       notification_type: str, created_at: datetime, read: bool = False) -> dict:
+    """Evento del hub / SSE para una notificación nueva."""
+    return {
+        "event": "notification",
+        "id":    notification_id,
+        "data":  {
+            "id":         notification_id,
+            "user_id":    user_id,
+            "title":      title,
+            "message":    message,
+            "type":       notification_type,
+            "read":       bool(read),
+            "created_at": created_at,
+        },
+    }
+
+
+def publish_notification(db: Session, notif: Notification):
+    """Anuncia la notificación a su usuario cuando la transacción haga commit (requiere flush previo)."""
+    hub.publish(db, user_topic(notif.user_id), notification_event(
+        notif.id, notif.user_id, notif.title, notif.message, notif.type, notif.created_at, notif.read,
+    ))
+
+
+def encode_cursor(created_at: datetime, notification_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{notification_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, notification_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(notification_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+class NotificationService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def list_notifications(
+        self,
+        user_id: int,
+        cursor: str | None = None,
+        limit: int = 20,
+        unread_only: bool = False,
+        notification_type: str | None = None,
+    ):
+        """
+        Bandeja del usuario, de la más reciente a la más antigua, paginada
+        por keyset sobre (user_id, created_at, id): cada página es un rango
+        del índice sin OFFSET, así que su costo no crece con la profundidad.
+        """
+        query = self.db.query(Notification).filter(Notification.user_id == user_id)
+        if unread_only:
+            query = query.filter(UNREAD)
+        if notification_type:
+            query = query.filter(Notification.type == notification_type)
+        if cursor:
+            created_at, notification_id = decode_cursor(cursor)
+            query = query.filter(tuple_(Notification.created_at, Notification.id) < (created_at, notification_id))
+
+        rows = (
+            query.order_by(Notification.created_at.desc(), Notification.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        data = [{
+            "id":         n.id,
+            "title":      n.title,
+            "message":    n.message,
+            "type":       n.type,
+            "read":       bool(n.read),
+            "created_at": n.created_at,
+        } for n in rows]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+        return JSONResponse(status_code=200, content=jsonable_encoder({
+            "success": True,
+            "data": {"items": data, "next_cursor": next_cursor},
+        }))
+
+    def unread_count(self, user_id: int):
+        """Conteo de no leídas resuelto sobre el índice parcial ix_notifications_user_unread."""
+        count = (
+            self.db.query(func.count(Notification.id))
+            .filter(Notification.user_id == user_id, UNREAD)
+            .scalar()
+        )
+        return JSONResponse(status_code=200, content=jsonable_encoder({
+            "success": True,
+            "data": {"user_id": user_id, "unread": count or 0},
+        }))
+
+    def mark_read(self, user_id: int, ids: list[int] | None = None, mark_all: bool = False):
+        """Marca como leídas las notificaciones indicadas (o todas) con un solo UPDATE."""
+        if not ids and not mark_all:
+            raise HTTPException(status_code=400, detail="Debe indicar ids o all=true")
+
+        stmt = update(Notification).where(Notification.user_id == user_id, UNREAD)
+        if not mark_all:
+            stmt = stmt.where(Notification.id.in_(ids))
+        updated = self.db.execute(
+            stmt.values(read=True).execution_options(synchronize_session=False)
+        ).rowcount
+        self.db.commit()
+        return JSONResponse(status_code=200, content=jsonable_encoder({
+            "success": True,
+            "data": {"user_id": user_id, "updated": updated},
+        }))
+
+    @staticmethod
+    def stream(request, user_id: int, last_event_id: int | None = None):
+        """
+        Flujo SSE de notificaciones nuevas del usuario. Con `last_event_id`
+        (cabecera Last-Event-ID o `since`) primero reenvía lo creado después
+        de ese ID, de modo que una reconexión no pierde eventos. Si hay más de
+        STREAM_BACKLOG_LIMIT pendientes emite un evento `reset` y el cliente
+        recarga la bandeja. No usa la sesión de la petición: la conexión es
+        larga y el backlog abre la suya.
+        """
+        def _backlog():
+            if last_event_id is None:
+                return []
+            db = SessionLocal()
+            try:
+                rows = (
+                    db.query(Notification)
+                    .filter(Notification.user_id == user_id, Notification.id > last_event_id)
+                    .order_by(Notification.id)
+                    .limit(STREAM_BACKLOG_LIMIT + 1)
+                    .all()
+                )
+                if len(rows) > STREAM_BACKLOG_LIMIT:
+                    last_id = (
+                        db.query(func.max(Notification.id))
+                        .filter(Notification.user_id == user_id)
+                        .scalar()
+                    )
+                    return [reset_event(last_id, "backlog_truncated", limit=STREAM_BACKLOG_LIMIT)]
+                return [
+                    notification_event(n.id, n.user_id, n.title, n.message, n.type, n.created_at, n.read)
+                    for n in rows
+                ]
+            finally:
+                db.close()
+
+        return StreamingResponse(
+            stream_topic(request, user_topic(user_id), _backlog),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
@@ -0,0 +1,102 @@
+# app/query_stats.py
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+
+ENV                    = os.getenv("ENV", "development")
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryStats:
+    """Acumula el número de sentencias SQL y el tiempo de BD de una petición."""
+
+    def __init__(self):
+        self.count      = 0
+        self.total_time = 0.0
+        self.shapes     = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.count      += 1
+        self.total_time += elapsed
+        # Los parámetros ya vienen como placeholders, así que el texto
+        # de la sentencia identifica su "forma".
+        self.shapes[statement] += 1
+
+    def repeated(self, threshold: int = QUERY_REPEAT_THRESHOLD):
+        """Sentencias con la misma forma ejecutadas más de `threshold` veces."""
+        return [(sql, n) for sql, n in self.shapes.items() if n > threshold]
+
+
+_current_stats: ContextVar = ContextVar("query_stats", default=None)
+
+# Colectores globales usados por `count_queries` (las pruebas ejecutan la
+# app en otro hilo, donde el ContextVar de la prueba no es visible).
+_collectors = set()
+_collectors_lock = threading.Lock()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    shape = _WHITESPACE.sub(" ", statement).strip()
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(shape, elapsed)
+    if _collectors:
+        with _collectors_lock:
+            for collector in _collectors:
+                collector.record(shape, elapsed)
+
+
+def install_query_stats(engine):
+    """Registra los eventos de SQLAlchemy que cuentan sentencias por petición."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def begin_request_stats() -> QueryStats:
+    stats = QueryStats()
+    _current_stats.set(stats)
+    return stats
+
+
+@contextmanager
+def count_queries():
+    """Cuenta todas las sentencias ejecutadas dentro del bloque."""
+    stats = QueryStats()
+    with _collectors_lock:
+        _collectors.add(stats)
+    try:
+        yield stats
+    finally:
+        with _collectors_lock:
+            _collectors.discard(stats)
+
+
+@contextmanager
+def assert_query_budget(max_queries: int):
+    """Falla si el bloque ejecuta más de `max_queries` sentencias SQL."""
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        detail = "\n".join(f"  {n}x {sql}" for sql, n in stats.shapes.most_common())
+        raise AssertionError(
+            f"Se esperaban como máximo {max_queries} consultas, se ejecutaron {stats.count}:\n{detail}"
+        )
+
+
+def log_repeated_queries(stats: QueryStats, method: str, path: str):
+    for sql, n in stats.repeated():
+        logging.warning(f"Posible N+1 en {method} {path}: {n} ejecuciones de «{sql[:200]}»")
@@ -0,0 +1,85 @@
+# app/singleflight.py
+import asyncio
+import os
+from starlette.datastructures import Headers
+
+from app.metrics import SINGLE_FLIGHT_REQUESTS
+
+# Rutas GET cuyas peticiones idénticas y simultáneas comparten una sola ejecución
+SINGLE_FLIGHT_PATHS = {
+    p.strip() for p in os.getenv(
+        "SINGLE_FLIGHT_PATHS", "/maintenance/,/maintenance/reports,/maintenance/technicians/permission"
+    ).split(",") if p.strip()
+}
+
+# Cabeceras de la petición que cambian la respuesta y por eso forman parte de la clave
+_VARY_HEADERS = ("accept-encoding",)
+
+# Cabeceras por petición que no se copian a los seguidores (las agregan los middlewares externos)
+_PER_REQUEST_HEADERS = {b"x-db-query-count", b"x-db-time"}
+
+
+class SingleFlightMiddleware:
+    """
+    Middleware ASGI puro que agrupa GETs idénticos en vuelo (misma ruta,
+    query string y Accept-Encoding). La primera petición (líder) ejecuta el
+    endpoint; las que llegan mientras tanto esperan y reciben el mismo
+    estado, cabeceras y cuerpo ya serializados, así una avalancha al inicio
+    del turno cuesta una sola consulta. No es una caché: al terminar el
+    líder la clave se libera y la siguiente petición vuelve a consultar.
+    Si el líder falla o se cancela, cada seguidor ejecuta su propia petición.
+    """
+    def __init__(self, app, paths=SINGLE_FLIGHT_PATHS):
+        self.app       = app
+        self.paths     = paths
+        self._inflight = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        key = (scope["path"], scope.get("query_string", b""), *(headers.get(h, "") for h in _VARY_HEADERS))
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                status, response_headers, body = await asyncio.shield(pending)
+            except Exception:
+                SINGLE_FLIGHT_REQUESTS.inc(scope["path"], "fallback")
+                return await self.app(scope, receive, send)
+            SINGLE_FLIGHT_REQUESTS.inc(scope["path"], "follower")
+            await send({"type": "http.response.start", "status": status, "headers": response_headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        SINGLE_FLIGHT_REQUESTS.inc(scope["path"], "leader")
+
+        status, response_headers, chunks = 500, [], []
+
+        async def send_wrapper(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() not in _PER_REQUEST_HEADERS
+                ]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e if isinstance(e, Exception) else RuntimeError("petición cancelada"))
+                # Evita el aviso "exception was never retrieved" si no había seguidores
+                future.exception()
+            raise
+        else:
+            future.set_result((status, response_headers, b"".join(chunks)))
+        finally:
+            self._inflight.pop(key, None)
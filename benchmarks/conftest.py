@@ -0,0 +1,85 @@
+# benchmarks/conftest.py
+import os
+import pytest
+from fastapi.testclient import TestClient
+
+# El entorno (BD desechable, Firebase falso) ya lo preparó el conftest.py raíz
+from app.main import app
+from benchmarks import runner
+from benchmarks.seed import reset_database
+
+SCALE = os.getenv("BENCH_SCALE", "small")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption("--bench-update-baseline", action="store_true",
+                    help="Reescribe benchmarks/baselines/<escala>.json con los resultados de esta corrida")
+    group.addoption("--bench-iterations", type=int, default=int(os.getenv("BENCH_ITERATIONS", "30")),
+                    help="Peticiones medidas por endpoint")
+    group.addoption("--bench-tolerance", type=float, default=float(os.getenv("BENCH_TOLERANCE", "1.0")),
+                    help="Holgura relativa permitida en latencia y memoria frente a la línea base")
+
+
+def pytest_configure(config):
+    config._bench_results = {}
+
+
+@pytest.fixture(scope="session")
+def seeded():
+    """Base de datos recreada y poblada una vez por sesión (¡usar una BD desechable!)."""
+    return reset_database(SCALE)
+
+
+@pytest.fixture(scope="session")
+def client(seeded):
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def bench(request, client):
+    """
+    Mide un endpoint y lo compara con la línea base guardada:
+
+        bench("list_maintenances", "GET", "/maintenance/")
+    """
+    config    = request.config
+    baseline  = runner.load_baseline(SCALE)
+    iterations = config.getoption("--bench-iterations")
+    tolerance  = config.getoption("--bench-tolerance")
+
+    def _bench(name, method, path, make_kwargs=None):
+        result = runner.measure(client, method, path, iterations, make_kwargs=make_kwargs)
+        config._bench_results[name] = result
+        if not config.getoption("--bench-update-baseline") and name in baseline:
+            problems = runner.compare(result, baseline[name], tolerance)
+            assert not problems, f"Regresión en {name}: " + "; ".join(problems)
+        return result
+
+    return _bench
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config  = session.config
+    results = getattr(config, "_bench_results", {})
+    if not results:
+        return
+    runner.write_json(runner.RESULTS_DIR / f"{SCALE}.json", results)
+    if config.getoption("--bench-update-baseline"):
+        merged = {**runner.load_baseline(SCALE), **results}
+        runner.write_json(runner.BASELINE_DIR / f"{SCALE}.json", merged)
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    results = getattr(config, "_bench_results", {})
+    if not results:
+        return
+    tr = terminalreporter
+    tr.section(f"benchmarks ({SCALE})")
+    tr.write_line(f"{'endpoint':<32}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>10}{'peak KB':>10}{'filas':>8}")
+    for name, r in sorted(results.items()):
+        tr.write_line(
+            f"{name:<32}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+            f"{r['queries_per_request']:>10.1f}{r['peak_memory_kb']:>10.1f}{str(r['items'] or '-'):>8}"
+        )
@@ -0,0 +1,38 @@
+# benchmarks/fakes.py
+import sys
+import types
+
+
+class FakeBlob:
+    """Blob de Firebase Storage en memoria (no hace llamadas de red)."""
+
+    def __init__(self, bucket, name: str):
+        self.bucket     = bucket
+        self.name       = name
+        self.public_url = f"https://storage.local/{name}"
+
+    def upload_from_string(self, content, content_type=None):
+        self.bucket.uploads[self.name] = len(content)
+
+    def make_public(self):
+        pass
+
+
+class FakeBucket:
+    def __init__(self):
+        self.uploads = {}
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+
+def install_fake_firebase() -> FakeBucket:
+    """
+    Sustituye `app.firebase_config` por un módulo con un bucket falso,
+    evitando que la app exija credenciales reales de Firebase.
+    """
+    bucket = FakeBucket()
+    module = types.ModuleType("app.firebase_config")
+    module.bucket = bucket
+    sys.modules["app.firebase_config"] = module
+    return bucket
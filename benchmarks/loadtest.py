@@ -0,0 +1,284 @@
+# benchmarks/loadtest.py
+"""
+Generador de carga concurrente contra una instancia de `app.main:app`.
+
+    uvicorn app.main:app --port 8000 --workers 1
+    python -m benchmarks.loadtest --base-url http://localhost:8000 \\
+        --users 200 --profile ramp --ramp-up 60 --duration 180
+
+Mezcla de tráfico por defecto (pesos relativos, configurable con --mix):
+  - technician: consulta /assigned/{id}/maintenances y /assigned/{id}/reports
+  - admin:      lista /maintenance/ y /maintenance/reports
+  - dispatcher: crea un mantenimiento y lo asigna a un técnico
+                (dispositivo y tipo de fallo al azar; si la alta se fusiona
+                con uno abierto, no se vuelve a asignar)
+  - finalize:   finaliza una asignación abierta con evidencias multipart
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+
+DEFAULT_MIX = "technician=60,admin=15,dispatcher=15,finalize=10"
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(1, math.ceil(pct / 100 * len(values))) - 1]
+
+
+class Stats:
+    """Latencias y errores agrupados por intervalo de reporte y por operación."""
+
+    def __init__(self, interval: float):
+        self.interval  = interval
+        self.started   = time.perf_counter()
+        self.windows   = defaultdict(lambda: {"latencies": [], "errors": 0, "rejected": 0})
+        self.by_op     = defaultdict(lambda: {"latencies": [], "errors": 0, "rejected": 0})
+
+    def record(self, op: str, elapsed: float, status: int | None):
+        window = int((time.perf_counter() - self.started) // self.interval)
+        for bucket in (self.windows[window], self.by_op[op]):
+            bucket["latencies"].append(elapsed * 1000)
+            if status is None or status >= 500:
+                bucket["errors"] += 1
+            elif status >= 400:
+                bucket["rejected"] += 1
+
+    @staticmethod
+    def summarize(bucket: dict, seconds: float) -> dict:
+        lat = bucket["latencies"]
+        total = len(lat)
+        return {
+            "requests":   total,
+            "throughput": round(total / seconds, 2) if seconds else 0.0,
+            "error_rate": round(bucket["errors"] / total, 4) if total else 0.0,
+            "rejected":   bucket["rejected"],
+            "p50_ms":     round(_percentile(lat, 50), 2),
+            "p95_ms":     round(_percentile(lat, 95), 2),
+            "p99_ms":     round(_percentile(lat, 99), 2),
+        }
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args        = args
+        self.stats       = Stats(args.report_interval)
+        self.mix         = self._parse_mix(args.mix)
+        self.technicians = []
+        self.devices     = []
+        self.type_failures = []
+        self.open_assignments = asyncio.Queue()
+        self.active_users = 0
+        self.stop_at     = None
+
+    @staticmethod
+    def _parse_mix(spec: str):
+        mix = {}
+        for part in spec.split(","):
+            name, weight = part.split("=")
+            mix[name.strip()] = float(weight)
+        return list(mix.keys()), list(mix.values())
+
+    async def _request(self, client, op, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(op, time.perf_counter() - start, None)
+            return None
+        self.stats.record(op, time.perf_counter() - start, response.status_code)
+        return response
+
+    async def discover(self, client):
+        """Obtiene técnicos y dispositivos reales para construir las peticiones."""
+        resp = await client.get("/maintenance/technicians/permission")
+        resp.raise_for_status()
+        self.technicians = [t["id"] for t in resp.json()["data"]]
+        if not self.technicians:
+            raise SystemExit("No hay técnicos con permiso 80; siembre datos antes de la prueba de carga.")
+        self.devices = self.args.device_ids or [1]
+        if self.args.type_failure_ids:
+            self.type_failures = self.args.type_failure_ids
+        else:
+            resp = await client.get("/maintenance/failure-types")
+            resp.raise_for_status()
+            self.type_failures = [t["id"] for t in resp.json()["data"]] or [1]
+
+    # **Escenarios**
+    async def technician(self, client):
+        tech = random.choice(self.technicians)
+        await self._request(client, "technician", "GET", f"/maintenance/assigned/{tech}/maintenances")
+        await self._request(client, "technician", "GET", f"/maintenance/assigned/{tech}/reports")
+
+    async def admin(self, client):
+        await self._request(client, "admin", "GET", "/maintenance/")
+        await self._request(client, "admin", "GET", "/maintenance/reports")
+
+    async def dispatcher(self, client):
+        created = await self._request(client, "dispatcher", "POST", "/maintenance/", json={
+            "device_iot_id":       random.choice(self.devices),
+            "type_failure_id":     random.choice(self.type_failures),
+            "description_failure": "Falla generada por prueba de carga",
+        })
+        if created is None or created.status_code != 200:
+            return
+        if created.json().get("coalesced"):
+            # Se fusionó con un mantenimiento abierto que ya tiene (o tendrá) técnico
+            return
+        maintenance_id = created.json()["data"]["id"]
+        assigned = await self._request(client, "dispatcher", "POST", f"/maintenance/{maintenance_id}/assign", json={
+            "user_id":         random.choice(self.technicians),
+            "assignment_date": datetime.now().isoformat(),
+        })
+        if assigned is not None and assigned.status_code == 200:
+            await self.open_assignments.put(assigned.json()["data"]["id"])
+
+    async def finalize(self, client):
+        try:
+            assignment_id = self.open_assignments.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        image = b"\xff\xd8" + random.randbytes(self.args.evidence_kb * 1024)
+        await self._request(client, "finalize", "POST", "/maintenance/finalize", data={
+            "technician_assignment_id": str(assignment_id),
+            "fault_remarks":            "Fuga en válvula",
+            "type_failure_id":          str(random.choice(self.type_failures)),
+            "type_maintenance_id":      str(self.args.type_maintenance_id),
+            "failure_solution_id":      str(self.args.failure_solution_id),
+            "solution_remarks":         "Se cambió la válvula",
+        }, files={
+            "evidence_failure":  ("falla.jpg",    io.BytesIO(image), "image/jpeg"),
+            "evidence_solution": ("solucion.jpg", io.BytesIO(image), "image/jpeg"),
+        })
+
+    # **Usuarios virtuales y perfil de carga**
+    async def virtual_user(self, client):
+        names, weights = self.mix
+        self.active_users += 1
+        try:
+            while time.perf_counter() < self.stop_at:
+                scenario = random.choices(names, weights)[0]
+                await getattr(self, scenario)(client)
+                await asyncio.sleep(random.expovariate(1 / self.args.think_time) if self.args.think_time else 0)
+        finally:
+            self.active_users -= 1
+
+    def target_users(self, elapsed: float) -> int:
+        args = self.args
+        if args.profile == "constant":
+            return args.users
+        if args.profile == "ramp":
+            if args.ramp_up <= 0 or elapsed >= args.ramp_up:
+                return args.users
+            return max(1, int(args.users * elapsed / args.ramp_up))
+        # step: se suman `step_users` cada `step_seconds`
+        return min(args.users, args.step_users * (int(elapsed // args.step_seconds) + 1))
+
+    async def reporter(self):
+        last = 0
+        print(f"{'t(s)':>6}{'usuarios':>10}{'req/s':>10}{'error%':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        while time.perf_counter() < self.stop_at:
+            await asyncio.sleep(self.args.report_interval)
+            window = int((time.perf_counter() - self.stats.started) // self.args.report_interval) - 1
+            if window < last:
+                continue
+            s = Stats.summarize(self.stats.windows[window], self.args.report_interval)
+            print(
+                f"{(window + 1) * self.args.report_interval:>6.0f}{self.active_users:>10}{s['throughput']:>10.1f}"
+                f"{s['error_rate'] * 100:>8.2f}%{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+            )
+            last = window + 1
+
+    async def run(self):
+        args = self.args
+        limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+            await self.discover(client)
+            self.stats = Stats(args.report_interval)
+            start = time.perf_counter()
+            self.stop_at = start + args.duration
+            reporter = asyncio.create_task(self.reporter())
+            users = []
+            while time.perf_counter() < self.stop_at:
+                target = self.target_users(time.perf_counter() - start)
+                while len(users) < target:
+                    users.append(asyncio.create_task(self.virtual_user(client)))
+                await asyncio.sleep(0.5)
+            await asyncio.gather(*users, return_exceptions=True)
+            reporter.cancel()
+        return self.report(time.perf_counter() - start)
+
+    def report(self, seconds: float) -> dict:
+        overall = {"latencies": [], "errors": 0, "rejected": 0}
+        for bucket in self.stats.by_op.values():
+            overall["latencies"] += bucket["latencies"]
+            overall["errors"]    += bucket["errors"]
+            overall["rejected"]  += bucket["rejected"]
+        result = {
+            "overall":   Stats.summarize(overall, seconds),
+            "scenarios": {op: Stats.summarize(b, seconds) for op, b in sorted(self.stats.by_op.items())},
+            "timeline":  [
+                {"t": (w + 1) * self.args.report_interval, **Stats.summarize(b, self.args.report_interval)}
+                for w, b in sorted(self.stats.windows.items())
+            ],
+        }
+        print("\nResumen por escenario:")
+        for op, s in result["scenarios"].items():
+            print(f"  {op:<12} {s['requests']:>7} req  {s['throughput']:>7.1f} req/s  "
+                  f"error {s['error_rate'] * 100:5.2f}%  p50 {s['p50_ms']:.1f}  p95 {s['p95_ms']:.1f}  p99 {s['p99_ms']:.1f} ms")
+        o = result["overall"]
+        print(f"  {'total':<12} {o['requests']:>7} req  {o['throughput']:>7.1f} req/s  error {o['error_rate'] * 100:5.2f}%")
+        return result
+
+
+def _parse_ids(spec: str):
+    ids = []
+    for part in spec.split(","):
+        if "-" in part:
+            a, b = part.split("-")
+            ids.extend(range(int(a), int(b) + 1))
+        elif part:
+            ids.append(int(part))
+    return ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de mantenimiento")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=200, help="Usuarios virtuales concurrentes máximos")
+    parser.add_argument("--duration", type=float, default=120, help="Duración total en segundos")
+    parser.add_argument("--profile", choices=["constant", "ramp", "step"], default="ramp")
+    parser.add_argument("--ramp-up", type=float, default=60, help="Segundos hasta alcanzar --users (perfil ramp)")
+    parser.add_argument("--step-users", type=int, default=25, help="Usuarios añadidos por escalón (perfil step)")
+    parser.add_argument("--step-seconds", type=float, default=15, help="Duración de cada escalón (perfil step)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Pesos por escenario, p. ej. technician=60,admin=15")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Pausa media entre acciones (s)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    parser.add_argument("--device-ids", type=_parse_ids, default=None, help="IDs de device_iot, p. ej. 1-50")
+    parser.add_argument("--type-failure-ids", type=_parse_ids, default=None,
+                        help="IDs de type_failure (por defecto todos los de /maintenance/failure-types)")
+    parser.add_argument("--type-maintenance-id", type=int, default=1)
+    parser.add_argument("--failure-solution-id", type=int, default=1)
+    parser.add_argument("--evidence-kb", type=int, default=200, help="Tamaño de cada imagen de evidencia")
+    parser.add_argument("--json", dest="json_path", help="Guarda el resultado completo en este archivo")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(LoadTest(args).run())
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/runner.py
+import json
+import math
+import time
+import tracemalloc
+from pathlib import Path
+
+from app.query_stats import count_queries
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+RESULTS_DIR  = Path(__file__).parent / "results"
+
+# Holgura absoluta para que el ruido de máquinas rápidas no falle la corrida
+LATENCY_SLACK_MS = 2.0
+MEMORY_SLACK_KB  = 64.0
+
+
+def percentile(values, pct: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def measure(client, method: str, path: str, iterations: int, warmup: int = 2, make_kwargs=None) -> dict:
+    """
+    Ejecuta `iterations` peticiones contra la app y devuelve latencias
+    p50/p95/p99 (ms), consultas SQL por petición, memoria pico y el
+    número de filas devueltas en `data`.
+    """
+    make_kwargs = make_kwargs or (lambda: {})
+
+    def _call():
+        response = client.request(method, path, **make_kwargs())
+        assert response.status_code < 400, f"{method} {path} -> {response.status_code}: {response.text[:300]}"
+        return response
+
+    for _ in range(warmup):
+        _call()
+
+    timings, queries = [], []
+    for _ in range(iterations):
+        with count_queries() as stats:
+            start = time.perf_counter()
+            _call()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(stats.count)
+
+    # La memoria se mide en una pasada aparte: tracemalloc distorsiona la latencia
+    tracemalloc.start()
+    try:
+        response = _call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    items = None
+    if response.headers.get("content-type", "").startswith("application/json"):
+        body = response.json()
+        data = body.get("data") if isinstance(body, dict) else body
+        if isinstance(data, list):
+            items = len(data)
+
+    timings.sort()
+    return {
+        "p50_ms":              round(percentile(timings, 50), 3),
+        "p95_ms":              round(percentile(timings, 95), 3),
+        "p99_ms":              round(percentile(timings, 99), 3),
+        "queries_per_request": round(sum(queries) / len(queries), 2),
+        "peak_memory_kb":      round(peak / 1024, 1),
+        "items":               items,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Devuelve la lista de regresiones de `result` frente a `baseline`."""
+    problems = []
+    if result["queries_per_request"] > baseline["queries_per_request"]:
+        problems.append(
+            f"consultas/petición {result['queries_per_request']} > {baseline['queries_per_request']}"
+        )
+    if result["p95_ms"] > baseline["p95_ms"] * (1 + tolerance) + LATENCY_SLACK_MS:
+        problems.append(f"p95 {result['p95_ms']}ms > {baseline['p95_ms']}ms (+{tolerance:.0%})")
+    if result["peak_memory_kb"] > baseline["peak_memory_kb"] * (1 + tolerance) + MEMORY_SLACK_KB:
+        problems.append(f"memoria pico {result['peak_memory_kb']}KB > {baseline['peak_memory_kb']}KB (+{tolerance:.0%})")
+    if baseline.get("items") is not None and result["items"] != baseline["items"]:
+        problems.append(f"filas devueltas {result['items']} != {baseline['items']}")
+    return problems
+
+
+def load_baseline(scale: str) -> dict:
+    path = BASELINE_DIR / f"{scale}.json"
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def write_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2, sort_keys=True, ensure_ascii=False) + "\n", encoding="utf-8")
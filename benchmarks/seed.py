@@ -0,0 +1,273 @@
+# benchmarks/seed.py
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.maintenance.models import (
+    DeviceIot,
+    FailureSolution,
+    Lot,
+    Maintenance,
+    MaintenanceChangeEvent,
+    MaintenanceDetail,
+    MaintenanceInterval,
+    MaintenanceReport,
+    MaintenanceType,
+    Notification,
+    Permission,
+    Property,
+    PropertyLot,
+    PropertyUser,
+    Role,
+    TechnicianAssignment,
+    TypeFailure,
+    User,
+    Vars,
+    failure_solution_maintenance_type_table,
+    role_permission_table,
+    user_role_table,
+)
+
+# Volúmenes por escala (se eligen con BENCH_SCALE)
+SCALES = {
+    "small": {
+        "properties": 20, "lots_per_property": 3, "devices_per_lot": 2,
+        "owners_per_property": 2, "technicians": 8,
+        "maintenances": 400, "reports": 200, "notifications": 2000,
+    },
+    "medium": {
+        "properties": 200, "lots_per_property": 4, "devices_per_lot": 2,
+        "owners_per_property": 2, "technicians": 30,
+        "maintenances": 5000, "reports": 2500, "notifications": 20000,
+    },
+    "large": {
+        "properties": 1000, "lots_per_property": 5, "devices_per_lot": 3,
+        "owners_per_property": 2, "technicians": 80,
+        "maintenances": 50000, "reports": 25000, "notifications": 50000,
+    },
+}
+
+STATUS_ASSIGNED, STATUS_UNASSIGNED, STATUS_FINALIZED = 23, 24, 25
+TECHNICIAN_PERMISSION = 80
+TECHNICIAN_ROLE_ID    = 1
+
+BASE_DATE = datetime(2025, 1, 1, 8, 0, 0)
+
+# Centro aproximado del distrito de riego (lat/lon)
+CENTER_LAT, CENTER_LON = 4.45, -75.2
+
+
+def _user(uid: int, prefix: str) -> dict:
+    return {
+        "id": uid, "name": f"{prefix}{uid}", "first_last_name": "Pérez",
+        "second_last_name": "Gómez", "document_number": f"{100000 + uid}",
+        "email": f"{prefix.lower()}{uid}@example.com", "phone": "3000000000",
+    }
+
+
+def seed(db: Session, scale: str = "small", seed_value: int = 42) -> dict:
+    """
+    Llena la base de datos con datos sintéticos deterministas y devuelve
+    los IDs de referencia que usan los benchmarks.
+    """
+    vol = SCALES[scale]
+    rnd = random.Random(seed_value)
+
+    # Catálogos
+    db.execute(insert(Vars), [
+        {"id": 11, "name": "Activo"},      {"id": 16, "name": "Predio activo"},
+        {"id": 18, "name": "Lote activo"}, {"id": STATUS_ASSIGNED, "name": "En proceso"},
+        {"id": STATUS_UNASSIGNED, "name": "Sin asignar"}, {"id": STATUS_FINALIZED, "name": "Finalizado"},
+    ])
+    db.execute(insert(Permission), [{"id": TECHNICIAN_PERMISSION, "name": "Técnico", "description": "", "category": ""}])
+    db.execute(insert(Role), [{"id": TECHNICIAN_ROLE_ID, "name": "Técnico", "description": "", "status": 11}])
+    db.execute(insert(role_permission_table), [{"rol_id": TECHNICIAN_ROLE_ID, "permission_id": TECHNICIAN_PERMISSION}])
+    failure_names = ["Fuga en válvula", "Sensor sin señal", "Batería baja", "Tubería rota", "Bomba detenida"]
+    db.execute(insert(TypeFailure), [
+        {"id": i + 1, "name": n, "description": n[:45]} for i, n in enumerate(failure_names)
+    ])
+    db.execute(insert(MaintenanceType), [{"id": 1, "name": "Correctivo"}, {"id": 2, "name": "Preventivo"}])
+    db.execute(insert(FailureSolution), [
+        {"id": 1, "name": "Cambio de válvula", "description": ""},
+        {"id": 2, "name": "Revisión general", "description": ""},
+    ])
+    db.execute(insert(failure_solution_maintenance_type_table), [
+        {"id": 1, "failure_solution_id": 1, "maintenance_type_id": 1},
+        {"id": 2, "failure_solution_id": 2, "maintenance_type_id": 2},
+    ])
+    db.execute(insert(MaintenanceInterval), [
+        {"id": 1, "name": "Mensual", "days": 30}, {"id": 2, "name": "Trimestral", "days": 90},
+    ])
+
+    # Usuarios: técnicos primero, luego propietarios
+    technicians = list(range(1, vol["technicians"] + 1))
+    next_uid = len(technicians) + 1
+    users = [_user(uid, "Tecnico") for uid in technicians]
+
+    # Predios, lotes, dispositivos
+    properties, lots, property_lots, property_users, devices = [], [], [], [], []
+    owners = []
+    lot_id = device_id = 0
+    for pid in range(1, vol["properties"] + 1):
+        lat = CENTER_LAT + rnd.uniform(-0.3, 0.3)
+        lon = CENTER_LON + rnd.uniform(-0.3, 0.3)
+        properties.append({
+            "id": pid, "name": f"Predio {pid}", "latitude": lat, "longitude": lon,
+            "extension": 10.0, "real_estate_registration_number": pid,
+        })
+        for _ in range(vol["owners_per_property"]):
+            users.append(_user(next_uid, "Propietario"))
+            owners.append(next_uid)
+            property_users.append({"property_id": pid, "user_id": next_uid})
+            next_uid += 1
+        for _ in range(vol["lots_per_property"]):
+            lot_id += 1
+            lots.append({
+                "id": lot_id, "name": f"Lote {lot_id}",
+                "latitude": lat + rnd.uniform(-0.02, 0.02), "longitude": lon + rnd.uniform(-0.02, 0.02),
+                "extension": 2.0, "real_estate_registration_number": lot_id,
+            })
+            property_lots.append({"property_id": pid, "lot_id": lot_id})
+            for _ in range(vol["devices_per_lot"]):
+                device_id += 1
+                devices.append({
+                    "id": device_id, "lot_id": lot_id, "status": 11, "model": "DR-100",
+                    "maintenance_interval_id": rnd.choice([1, 2]),
+                    "installation_date": BASE_DATE - timedelta(days=365),
+                    "estimated_maintenance_date": BASE_DATE + timedelta(days=rnd.randint(-30, 120)),
+                })
+
+    db.execute(insert(User), users)
+    db.execute(insert(user_role_table), [{"user_id": t, "rol_id": TECHNICIAN_ROLE_ID} for t in technicians])
+    db.execute(insert(Property), properties)
+    db.execute(insert(Lot), lots)
+    db.execute(insert(PropertyLot), property_lots)
+    db.execute(insert(PropertyUser), property_users)
+    db.execute(insert(DeviceIot), devices)
+
+    # Mantenimientos, reportes, asignaciones y detalles
+    maintenances, reports, assignments, details = [], [], [], []
+    assignment_id = 0
+
+    def _lifecycle(kind: str, item_id: int, created: datetime) -> int:
+        nonlocal assignment_id
+        roll = rnd.random()
+        if roll < 0.3:
+            return STATUS_UNASSIGNED
+        assignment_id += 1
+        assigned_at = created + timedelta(hours=rnd.randint(1, 72))
+        assignments.append({
+            "id": assignment_id,
+            "maintenance_id": item_id if kind == "maintenance" else None,
+            "report_id":      item_id if kind == "report" else None,
+            "user_id":        rnd.choice(technicians),
+            "assignment_date": assigned_at,
+        })
+        if roll < 0.6:
+            return STATUS_ASSIGNED
+        details.append({
+            "technician_assignment_id": assignment_id,
+            "fault_remarks": "Se detectó fuga en la válvula principal",
+            "evidence_failure_url": "https://storage.local/failures/x.jpg",
+            "type_failure_id": rnd.randint(1, len(failure_names)),
+            "type_maintenance_id": 1, "failure_solution_id": 1,
+            "solution_remarks": "Se reemplazó la válvula",
+            "evidence_solution_url": "https://storage.local/solutions/x.jpg",
+            "date": assigned_at + timedelta(hours=rnd.randint(2, 96)),
+        })
+        return STATUS_FINALIZED
+
+    open_failures = set()  # (dispositivo, tipo de fallo) con orden abierta: índice único parcial
+    for mid in range(1, vol["maintenances"] + 1):
+        created = BASE_DATE + timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+        status  = _lifecycle("maintenance", mid, created)
+        device, failure = rnd.randint(1, device_id), rnd.randint(1, len(failure_names))
+        if status != STATUS_FINALIZED:
+            while (device, failure) in open_failures:
+                device, failure = rnd.randint(1, device_id), rnd.randint(1, len(failure_names))
+            open_failures.add((device, failure))
+        maintenances.append({
+            "id": mid, "device_iot_id": device, "type_failure_id": failure,
+            "description_failure": "Fuga detectada por el sensor de presión",
+            "date": created, "maintenance_status_id": status,
+            "occurrence_count": 1, "last_seen_at": created,
+        })
+    for rid in range(1, vol["reports"] + 1):
+        created = BASE_DATE + timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+        reports.append({
+            "id": rid, "lot_id": rnd.randint(1, lot_id),
+            "type_failure_id": rnd.randint(1, len(failure_names)),
+            "description_failure": "El usuario reporta baja presión en el lote",
+            "date": created, "maintenance_status_id": _lifecycle("report", rid, created),
+        })
+
+    db.execute(insert(Maintenance), maintenances)
+    db.execute(insert(MaintenanceReport), reports)
+    db.execute(insert(TechnicianAssignment), assignments)
+    if details:
+        db.execute(insert(MaintenanceDetail), details)
+
+    # Bandeja grande para el primer técnico (~70 % ya leídas)
+    notifications = [{
+        "user_id":    technicians[0] if i % 4 else rnd.choice(technicians),
+        "title":      "Nueva asignación de mantenimiento",
+        "message":    f"Te han asignado el mantenimiento #{i}.",
+        "type":       "maintenance_assignment",
+        "read":       rnd.random() < 0.7,
+        "created_at": BASE_DATE + timedelta(minutes=i),
+    } for i in range(1, vol["notifications"] + 1)]
+    db.execute(insert(Notification), notifications)
+
+    # Feed de cambios: un evento "created" por ítem, en orden cronológico
+    changes = sorted(
+        [("maintenance", m["id"], m["date"]) for m in maintenances]
+        + [("report", r["id"], r["date"]) for r in reports],
+        key=lambda c: c[2],
+    )
+    db.execute(insert(MaintenanceChangeEvent), [{
+        "created_at": at, "kind": kind, "item_id": item_id,
+        "action": "created", "status_id": STATUS_UNASSIGNED,
+    } for kind, item_id, at in changes])
+    db.commit()
+
+    finalized_ids = {d["technician_assignment_id"] for d in details}
+    open_assignment = next(a for a in assignments if a["id"] not in finalized_ids)
+    return {
+        "technician_id":  technicians[0],
+        "owner_id":       owners[0],
+        "maintenance_id": maintenances[len(maintenances) // 2]["id"],
+        "report_id":      reports[len(reports) // 2]["id"],
+        "device_iot_id":  1,
+        "lot_id":         1,
+        "open_assignment_id": open_assignment["id"],
+    }
+
+
+def reset_database(scale: str = "small") -> dict:
+    """
+    Recrea el esquema (¡usar una BD desechable!), lo siembra, recalcula los
+    rollups y vacía las cachés del proceso, que si no servirían datos de la
+    siembra anterior. Devuelve los IDs de `seed`.
+    """
+    from app.database import Base, SessionLocal, engine
+    from app.maintenance.analytics import backfill
+    from app.maintenance.geo import lot_index
+    from app.maintenance.search import search_index
+    from app.maintenance.services import workload_cache
+    from app.maintenance.snapshots import list_snapshots, owner_views, MAINTENANCES_SNAPSHOT, REPORTS_SNAPSHOT
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        ids = seed(db, scale)
+        backfill(db)
+    finally:
+        db.close()
+    list_snapshots.bump(MAINTENANCES_SNAPSHOT, REPORTS_SNAPSHOT)
+    owner_views.clear()
+    search_index.invalidate()
+    workload_cache.clear()
+    lot_index.invalidate()
+    return ids
@@ -0,0 +1,180 @@
+# benchmarks/test_maintenance_api.py
+import io
+from datetime import datetime
+import pytest
+
+from app.database import SessionLocal
+from app.maintenance.models import (
+    DeviceIot, Maintenance, MaintenanceChangeEvent, TechnicianAssignment, TypeFailure
+)
+from app.maintenance.snapshots import list_snapshots, owner_views, MAINTENANCES_SNAPSHOT, REPORTS_SNAPSHOT
+
+# (nombre, método, ruta) — las rutas se completan con los IDs sembrados
+READ_ENDPOINTS = [
+    ("list_maintenances",         "GET", "/maintenance/"),
+    ("list_reports",              "GET", "/maintenance/reports"),
+    ("list_with_archive",         "GET", "/maintenance/?include_archived=true"),
+    ("list_sparse_fields",        "GET", "/maintenance/?fields=id,status,lot_id"),
+    ("list_technicians",          "GET", "/maintenance/technicians/permission"),
+    ("technician_workload",       "GET", "/maintenance/technicians/workload"),
+    ("assigned_maintenances",     "GET", "/maintenance/assigned/{technician_id}/maintenances"),
+    ("assigned_reports",          "GET", "/maintenance/assigned/{technician_id}/reports"),
+    ("assigned_route",            "GET", "/maintenance/assigned/{technician_id}/route?start_lat=4.45&start_lon=-75.2"),
+    ("maintenance_detail",        "GET", "/maintenance/{maintenance_id}/detail"),
+    ("report_detail",             "GET", "/maintenance/reports/{report_id}/detail"),
+    ("user_maintenances",         "GET", "/maintenance/user/{owner_id}/maintenances"),
+    ("user_reports",              "GET", "/maintenance/user/{owner_id}/reports"),
+    ("analytics_by_technician",   "GET", "/maintenance/analytics?group_by=technician&start=2025-01-01&end=2025-12-31"),
+    ("search",                    "GET", "/maintenance/search?q=valvula"),
+    ("changes_since",             "GET", "/maintenance/changes?since=0&limit=500"),
+    ("geo_bbox",                  "GET", "/maintenance/geo/bbox?min_lat=4.3&min_lon=-75.35&max_lat=4.6&max_lon=-75.05&open_only=false"),
+    ("geo_nearby",                "GET", "/maintenance/geo/nearby?lat=4.45&lon=-75.2&radius_km=10"),
+    ("failure_types",             "GET", "/maintenance/failure-types"),
+    ("failure_solutions",         "GET", "/maintenance/failure-solutions"),
+    ("maintenance_types",         "GET", "/maintenance/maintenance-types"),
+]
+
+
+@pytest.mark.parametrize("name,method,path", READ_ENDPOINTS, ids=[e[0] for e in READ_ENDPOINTS])
+def test_read_endpoints(bench, seeded, name, method, path):
+    bench(name, method, path.format(**seeded))
+
+
+@pytest.mark.parametrize("name,path,snapshot", [
+    ("list_maintenances_rebuild", "/maintenance/",        MAINTENANCES_SNAPSHOT),
+    ("list_reports_rebuild",      "/maintenance/reports", REPORTS_SNAPSHOT),
+], ids=["maintenances", "reports"])
+def test_list_rebuild(bench, seeded, name, path, snapshot):
+    """Snapshot invalidado antes de cada petición: mide la consulta y la serialización completas."""
+    def invalidate():
+        list_snapshots.bump(snapshot)
+        return {}
+    bench(name, "GET", path, invalidate)
+
+
+def test_create_maintenance(bench, seeded):
+    bench("create_maintenance", "POST", "/maintenance/", lambda: {"json": {
+        "device_iot_id":       seeded["device_iot_id"],
+        "type_failure_id":     1,
+        "description_failure": "Fuga detectada en benchmark",
+    }})
+
+
+def test_create_maintenance_idempotent_replay(bench, seeded):
+    """La primera petición crea el mantenimiento; las siguientes repiten la respuesta guardada."""
+    bench("create_maintenance_replay", "POST", "/maintenance/", lambda: {
+        "json": {
+            "device_iot_id":       seeded["device_iot_id"],
+            "type_failure_id":     1,
+            "description_failure": "Fuga reintentada en benchmark",
+        },
+        "headers": {"Idempotency-Key": "bench-create-maintenance"},
+    })
+
+
+def test_bulk_create_maintenances(bench, seeded):
+    """
+    Lote NDJSON de 500 fallas repartidas entre dispositivos y tipos de fallo:
+    la primera petición inserta cientos de filas y las siguientes las
+    agrupan, así se mide el upsert de muchas filas y no una sola orden.
+    """
+    db = SessionLocal()
+    try:
+        pairs = [
+            (device_id, failure_id)
+            for (device_id,) in db.query(DeviceIot.id).order_by(DeviceIot.id)
+            for (failure_id,) in db.query(TypeFailure.id).order_by(TypeFailure.id)
+        ]
+    finally:
+        db.close()
+    lines = "\n".join(
+        f'{{"device_iot_id": {device_id}, "type_failure_id": {failure_id}, "description_failure": "Gateway {i}"}}'
+        for i, (device_id, failure_id) in enumerate(pairs[:500])
+    )
+    try:
+        bench("bulk_create_maintenances", "POST", "/maintenance/bulk", lambda: {
+            "content": lines, "headers": {"Content-Type": "application/x-ndjson"},
+        })
+    finally:
+        # Miles de ítems sin asignar distorsionarían los benchmarks siguientes (dispatch)
+        db = SessionLocal()
+        try:
+            ids = [mid for (mid,) in db.query(Maintenance.id).filter(Maintenance.description_failure.like("Gateway %"))]
+            db.query(MaintenanceChangeEvent).filter(
+                MaintenanceChangeEvent.kind == "maintenance", MaintenanceChangeEvent.item_id.in_(ids)
+            ).delete(synchronize_session=False)
+            db.query(Maintenance).filter(Maintenance.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            list_snapshots.bump(MAINTENANCES_SNAPSHOT)
+            owner_views.clear()
+        finally:
+            db.close()
+
+
+def test_create_report(bench, seeded):
+    bench("create_report", "POST", "/maintenance/reports", lambda: {"json": {
+        "lot_id":              seeded["lot_id"],
+        "type_failure_id":     2,
+        "description_failure": "Reporte de benchmark",
+    }})
+
+
+def test_dispatch_dry_run(bench, seeded):
+    bench("dispatch_dry_run", "POST", "/maintenance/dispatch?dry_run=true")
+
+
+def _fresh_assignments(seeded, count: int):
+    """Crea asignaciones abiertas nuevas para poder finalizarlas una por una."""
+    db = SessionLocal()
+    try:
+        # Pares (dispositivo, tipo de fallo) sin orden abierta (índice único parcial)
+        taken = set(
+            db.query(Maintenance.device_iot_id, Maintenance.type_failure_id)
+            .filter(Maintenance.maintenance_status_id.in_((23, 24)))
+            .all()
+        )
+        free = (
+            (device_id, failure_id)
+            for (device_id,) in db.query(DeviceIot.id).order_by(DeviceIot.id)
+            for (failure_id,) in db.query(TypeFailure.id).order_by(TypeFailure.id)
+            if (device_id, failure_id) not in taken
+        )
+        ids = []
+        for _ in range(count):
+            device_id, failure_id = next(free)
+            maint = Maintenance(
+                device_iot_id=device_id, type_failure_id=failure_id,
+                description_failure="Para finalizar", maintenance_status_id=23,
+            )
+            db.add(maint)
+            db.flush()
+            asgmt = TechnicianAssignment(
+                maintenance_id=maint.id, user_id=seeded["technician_id"], assignment_date=datetime.now(),
+            )
+            db.add(asgmt)
+            db.flush()
+            ids.append(asgmt.id)
+        db.commit()
+        return iter(ids)
+    finally:
+        db.close()
+
+
+def test_finalize_assignment(bench, seeded, request):
+    pending = _fresh_assignments(seeded, request.config.getoption("--bench-iterations") + 3)
+
+    def _payload():
+        return {
+            "data": {
+                "technician_assignment_id": str(next(pending)),
+                "fault_remarks": "Válvula con fuga", "type_failure_id": "1",
+                "type_maintenance_id": "1", "failure_solution_id": "1",
+                "solution_remarks": "Se cambió la válvula",
+            },
+            "files": {
+                "evidence_failure":  ("falla.jpg",    io.BytesIO(b"\xff\xd8" + b"0" * 2048), "image/jpeg"),
+                "evidence_solution": ("solucion.jpg", io.BytesIO(b"\xff\xd8" + b"1" * 2048), "image/jpeg"),
+            },
+        }
+
+    bench("finalize_assignment", "POST", "/maintenance/finalize", _payload)
@@ -0,0 +1,25 @@
+# benchmarks/test_notifications_api.py
+from datetime import timedelta
+
+from app.notifications.services import encode_cursor
+from benchmarks.seed import BASE_DATE
+
+
+def test_inbox_first_page(bench, seeded):
+    bench("notifications_inbox", "GET", f"/notifications?user_id={seeded['technician_id']}&limit=20")
+
+
+def test_inbox_deep_page(bench, seeded):
+    # Página cercana al final de la bandeja: con keyset cuesta lo mismo que la primera
+    cursor = encode_cursor(BASE_DATE + timedelta(minutes=100), 100)
+    bench("notifications_inbox_deep", "GET", f"/notifications?user_id={seeded['technician_id']}&limit=20&cursor={cursor}")
+
+
+def test_unread_count(bench, seeded):
+    bench("notifications_unread_count", "GET", f"/notifications/unread-count?user_id={seeded['technician_id']}")
+
+
+def test_mark_read(bench, seeded):
+    bench("notifications_mark_read", "POST", "/notifications/mark-read", lambda: {"json": {
+        "user_id": seeded["technician_id"], "ids": list(range(1, 201)),
+    }})
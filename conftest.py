@@ -0,0 +1,40 @@
+# conftest.py
+import os
+import tempfile
+
+# La configuración de entorno debe quedar lista antes de importar la app;
+# la comparten los benchmarks y los tests de comportamiento
+os.environ["DATABASE_URL"] = os.getenv(
+    "BENCH_DATABASE_URL",
+    f"sqlite:///{tempfile.mkdtemp(prefix='disriego-bench-')}/bench.db",
+)
+os.environ.setdefault("ENV", "benchmark")
+
+from benchmarks.fakes import install_fake_firebase
+
+FAKE_BUCKET = install_fake_firebase()
+
+import pytest
+from sqlalchemy import Column, Integer, Table
+
+from app.database import Base
+
+# Tablas de otros microservicios a las que apuntan FKs de los modelos
+for _name in ("type_crop", "payment_interval"):
+    Table(_name, Base.metadata, Column("id", Integer, primary_key=True), extend_existing=True)
+
+from app.query_stats import assert_query_budget
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Permite fijar un presupuesto de consultas SQL por endpoint (ver
+    tests/test_query_stats.py):
+
+        def test_snapshot(client, seeded, query_budget):
+            client.get("/maintenance/")
+            with query_budget(0):
+                client.get("/maintenance/")
+    """
+    return assert_query_budget
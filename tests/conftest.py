@@ -0,0 +1,52 @@
+# tests/conftest.py
+import pytest
+from fastapi.testclient import TestClient
+
+# El entorno (BD desechable, Firebase falso) ya lo preparó el conftest.py raíz
+from app.database import SessionLocal
+from app.main import app
+from app.maintenance.models import DeviceIot, Maintenance, TypeFailure
+from benchmarks.seed import reset_database
+
+
+@pytest.fixture
+def seeded():
+    """
+    Base recién sembrada para cada prueba: estas pruebas escriben y no deben
+    depender del orden en que corren (la siembra pequeña tarda ~0.2 s).
+    """
+    return reset_database("small")
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def db(seeded):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def free_pairs(db):
+    """`free_pairs(n)`: pares (dispositivo, tipo de fallo) sin orden abierta."""
+    def _free_pairs(count: int):
+        taken = set(
+            db.query(Maintenance.device_iot_id, Maintenance.type_failure_id)
+            .filter(Maintenance.maintenance_status_id.in_((23, 24)))
+            .all()
+        )
+        pairs = [
+            (device_id, failure_id)
+            for (device_id,) in db.query(DeviceIot.id).order_by(DeviceIot.id)
+            for (failure_id,) in db.query(TypeFailure.id).order_by(TypeFailure.id)
+            if (device_id, failure_id) not in taken
+        ]
+        return pairs[:count]
+    return _free_pairs
@@ -0,0 +1,82 @@
+# tests/test_analytics.py
+from app.maintenance.analytics import backfill
+from app.maintenance.models import (
+    MaintenanceDailyRollup, MaintenanceDetail, MaintenanceReport, TechnicianAssignment
+)
+
+ALL_TIME = {"start": "2000-01-01", "end": "2100-01-01"}
+
+
+def _rollups(db):
+    """Buckets no vacíos: los descuentos incrementales pueden dejar filas en cero que el backfill no escribe."""
+    R = MaintenanceDailyRollup
+    columns = [c for c in R.__table__.columns if c.name != "id"]
+    rows = db.query(*columns).filter((R.assigned_count != 0) | (R.repaired_count != 0))
+    return sorted(tuple(round(v, 3) if isinstance(v, float) else v for v in row) for row in rows)
+
+
+def _finished(db, source: str) -> TechnicianAssignment:
+    """Una asignación ya cerrada de mantenimiento o de reporte."""
+    fk = TechnicianAssignment.maintenance_id if source == "maintenance" else TechnicianAssignment.report_id
+    return (
+        db.query(TechnicianAssignment)
+        .join(MaintenanceDetail, MaintenanceDetail.technician_assignment_id == TechnicianAssignment.id)
+        .filter(fk.isnot(None))
+        .order_by(TechnicianAssignment.id)
+        .first()
+    )
+
+
+def test_incremental_rollups_match_backfill_after_edits(client, db, seeded):
+    maint  = _finished(db, "maintenance")
+    report = _finished(db, "report")
+    other_technician = maint.user_id % 5 + 1
+    before = _rollups(db)
+
+    # Reasignar y cambiar el tipo de falla de ítems ya finalizados
+    client.put(f"/maintenance/{maint.maintenance_id}/assign",
+               json={"user_id": other_technician, "assignment_date": "2025-08-01T10:00:00"})
+    client.put(f"/maintenance/{maint.maintenance_id}", json={"type_failure_id": maint.maintenance.type_failure_id % 5 + 1})
+    rpt = db.get(MaintenanceReport, report.report_id)
+    client.put(f"/maintenance/reports/{rpt.id}", json={"type_failure_id": rpt.type_failure_id % 5 + 1})
+    # Cerrar una asignación abierta
+    finalized = client.post("/maintenance/finalize", data={
+        "technician_assignment_id": seeded["open_assignment_id"], "fault_remarks": "f", "type_failure_id": 1,
+        "type_maintenance_id": 1, "failure_solution_id": 1, "solution_remarks": "s",
+    }, files={"evidence_failure": ("f.jpg", b"x", "image/jpeg"), "evidence_solution": ("s.jpg", b"y", "image/jpeg")})
+    assert finalized.status_code == 200
+
+    incremental = _rollups(db)
+    backfill(db)
+
+    assert incremental != before
+    assert incremental == _rollups(db)
+
+
+def test_analytics_groups_rollups_by_technician(client, db, seeded):
+    assignments = db.query(TechnicianAssignment).count()
+    repaired    = db.query(MaintenanceDetail).count()
+
+    data = client.get("/maintenance/analytics", params={"group_by": "technician", **ALL_TIME}).json()["data"]
+    rows = data["groups"]
+
+    assert [r["key"] for r in rows] == sorted({r["key"] for r in rows})
+    assert sum(r["assigned_count"] for r in rows) == assignments
+    assert sum(r["repaired_count"] for r in rows) == repaired
+    assert all(r["name"].startswith("Tecnico") for r in rows)
+    assert all(r["mean_time_to_repair_hours"] > 0 for r in rows if r["repaired_count"])
+    assert data["totals"]["assigned_count"] == assignments
+
+
+def test_analytics_source_filter_splits_the_totals(client, seeded):
+    def total(**params):
+        rows = client.get("/maintenance/analytics", params={"group_by": "failure_type", **ALL_TIME, **params})
+        return rows.json()["data"]["totals"]["assigned_count"]
+
+    assert total(source="maintenance") + total(source="report") == total() > 0
+
+
+def test_analytics_rejects_inverted_range(client, seeded):
+    response = client.get("/maintenance/analytics", params={"start": "2025-02-01", "end": "2025-01-01"})
+
+    assert response.status_code == 400
@@ -0,0 +1,73 @@
+# tests/test_archive.py
+from datetime import datetime, timedelta
+import pytest
+
+from app.maintenance.analytics import backfill
+from app.maintenance.archive import archive_finalized
+from app.maintenance.models import DeviceIot, Maintenance, MaintenanceDailyRollup, maintenance_archive
+from app.maintenance.scheduler import recompute_estimated_dates
+
+# Referencia lejana: todo lo finalizado de la siembra queda archivable
+FAR_FUTURE = datetime.now() + timedelta(days=3650)
+
+
+def _rollups(db):
+    R = MaintenanceDailyRollup
+    columns = [c for c in R.__table__.columns if c.name != "id"]
+    return sorted(tuple(row) for row in db.query(*columns))
+
+
+def test_archive_moves_finalized_out_of_default_lists(client, db):
+    finalized = {mid for (mid,) in db.query(Maintenance.id).filter_by(maintenance_status_id=25)}
+    listed    = {row["id"] for row in client.get("/maintenance/").json()["data"]}
+
+    moved = archive_finalized(db, now=FAR_FUTURE, older_than_days=0)
+
+    assert moved["maintenance"] == len(finalized) > 0
+    assert {mid for (mid,) in db.query(maintenance_archive.c.id)} == finalized
+    recent  = {row["id"] for row in client.get("/maintenance/").json()["data"]}
+    history = {row["id"] for row in client.get("/maintenance/?include_archived=true").json()["data"]}
+    assert recent == listed - finalized
+    assert history == listed
+
+
+@pytest.mark.parametrize("path,key", [
+    ("/maintenance/reports",                               "id"),
+    ("/maintenance/assigned/{technician_id}/reports",      "report_id"),
+    ("/maintenance/assigned/{technician_id}/maintenances", "maintenance_id"),
+    ("/maintenance/user/{owner_id}/reports",               "report_id"),
+], ids=["reports", "assigned_reports", "assigned_maintenances", "user_reports"])
+def test_include_archived_restores_history_on_every_list(client, db, seeded, path, key):
+    path = path.format(**seeded)
+    listed = [(row[key], row["status"]) for row in client.get(path).json()["data"]]
+
+    archive_finalized(db, now=FAR_FUTURE, older_than_days=0)
+
+    recent  = [(row[key], row["status"]) for row in client.get(path).json()["data"]]
+    history = [(row[key], row["status"]) for row in client.get(f"{path}?include_archived=true").json()["data"]]
+    assert recent == [row for row in listed if row[1] != "Finalizado"]
+    assert sorted(history) == sorted(listed)
+
+
+def test_archive_keeps_open_and_recent_work(client, db):
+    open_ids = {mid for (mid,) in db.query(Maintenance.id).filter(Maintenance.maintenance_status_id.in_((23, 24)))}
+
+    archive_finalized(db, now=datetime.now(), older_than_days=36500)
+
+    assert db.query(maintenance_archive).count() == 0
+    assert open_ids <= {mid for (mid,) in db.query(Maintenance.id)}
+
+
+def test_archive_keeps_rollups_and_schedules(db):
+    backfill(db)
+    recompute_estimated_dates(db)
+    rollups = _rollups(db)
+    schedules = dict(db.query(DeviceIot.id, DeviceIot.estimated_maintenance_date))
+
+    archive_finalized(db, now=FAR_FUTURE, older_than_days=0)
+    backfill(db)
+    result = recompute_estimated_dates(db)
+
+    assert _rollups(db) == rollups
+    assert result["updated"] == 0
+    assert dict(db.query(DeviceIot.id, DeviceIot.estimated_maintenance_date)) == schedules
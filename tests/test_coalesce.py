@@ -0,0 +1,32 @@
+# tests/test_coalesce.py
+from app.maintenance.models import MaintenanceChangeEvent
+
+
+def test_create_coalesces_into_open_maintenance(client, db, free_pairs):
+    (device_id, failure_id), = free_pairs(1)
+    payload = {"device_iot_id": device_id, "type_failure_id": failure_id, "description_failure": "Fuga"}
+
+    first  = client.post("/maintenance/", json=payload).json()
+    second = client.post("/maintenance/", json=payload).json()
+
+    assert first["coalesced"] is False and second["coalesced"] is True
+    assert second["data"]["id"] == first["data"]["id"]
+    assert second["data"]["occurrence_count"] == 2
+    actions = [
+        action for (action,) in db.query(MaintenanceChangeEvent.action)
+        .filter(MaintenanceChangeEvent.kind == "maintenance", MaintenanceChangeEvent.item_id == first["data"]["id"])
+        .order_by(MaintenanceChangeEvent.seq)
+    ]
+    assert actions == ["created", "coalesced"]
+
+
+def test_create_after_finalization_opens_new_maintenance(client, free_pairs):
+    (device_id, failure_id), = free_pairs(1)
+    payload = {"device_iot_id": device_id, "type_failure_id": failure_id, "description_failure": "Fuga"}
+    first = client.post("/maintenance/", json=payload).json()["data"]["id"]
+    client.put(f"/maintenance/{first}", json={"maintenance_status_id": 25})
+
+    second = client.post("/maintenance/", json=payload).json()
+
+    assert second["coalesced"] is False
+    assert second["data"]["id"] != first
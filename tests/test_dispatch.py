@@ -0,0 +1,34 @@
+# tests/test_dispatch.py
+from app.maintenance.dispatch import DispatchService
+from app.maintenance.models import Maintenance, MaintenanceReport, TechnicianAssignment
+
+
+def test_dispatch_assigns_every_unassigned_item(client, db):
+    pending = db.query(Maintenance).filter_by(maintenance_status_id=24).count()
+
+    data = client.post("/maintenance/dispatch").json()["data"]
+
+    assert data["assigned"] == data["pending"] >= pending > 0
+    assert db.query(Maintenance).filter_by(maintenance_status_id=24).count() == 0
+
+
+def test_dispatch_conflict_rolls_back_whole_plan(client, db, monkeypatch):
+    assignments_before = db.query(TechnicianAssignment).count()
+    plan = DispatchService.plan
+
+    def plan_then_assign_by_hand(self, items, *args):
+        # Otro usuario asigna a mano un ítem mientras se calcula el plan
+        chosen = plan(self, items, *args)
+        kind, row = items[0]
+        Item = Maintenance if kind == "maintenance" else MaintenanceReport
+        db.query(Item).filter_by(id=row.id).update({"maintenance_status_id": 23})
+        db.commit()
+        return chosen
+
+    monkeypatch.setattr(DispatchService, "plan", plan_then_assign_by_hand)
+    response = client.post("/maintenance/dispatch")
+
+    assert response.status_code == 409
+    db.expire_all()
+    assert db.query(TechnicianAssignment).count() == assignments_before
+    assert db.query(Maintenance).filter_by(maintenance_status_id=24).count() > 0
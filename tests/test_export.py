@@ -0,0 +1,93 @@
+# tests/test_export.py
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import func
+
+from app.maintenance.archive import archive_finalized
+from app.maintenance.export import export_datasets
+from app.maintenance.models import (
+    ExportWatermark, Maintenance, MaintenanceChangeEvent, MaintenanceReport, maintenance_archive
+)
+
+
+def _latest_seq(db) -> int:
+    return db.query(func.max(MaintenanceChangeEvent.seq)).scalar()
+
+
+def _files(out_dir, dataset: str) -> list:
+    return sorted(p.name for p in (out_dir / dataset).iterdir())
+
+
+def _read(out_dir, dataset: str, name: str) -> pa.Table:
+    return pq.read_table(out_dir / dataset / name)
+
+
+def test_first_run_exports_everything_and_sets_the_watermark(db, tmp_path):
+    until = _latest_seq(db)
+
+    summary = export_datasets(db, str(tmp_path), "parquet")
+
+    assert summary["maintenance"] == db.query(Maintenance).count()
+    assert summary["maintenance_report"] == db.query(MaintenanceReport).count()
+    assert _files(tmp_path, "maintenance") == [f"maintenance-0-{until}.parquet"]
+    assert _read(tmp_path, "maintenance", f"maintenance-0-{until}.parquet").num_rows == summary["maintenance"]
+    assert {m.dataset: m.watermark for m in db.query(ExportWatermark)} == dict.fromkeys(summary, until)
+
+
+def test_run_without_changes_writes_no_files(db, tmp_path):
+    export_datasets(db, str(tmp_path), "parquet")
+
+    summary = export_datasets(db, str(tmp_path), "parquet")
+
+    assert set(summary.values()) == {0}
+    assert len(_files(tmp_path, "maintenance")) == 1
+
+
+def test_incremental_run_reexports_changed_rows_in_their_current_state(client, db, tmp_path):
+    export_datasets(db, str(tmp_path), "parquet")
+    since = _latest_seq(db)
+    m_id = db.query(Maintenance.id).order_by(Maintenance.id).first()[0]
+    client.put(f"/maintenance/{m_id}", json={"description_failure": "Cambiada tras exportar"})
+    until = _latest_seq(db)
+
+    summary = export_datasets(db, str(tmp_path), "parquet")
+
+    assert until > since
+    assert summary["maintenance"] == 1 and summary["maintenance_report"] == 0
+    rows = _read(tmp_path, "maintenance", f"maintenance-{since}-{until}.parquet").to_pylist()
+    assert [(r["id"], r["description_failure"]) for r in rows] == [(m_id, "Cambiada tras exportar")]
+    db.expire_all()
+    assert db.get(ExportWatermark, "maintenance").watermark == until
+
+
+def test_full_export_includes_archived_history(db, tmp_path):
+    total = db.query(Maintenance).count()
+    archive_finalized(db, now=datetime.now() + timedelta(days=3650), older_than_days=0)
+    assert db.query(maintenance_archive).count() > 0
+
+    summary = export_datasets(db, str(tmp_path), "arrow", datasets=["maintenance"], full=True)
+
+    assert summary == {"maintenance": total}
+
+
+def test_export_endpoint_streams_incremental_windows(client, db):
+    full = client.get("/maintenance/export/maintenance", params={"format": "arrow"})
+    until = int(full.headers["x-export-until"])
+    m_id = db.query(Maintenance.id).order_by(Maintenance.id.desc()).first()[0]
+    client.put(f"/maintenance/{m_id}", json={"description_failure": "Solo esta fila"})
+
+    delta = client.get("/maintenance/export/maintenance", params={"format": "arrow", "since": until})
+
+    assert full.status_code == delta.status_code == 200
+    assert until == _latest_seq(db) - 1
+    assert pa.ipc.open_stream(full.content).read_all().num_rows == db.query(Maintenance).count()
+    assert pa.ipc.open_stream(delta.content).read_all().column("id").to_pylist() == [m_id]
+    assert delta.headers["x-export-since"] == str(until)
+    assert delta.headers["x-export-until"] == str(_latest_seq(db))
+    assert f'maintenance-{until}-{_latest_seq(db)}.arrows' in delta.headers["content-disposition"]
+
+
+def test_unknown_export_dataset_is_404(client, seeded):
+    assert client.get("/maintenance/export/users").status_code == 404
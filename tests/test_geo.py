@@ -0,0 +1,90 @@
+# tests/test_geo.py
+import pytest
+
+from app.maintenance.geo import haversine_km, lot_index
+from app.maintenance.models import DeviceIot, Lot, Maintenance, MaintenanceReport
+
+# Lotes reubicados lejos de la siembra: (lat, lon)
+PLACES = {
+    1: (1.0, 1.0),
+    2: (1.0, 1.05),    # ~5,56 km al este del lote 1, en la celda vecina de la grilla
+    3: (1.1, 1.1),     # esquina de la caja de prueba
+    4: (60.0, 0.0),
+    5: (60.0, 0.05),   # a 60° un grado de longitud mide la mitad: ~2,78 km
+}
+
+
+@pytest.fixture
+def placed(db, seeded):
+    for lot_id, (lat, lon) in PLACES.items():
+        db.query(Lot).filter_by(id=lot_id).update({"latitude": lat, "longitude": lon})
+    db.commit()
+    lot_index.invalidate()
+    return PLACES
+
+
+def _lots(client, path, **params):
+    data = client.get(f"/maintenance/geo/{path}", params={"open_only": False, **params}).json()["data"]
+    return data["results"]
+
+
+def _items_on(db, lot_ids, open_only=False) -> set:
+    maintenances = (
+        db.query(Maintenance.id)
+        .join(DeviceIot, DeviceIot.id == Maintenance.device_iot_id)
+        .filter(DeviceIot.lot_id.in_(lot_ids))
+    )
+    reports = db.query(MaintenanceReport.id).filter(MaintenanceReport.lot_id.in_(lot_ids))
+    if open_only:
+        maintenances = maintenances.filter(Maintenance.maintenance_status_id.in_((23, 24)))
+        reports = reports.filter(MaintenanceReport.maintenance_status_id.in_((23, 24)))
+    return {("maintenance", i) for (i,) in maintenances} | {("report", i) for (i,) in reports}
+
+
+def test_bbox_includes_lots_on_the_edges(client, db, placed):
+    box = {"min_lat": 1.0, "min_lon": 1.0, "max_lat": 1.1, "max_lon": 1.1}
+
+    edges  = _lots(client, "bbox", **box, limit=5000)
+    inside = _lots(client, "bbox", **{**box, "max_lat": 1.0999, "max_lon": 1.0999}, limit=5000)
+
+    assert {(r["kind"], r["id"]) for r in edges} == _items_on(db, [1, 2, 3])
+    assert {r["lot_id"] for r in inside} == {1, 2}
+    dates = [r["date"] for r in edges]
+    assert dates == sorted(dates, reverse=True)
+
+
+def test_bbox_open_only_and_kind_filters(client, db, placed):
+    box = {"min_lat": 0.9, "min_lon": 0.9, "max_lat": 1.2, "max_lon": 1.2}
+
+    open_items = client.get("/maintenance/geo/bbox", params=box).json()["data"]["results"]
+    reports    = _lots(client, "bbox", **box, kind="report")
+
+    assert {(r["kind"], r["id"]) for r in open_items} == _items_on(db, [1, 2, 3], open_only=True)
+    assert reports and {r["kind"] for r in reports} == {"report"}
+
+
+def test_inverted_bbox_is_400(client, seeded):
+    box = {"min_lat": 2.0, "min_lon": 1.0, "max_lat": 1.0, "max_lon": 2.0}
+
+    assert client.get("/maintenance/geo/bbox", params=box).status_code == 400
+
+
+def test_radius_boundary_and_distance_order(client, placed):
+    gap = float(haversine_km(1.0, 1.0, 1.0, 1.05))
+
+    just_short = _lots(client, "nearby", lat=1.0, lon=1.0, radius_km=gap - 0.01)
+    just_over  = _lots(client, "nearby", lat=1.0, lon=1.0, radius_km=gap + 0.01)
+
+    assert {r["lot_id"] for r in just_short} == {1}
+    assert {r["lot_id"] for r in just_over} == {1, 2}
+    distances = [r["distance_km"] for r in just_over]
+    assert distances == sorted(distances) and distances[-1] == pytest.approx(gap, abs=1e-3)
+
+
+def test_radius_widens_longitude_at_high_latitude(client, placed):
+    gap = float(haversine_km(60.0, 0.0, 60.0, 0.05))
+
+    near = _lots(client, "nearby", lat=60.0, lon=0.0, radius_km=3.0)
+
+    assert gap < 3.0
+    assert {r["lot_id"] for r in near} == {4, 5}
@@ -0,0 +1,48 @@
+# tests/test_idempotency.py
+import json
+
+from starlette.datastructures import Headers
+
+from app.idempotency import claim_key, fingerprint
+from app.maintenance.models import Maintenance
+
+
+def test_idempotent_replay_returns_stored_response(client, db, free_pairs):
+    (device_id, failure_id), = free_pairs(1)
+    payload = {"device_iot_id": device_id, "type_failure_id": failure_id, "description_failure": "Reintento"}
+    headers = {"Idempotency-Key": "test-replay"}
+
+    first  = client.post("/maintenance/", json=payload, headers=headers)
+    second = client.post("/maintenance/", json=payload, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.content == first.content
+    assert second.json()["coalesced"] is False
+    assert db.query(Maintenance).filter_by(device_iot_id=device_id, type_failure_id=failure_id).one().occurrence_count == 1
+
+
+def test_idempotency_key_reused_with_other_body_is_422(client, db, free_pairs):
+    (device_id, failure_id), = free_pairs(1)
+    payload = {"device_iot_id": device_id, "type_failure_id": failure_id, "description_failure": "Original"}
+    headers = {"Idempotency-Key": "test-mismatch"}
+    client.post("/maintenance/", json=payload, headers=headers)
+
+    response = client.post("/maintenance/", json={**payload, "description_failure": "Otra"}, headers=headers)
+
+    assert response.status_code == 422
+
+
+def test_idempotency_key_in_progress_is_409(client, db, free_pairs):
+    (device_id, failure_id), = free_pairs(1)
+    body = json.dumps({"device_iot_id": device_id, "type_failure_id": failure_id, "description_failure": "En curso"})
+    headers = {"Idempotency-Key": "test-in-progress", "Content-Type": "application/json"}
+    # Reserva sin respuesta guardada: la petición original sigue en curso
+    outcome, _ = claim_key("test-in-progress", "POST", "/maintenance/",
+                           fingerprint("POST", "/maintenance/", Headers(headers), body.encode()))
+    assert outcome == "claimed"
+
+    response = client.post("/maintenance/", content=body, headers=headers)
+
+    assert response.status_code == 409
+    assert db.query(Maintenance).filter_by(device_iot_id=device_id, type_failure_id=failure_id).count() == 0
@@ -0,0 +1,69 @@
+# tests/test_ingest.py
+import json
+
+from app.maintenance.models import Maintenance
+
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+def test_bulk_ingest_upserts_many_rows(client, db, free_pairs):
+    pairs = free_pairs(20)
+    lines = [
+        {"device_iot_id": d, "type_failure_id": f, "description_failure": f"Gateway {i}"}
+        for i, (d, f) in enumerate(pairs)
+    ]
+    # Dos repeticiones del primer par dentro del mismo lote y una línea inválida
+    lines += [lines[0], lines[0], {"device_iot_id": 999_999, "type_failure_id": 1, "description_failure": "?"}]
+    body = "\n".join(json.dumps(line) for line in lines)
+
+    response = client.post("/maintenance/bulk", content=body, headers=NDJSON)
+
+    data = response.json()["data"]
+    assert (data["received"], data["created"], data["coalesced"], data["failed"]) == (23, 20, 2, 1)
+    results = data["results"]
+    assert results[20]["id"] == results[21]["id"] == results[0]["id"]
+    assert results[22]["errors"][0]["field"] == "device_iot_id"
+    counts = dict(
+        db.query(Maintenance.id, Maintenance.occurrence_count)
+        .filter(Maintenance.id.in_([r["id"] for r in results[:20]]))
+    )
+    assert len(counts) == 20 and counts[results[0]["id"]] == 3
+
+    # Reenviar el lote agrupa todo sobre las mismas órdenes abiertas
+    again = client.post("/maintenance/bulk", content=body, headers=NDJSON)
+    assert (again.json()["data"]["created"], again.json()["data"]["coalesced"]) == (0, 22)
+
+
+def test_bulk_ingest_reports_invalid_lines_without_rejecting_the_batch(client, free_pairs):
+    (device_id, failure_id), = free_pairs(1)
+    body = "\n".join([
+        json.dumps({"device_iot_id": device_id, "type_failure_id": failure_id, "description_failure": "ok"}),
+        "{no es json",
+        "",
+        json.dumps({"device_iot_id": device_id}),
+    ])
+
+    data = client.post("/maintenance/bulk", content=body, headers=NDJSON).json()["data"]
+
+    assert (data["received"], data["created"], data["failed"]) == (3, 1, 2)
+    assert [r["line"] for r in data["results"]] == [1, 2, 4]
+    assert data["results"][1]["status"] == "error"
+    assert {e["field"] for e in data["results"][2]["errors"]} == {"type_failure_id", "description_failure"}
+
+
+def test_bulk_ingest_accepts_a_json_array(client, free_pairs):
+    items = [
+        {"device_iot_id": d, "type_failure_id": f, "description_failure": "arreglo"}
+        for d, f in free_pairs(3)
+    ]
+
+    data = client.post("/maintenance/bulk", json=items).json()["data"]
+
+    assert (data["received"], data["created"]) == (3, 3)
+    assert [r["line"] for r in data["results"]] == [1, 2, 3]
+
+
+def test_bulk_ingest_rejects_a_non_array_body(client, seeded):
+    response = client.post("/maintenance/bulk", json={"device_iot_id": 1})
+
+    assert response.status_code == 400
@@ -0,0 +1,25 @@
+# tests/test_listing.py
+
+
+def test_sparse_fields_return_only_requested_keys_and_same_rows(client, seeded):
+    full   = client.get("/maintenance/").json()["data"]
+    sparse = client.get("/maintenance/?fields=id,status").json()["data"]
+
+    assert all(set(row) == {"id", "status"} for row in sparse)
+    assert [(r["id"], r["status"]) for r in sparse] == [(r["id"], r["status"]) for r in full]
+
+
+def test_sparse_fields_on_owner_view_bypass_its_cache(client, seeded):
+    path = f"/maintenance/user/{seeded['owner_id']}/maintenances"
+    full = client.get(path).json()["data"]
+
+    sparse = client.get(f"{path}?fields=maintenance_id,status").json()["data"]
+
+    assert [set(row) for row in sparse] == [{"maintenance_id", "status"}] * len(full)
+
+
+def test_unknown_sparse_field_is_400(client, seeded):
+    response = client.get("/maintenance/?fields=id,nope")
+
+    assert response.status_code == 400
+    assert "nope" in response.json()["detail"]
@@ -0,0 +1,29 @@
+# tests/test_notifications.py
+from datetime import datetime
+
+from app.maintenance.models import Notification
+
+
+def test_notification_cursor_pages_cover_inbox_once(client, db, seeded):
+    user_id = seeded["technician_id"]
+    # Empates en created_at: el id desempata sin repetir ni saltar filas
+    tied = datetime(2030, 1, 1)
+    db.add_all(Notification(user_id=user_id, title="t", message="m", type="x", read=False, created_at=tied)
+               for _ in range(5))
+    db.commit()
+    expected = [
+        n_id for (n_id,) in db.query(Notification.id)
+        .filter(Notification.user_id == user_id)
+        .order_by(Notification.created_at.desc(), Notification.id.desc())
+    ]
+
+    seen, cursor = [], None
+    while True:
+        params = {"user_id": user_id, "limit": 7, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/notifications/", params=params).json()["data"]
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == expected
@@ -0,0 +1,53 @@
+# tests/test_owner_views.py
+from app.maintenance.models import DeviceIot, Maintenance, PropertyLot, PropertyUser
+
+
+def _owner_maintenance(db, owner_id: int, owned: bool) -> int:
+    """Un mantenimiento en un lote de un predio del propietario (o de ninguno suyo)."""
+    properties = db.query(PropertyUser.property_id).filter(PropertyUser.user_id == owner_id)
+    lots = db.query(PropertyLot.lot_id).filter(PropertyLot.property_id.in_(properties))
+    lot_filter = DeviceIot.lot_id.in_(lots) if owned else DeviceIot.lot_id.not_in(lots)
+    return (
+        db.query(Maintenance.id)
+        .join(DeviceIot, DeviceIot.id == Maintenance.device_iot_id)
+        .filter(lot_filter)
+        .order_by(Maintenance.id)
+        .limit(1)
+        .scalar()
+    )
+
+
+def test_owner_view_hit_runs_no_queries(client, seeded, query_budget):
+    path = f"/maintenance/user/{seeded['owner_id']}/maintenances"
+    first = client.get(path)
+
+    with query_budget(0):
+        second = client.get(path)
+
+    assert second.content == first.content
+
+
+def test_owner_view_is_invalidated_by_changes_on_owned_lots(client, db, seeded, query_budget):
+    owner_id = seeded["owner_id"]
+    path = f"/maintenance/user/{owner_id}/maintenances"
+    client.get(path)
+    maintenance_id = _owner_maintenance(db, owner_id, owned=True)
+
+    client.put(f"/maintenance/{maintenance_id}", json={"description_failure": "Cambio del propietario"})
+
+    with query_budget(3) as stats:
+        rows = client.get(path).json()["data"]
+    assert stats.count > 0
+    assert next(r for r in rows if r["maintenance_id"] == maintenance_id)["description_failure"] == "Cambio del propietario"
+
+
+def test_owner_view_survives_changes_on_other_properties(client, db, seeded, query_budget):
+    owner_id = seeded["owner_id"]
+    path = f"/maintenance/user/{owner_id}/maintenances"
+    client.get(path)
+    other_id = _owner_maintenance(db, owner_id, owned=False)
+
+    client.put(f"/maintenance/{other_id}", json={"description_failure": "Cambio ajeno"})
+
+    with query_budget(0):
+        client.get(path)
@@ -0,0 +1,15 @@
+# tests/test_query_stats.py
+import pytest
+
+@pytest.mark.parametrize("path,budget", [
+    ("/maintenance/assigned/{technician_id}/maintenances", 2),
+    ("/maintenance/assigned/{technician_id}/reports",      2),
+    ("/maintenance/user/{owner_id}/reports",               2),
+    ("/notifications/?user_id={technician_id}",            1),
+    ("/maintenance/changes?since=0&limit=500",             2),
+], ids=["assigned_maintenances", "assigned_reports", "user_reports", "notifications", "changes"])
+def test_list_query_count_does_not_grow_with_rows(client, seeded, query_budget, path, budget):
+    """Consultas fijas por listado: una regresión a N+1 se detecta aquí y no solo en la latencia."""
+    with query_budget(budget):
+        response = client.get(path.format(**seeded))
+    assert response.status_code == 200
@@ -0,0 +1,80 @@
+# tests/test_routing.py
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from app.maintenance.models import Maintenance, MaintenanceReport, TechnicianAssignment
+from app.maintenance.routing import distance_matrix, nearest_neighbour, path_length, two_opt
+
+
+def _route(dist):
+    return two_opt(nearest_neighbour(dist), dist)
+
+
+def test_collinear_stops_are_visited_in_line_order():
+    lons = [0.3, 0.1, 0.4, 0.0, 0.2]
+    dist = distance_matrix([0.0] * 6, [-0.1] + lons)  # partida al oeste de todas
+
+    order = _route(dist)
+
+    assert [lons[node - 1] for node in order[1:]] == sorted(lons)
+
+
+def test_two_opt_never_worsens_and_stays_near_the_optimum():
+    rng = np.random.default_rng(7)
+    lats, lons = rng.uniform(4.0, 4.2, 8), rng.uniform(-74.2, -74.0, 8)
+    dist = distance_matrix(lats, lons)
+
+    greedy = nearest_neighbour(dist)
+    improved = two_opt(greedy, dist)
+    optimum = min(path_length(np.array((0,) + p), dist) for p in permutations(range(1, 8)))
+
+    assert sorted(improved.tolist()) == list(range(8)) and improved[0] == 0
+    assert optimum <= path_length(improved, dist) <= path_length(greedy, dist)
+    assert path_length(improved, dist) <= optimum * 1.1
+
+
+def _open_assignments(db, technician_id: int) -> set:
+    A = TechnicianAssignment
+    maintenances = (
+        db.query(A.id).join(Maintenance, Maintenance.id == A.maintenance_id)
+        .filter(A.user_id == technician_id, Maintenance.maintenance_status_id.in_((23, 24)))
+    )
+    reports = (
+        db.query(A.id).join(MaintenanceReport, MaintenanceReport.id == A.report_id)
+        .filter(A.user_id == technician_id, MaintenanceReport.maintenance_status_id.in_((23, 24)))
+    )
+    return {a_id for (a_id,) in maintenances.union(reports)}
+
+
+def test_route_visits_every_open_assignment_once(client, db, seeded):
+    technician_id = seeded["technician_id"]
+
+    data = client.get(f"/maintenance/assigned/{technician_id}/route").json()["data"]
+
+    route = data["route"]
+    assert [s["sequence"] for s in route] == list(range(1, len(route) + 1))
+    assert {s["technician_assignment_id"] for s in route} == _open_assignments(db, technician_id)
+    assert len(route) == data["stops"] > 1
+    assert route[-1]["cumulative_km"] == pytest.approx(sum(s["leg_km"] for s in route), abs=0.01)
+    assert data["total_distance_km"] <= data["unordered_distance_km"]
+
+
+def test_route_starts_at_the_stop_nearest_to_the_start(client, seeded):
+    path = f"/maintenance/assigned/{seeded['technician_id']}/route"
+    anywhere = client.get(path).json()["data"]["route"]
+    target = anywhere[len(anywhere) // 2]
+
+    route = client.get(path, params={"start_lat": target["latitude"], "start_lon": target["longitude"]}).json()["data"]
+
+    assert route["start"] == {"latitude": target["latitude"], "longitude": target["longitude"]}
+    assert route["route"][0]["lot_id"] == target["lot_id"]
+    assert route["route"][0]["leg_km"] == 0
+
+
+def test_route_rejects_half_a_start_and_unknown_technicians(client, seeded):
+    path = f"/maintenance/assigned/{seeded['technician_id']}/route"
+
+    assert client.get(path, params={"start_lat": 4.6}).status_code == 400
+    assert client.get("/maintenance/assigned/999999/route").status_code == 404
@@ -0,0 +1,123 @@
+# tests/test_scheduler.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app.maintenance.models import (
+    DeviceIot, Maintenance, MaintenanceDetail, MaintenanceInterval, TechnicianAssignment
+)
+from app.maintenance.scheduler import OPEN_STATUSES, generate_due_maintenances, recompute_estimated_dates
+
+NOW = datetime(2026, 6, 1, 8, 0)
+
+
+def _idle_devices(db, count: int) -> list:
+    """Dispositivos sin mantenimiento abierto (candidatos a preventivo)."""
+    busy = db.query(Maintenance.device_iot_id).filter(Maintenance.maintenance_status_id.in_(OPEN_STATUSES))
+    return [d_id for (d_id,) in db.query(DeviceIot.id).filter(DeviceIot.id.not_in(busy)).order_by(DeviceIot.id).limit(count)]
+
+
+def _schedule(db, device_id: int, due: datetime | None, interval_id: int | None = 1):
+    db.query(DeviceIot).filter_by(id=device_id).update(
+        {"estimated_maintenance_date": due, "maintenance_interval_id": interval_id}
+    )
+    db.commit()
+
+
+def _orders(db, device_id: int) -> int:
+    return db.query(Maintenance).filter_by(device_iot_id=device_id).filter(Maintenance.maintenance_status_id == 24).count()
+
+
+def test_due_device_gets_one_order_and_its_next_date(db):
+    device_id, = _idle_devices(db, 1)
+    previous = NOW - timedelta(days=45)
+    _schedule(db, device_id, previous, interval_id=1)  # Mensual: 30 días
+
+    result = generate_due_maintenances(db, now=NOW)
+
+    assert result["created"] == result["rescheduled"] > 0
+    assert _orders(db, device_id) == 1
+    db.expire_all()
+    # Conserva la cadencia: dos periodos después de la fecha vencida
+    assert db.get(DeviceIot, device_id).estimated_maintenance_date == previous + timedelta(days=60)
+    assert generate_due_maintenances(db, now=NOW)["created"] == 0
+
+
+def test_devices_without_a_valid_interval_are_never_due(db):
+    no_interval, zero_days, monthly = _idle_devices(db, 3)
+    db.add(MaintenanceInterval(id=99, name="Sin periodicidad", days=0))
+    db.commit()
+    overdue = NOW - timedelta(days=10)
+    _schedule(db, no_interval, overdue, interval_id=None)
+    _schedule(db, zero_days,   overdue, interval_id=99)
+    _schedule(db, monthly,     overdue, interval_id=1)
+
+    dry = generate_due_maintenances(db, now=NOW, dry_run=True)
+    first = generate_due_maintenances(db, now=NOW)
+    second = generate_due_maintenances(db, now=NOW + timedelta(days=1))
+
+    assert dry["due"] == first["created"] == first["rescheduled"]
+    assert second["created"] == 0
+    assert (_orders(db, no_interval), _orders(db, zero_days), _orders(db, monthly)) == (0, 0, 1)
+
+
+def test_dry_run_counts_without_writing(db):
+    before = db.query(Maintenance).count()
+
+    result = generate_due_maintenances(db, now=NOW, dry_run=True)
+
+    assert result["due"] > 0 and result["created"] == 0
+    assert db.query(Maintenance).count() == before
+
+
+def _expected_dates(db) -> dict:
+    """Último servicio (o instalación) + días del intervalo, calculado fila a fila."""
+    last_service = dict(
+        db.query(Maintenance.device_iot_id, func.max(MaintenanceDetail.date))
+        .join(TechnicianAssignment, TechnicianAssignment.maintenance_id == Maintenance.id)
+        .join(MaintenanceDetail, MaintenanceDetail.technician_assignment_id == TechnicianAssignment.id)
+        .group_by(Maintenance.device_iot_id)
+    )
+    return {
+        d.id: (last_service.get(d.id) or d.installation_date) + timedelta(days=days)
+        for d, days in db.query(DeviceIot, MaintenanceInterval.days)
+        .join(MaintenanceInterval, MaintenanceInterval.id == DeviceIot.maintenance_interval_id)
+    }
+
+
+def test_recompute_sets_last_service_plus_interval(db):
+    expected = _expected_dates(db)
+
+    result = recompute_estimated_dates(db)
+
+    assert result["devices"] == len(expected)
+    assert dict(db.query(DeviceIot.id, DeviceIot.estimated_maintenance_date)) == expected
+
+
+def test_recompute_writes_only_changed_devices(db):
+    recompute_estimated_dates(db)
+    device_id, = _idle_devices(db, 1)
+    _schedule(db, device_id, NOW)
+
+    assert recompute_estimated_dates(db)["updated"] == 1
+    assert recompute_estimated_dates(db)["updated"] == 0
+
+
+def test_finalizing_a_maintenance_advances_the_device(client, db):
+    asgmt = (
+        db.query(TechnicianAssignment)
+        .join(Maintenance, Maintenance.id == TechnicianAssignment.maintenance_id)
+        .filter(Maintenance.maintenance_status_id == 23)
+        .first()
+    )
+    device = asgmt.maintenance.device_iot
+
+    response = client.post("/maintenance/finalize", data={
+        "technician_assignment_id": asgmt.id, "fault_remarks": "f", "type_failure_id": 1,
+        "type_maintenance_id": 2, "failure_solution_id": 2, "solution_remarks": "s",
+    }, files={"evidence_failure": ("f.jpg", b"x", "image/jpeg"), "evidence_solution": ("s.jpg", b"y", "image/jpeg")})
+
+    assert response.status_code == 200
+    db.expire_all()
+    finished_at = db.query(MaintenanceDetail.date).filter_by(technician_assignment_id=asgmt.id).scalar()
+    assert device.estimated_maintenance_date == finished_at + timedelta(days=device.maintenance_interval.days)
@@ -0,0 +1,56 @@
+# tests/test_search.py
+from app.maintenance.models import Maintenance
+
+
+def _describe(client, db, *descriptions) -> list:
+    """Reescribe la descripción de los primeros mantenimientos por la API (invalida el índice)."""
+    ids = [m_id for (m_id,) in db.query(Maintenance.id).order_by(Maintenance.id).limit(len(descriptions))]
+    for m_id, text in zip(ids, descriptions):
+        client.put(f"/maintenance/{m_id}", json={"description_failure": text})
+    return ids
+
+
+def _search(client, **params):
+    return client.get("/maintenance/search", params=params).json()["data"]
+
+
+def test_search_ignores_accents_and_case(client, db):
+    m_id, = _describe(client, db, "Válvula de compuerta OBSTRUIDA")
+
+    for q in ("valvula obstruida", "VÁLVULA", "obstruída"):
+        results = _search(client, q=q, kind="maintenance")["results"]
+        assert [r["id"] for r in results] == [m_id], q
+
+
+def test_search_matches_word_variants_and_requires_every_term(client, db):
+    jammed, checked = _describe(client, db, "Compuertas atascadas en el canal", "Compuerta revisada sin novedad")
+
+    assert {r["id"] for r in _search(client, q="compuerta atascada")["results"]} == {jammed}
+    assert {r["id"] for r in _search(client, q="compuerta", kind="maintenance")["results"]} == {jammed, checked}
+
+
+def test_search_ranks_repeated_and_rarer_terms_first(client, db):
+    strong, weak = _describe(
+        client, db,
+        "Hidrante con fuga: la fuga del hidrante inunda el lote",
+        "Hidrante pintado",
+    )
+
+    results = _search(client, q="hidrante fuga")["results"]
+    ranked  = [r["id"] for r in _search(client, q="hidrante", kind="maintenance")["results"]]
+
+    assert [r["id"] for r in results] == [strong]
+    assert ranked == [strong, weak]
+
+
+def test_search_pages_are_disjoint_and_keep_the_total(client, seeded):
+    first  = _search(client, q="presion", page=1, page_size=10)
+    second = _search(client, q="presion", page=2, page_size=10)
+
+    assert first["total"] == second["total"] > 20
+    assert not {(r["kind"], r["id"]) for r in first["results"]} & {(r["kind"], r["id"]) for r in second["results"]}
+    assert [r["score"] for r in first["results"]] == sorted((r["score"] for r in first["results"]), reverse=True)
+
+
+def test_blank_query_is_400(client, seeded):
+    assert client.get("/maintenance/search", params={"q": "   "}).status_code == 400
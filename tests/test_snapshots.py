@@ -0,0 +1,23 @@
+# tests/test_snapshots.py
+from app.maintenance.models import Maintenance
+
+
+def test_list_snapshot_hit_runs_no_queries(client, seeded, query_budget):
+    first = client.get("/maintenance/")
+
+    with query_budget(0):
+        second = client.get("/maintenance/")
+
+    assert second.content == first.content
+
+
+def test_list_snapshot_is_rebuilt_after_a_write(client, db, query_budget):
+    client.get("/maintenance/")
+    maintenance_id = db.query(Maintenance.id).order_by(Maintenance.id).first()[0]
+    client.put(f"/maintenance/{maintenance_id}", json={"description_failure": "Editada"})
+
+    with query_budget(3) as stats:
+        rows = client.get("/maintenance/").json()["data"]
+
+    assert stats.count > 0
+    assert next(r for r in rows if r["id"] == maintenance_id)["description_failure"] == "Editada"
@@ -0,0 +1,60 @@
+# tests/test_workload.py
+from app.maintenance.models import Maintenance, TechnicianAssignment
+
+
+def _workload(client) -> dict:
+    return {row["technician_id"]: row for row in client.get("/maintenance/technicians/workload").json()["data"]}
+
+
+def _in_progress_maintenance(db) -> TechnicianAssignment:
+    return (
+        db.query(TechnicianAssignment)
+        .join(Maintenance, Maintenance.id == TechnicianAssignment.maintenance_id)
+        .filter(Maintenance.maintenance_status_id == 23)
+        .order_by(TechnicianAssignment.id)
+        .first()
+    )
+
+
+def test_workload_counts_open_and_finalized_assignments(client, db, seeded):
+    technician_id = seeded["technician_id"]
+    statuses = [
+        m.maintenance_status_id if m else r.maintenance_status_id
+        for a in db.query(TechnicianAssignment).filter_by(user_id=technician_id)
+        for m, r in [(a.maintenance, a.report)]
+    ]
+
+    row = _workload(client)[technician_id]
+
+    assert (row["in_progress"], row["finalized"]) == (statuses.count(23), statuses.count(25))
+
+
+def test_workload_hit_runs_no_queries(client, seeded, query_budget):
+    first = _workload(client)
+
+    with query_budget(0):
+        assert _workload(client) == first
+
+
+def test_status_change_through_put_refreshes_workload(client, db, seeded):
+    asgmt = _in_progress_maintenance(db)
+    before = _workload(client)[asgmt.user_id]
+
+    response = client.put(f"/maintenance/{asgmt.maintenance_id}", json={"maintenance_status_id": 25})
+
+    after = _workload(client)[asgmt.user_id]
+    assert response.status_code == 200
+    assert (after["in_progress"], after["finalized"]) == (before["in_progress"] - 1, before["finalized"] + 1)
+
+
+def test_reassignment_moves_the_open_count(client, db, seeded):
+    asgmt = _in_progress_maintenance(db)
+    source, target = asgmt.user_id, asgmt.user_id % 5 + 1
+    before = _workload(client)
+
+    client.put(f"/maintenance/{asgmt.maintenance_id}/assign",
+               json={"user_id": target, "assignment_date": "2025-08-01T10:00:00"})
+
+    after = _workload(client)
+    assert after[source]["in_progress"] == before[source]["in_progress"] - 1
+    assert after[target]["in_progress"] == before[target]["in_progress"] + 1